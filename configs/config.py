@@ -1,14 +1,91 @@
+from functools import lru_cache
+from typing import Any, cast
+
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite+aiosqlite:///./project.db"
     LOGGER_MODE: str = "console"
+    LOG_FORMAT: str = "text"
+    LOG_CALLS: bool = False
+    LOG_RATE_LIMIT: float = 5.0
+    LOG_RATE_BURST: float = 20
     TELEGRAM_API_KEY: str
     TELEGRAM_ADMIN_ID: str
     PROXIES: list[str] = []
+    CIAN_BASE_URL: str = "https://www.cian.ru"
+    SCHEDULER_WORKERS: int = 4
+    SCRAPER_PROCESSES: int = 0
+    SPAWN_SCRAPERS: bool = True
+    JOB_LEASE_SECONDS: float = 600
+    JOB_STALL_SECONDS: float = 300
+    WORKER_POLL_INTERVAL: float = 1.0
+    OUTBOX_BATCH: int = 100
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    NOTIFY_WORKERS: int = 8
+    TELEGRAM_GLOBAL_RATE: float = 30.0
+    TELEGRAM_CHAT_RATE: float = 1.0
+    FILE_ID_CACHE_SIZE: int = 10000
+    FILE_ID_MAX_ROWS: int = 100000
+    FILE_ID_TTL_DAYS: float = 30
+    DELIVERY_CACHE_CHUNKS: int = 4096
+    DIGEST_PAGE_SIZE: int = 10
+    DIGEST_MIN_LISTINGS: int = 2
+    DIGEST_TTL: float = 86400
+    BOT_ME_TTL: float = 3600
+    CHAT_METADATA_TTL: float = 600
+    SEARCH_MIN_INTERVAL: float = 60
+    SEARCH_MAX_INTERVAL: float = 1800
+    SEARCH_TARGET_NEW: float = 1.0
+    SEARCH_RATE_SMOOTHING: float = 0.3
+    FRONTIER_BATCH: int = 30
+    FRONTIER_LEASE_SECONDS: float = 600
+    FRONTIER_MAX_ATTEMPTS: int = 5
+    FRONTIER_RETRY_BACKOFF: float = 60
+    REVISIT_BUDGET: int = 5
+    REVISIT_INITIAL_INTERVAL: float = 86400
+    REVISIT_MIN_INTERVAL: float = 6 * 3600
+    REVISIT_MAX_INTERVAL: float = 14 * 86400
+    HTTP_RECORD_PATH: str | None = None
+    HTTP_REPLAY_PATH: str | None = None
+    HTTP_REPLAY_LATENCY: list[float] = [0.0, 0.0]
+    HTTP_REPLAY_ERROR_RATE: float = 0.0
+    PAGE_ARCHIVE_PATH: str | None = None
+    PAGE_ARCHIVE_LEVEL: int = 9
+    PAGE_ARCHIVE_DICT_SIZE: int = 112640
+    PAGE_ARCHIVE_TRAIN_SAMPLES: int = 200
+    TRACE_FILE: str | None = None
+    PROFILE_DIR: str = "profiles"
+    PROFILE_INTERVAL: float = 0.005
+    PROFILE_MAX_SECONDS: float = 300
+    LOOP_MONITOR: bool = True
+    LOOP_LAG_INTERVAL: float = 0.1
+    LOOP_LAG_THRESHOLD: float = 0.25
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int | None = None
+    WEBHOOK_URL: str | None = None
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_SECRET: str | None = None
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    WEBHOOK_WORKERS: int = 16
+    WEBHOOK_QUEUE_SIZE: int = 1000
     
     model_config = ConfigDict(extra="ignore", env_file=".env")
 
 
-settings = Settings()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    return Settings()
+
+
+class _LazySettings:
+    # Settings are read from the environment on first attribute access, not at import, so
+    # modules can import ``settings`` and entry points that never touch them (e.g. --help)
+    # start without loading and validating them.
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+
+
+settings = cast(Settings, _LazySettings())
@@ -0,0 +1,29 @@
+from datetime import timedelta
+from typing import List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models import Apartment, utcnow
+
+
+async def claim_due_listings(db: AsyncSession, limit: int, lease_seconds: float = 600) -> List[Apartment]:
+    """
+    Take up to ``limit`` active listings due for a revisit, most overdue first.
+
+    Their next check is pushed back by ``lease_seconds`` so concurrent scrapers don't pick
+    the same listings; the revisit itself then stores the real next check time.
+    """
+    now = utcnow()
+    stmt = (
+        select(Apartment)
+        .where(Apartment.status == "active", (Apartment.next_check_at <= now) | Apartment.next_check_at.is_(None))
+        .order_by(Apartment.next_check_at.is_not(None), Apartment.next_check_at)
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    listings = list(result.scalars().all())
+    for listing in listings:
+        listing.next_check_at = now + timedelta(seconds=lease_seconds)
+    await db.commit()
+    return listings
@@ -0,0 +1,38 @@
+from typing import Dict, Iterable
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models import UserDelivery
+
+
+async def get_delivery_chunks(db: AsyncSession, tg_id: int, chunks: Iterable[int]) -> Dict[int, bytes]:
+    """
+    Load the user's delivery bitmaps for the given chunk indexes. Missing chunks are omitted.
+    """
+    chunks = list(set(chunks))
+    if not chunks:
+        return {}
+    result = await db.execute(
+        select(UserDelivery.chunk, UserDelivery.bits).where(UserDelivery.tg_id == tg_id, UserDelivery.chunk.in_(chunks))
+    )
+    return dict(result.all())
+
+
+async def save_delivery_chunks(db: AsyncSession, tg_id: int, chunks: Dict[int, bytes]) -> None:
+    """
+    Store the user's delivery bitmaps, replacing the stored ones.
+    """
+    if not chunks:
+        return
+    result = await db.execute(select(UserDelivery.chunk).where(UserDelivery.tg_id == tg_id, UserDelivery.chunk.in_(list(chunks))))
+    existing = set(result.scalars().all())
+    for chunk in existing:
+        await db.execute(
+            update(UserDelivery).where(UserDelivery.tg_id == tg_id, UserDelivery.chunk == chunk).values(bits=bytes(chunks[chunk]))
+        )
+    db.add_all(
+        [UserDelivery(tg_id=tg_id, chunk=chunk, bits=bytes(bits)) for chunk, bits in chunks.items() if chunk not in existing]
+    )
+    await db.commit()
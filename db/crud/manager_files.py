@@ -0,0 +1,63 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, cast
+
+from sqlalchemy import CursorResult, delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models import TelegramFile, utcnow
+
+
+async def get_file_ids(db: AsyncSession, urls: Iterable[str]) -> Dict[str, str]:
+    """
+    Look up cached Telegram file_ids by image URL and mark them as used.
+    """
+    urls = list(urls)
+    if not urls:
+        return {}
+    result = await db.execute(select(TelegramFile.url, TelegramFile.file_id).where(TelegramFile.url.in_(urls)))
+    found = dict(result.all())
+    if found:
+        await db.execute(update(TelegramFile).where(TelegramFile.url.in_(list(found))).values(last_used_at=utcnow()))
+        await db.commit()
+    return found
+
+
+async def save_file_ids(db: AsyncSession, file_ids: Dict[str, str]) -> None:
+    """
+    Store new URL -> file_id pairs, ignoring URLs that are already cached.
+    """
+    if not file_ids:
+        return
+    result = await db.execute(select(TelegramFile.url).where(TelegramFile.url.in_(list(file_ids))))
+    existing = set(result.scalars().all())
+    db.add_all([TelegramFile(url=url, file_id=file_id) for url, file_id in file_ids.items() if url not in existing])
+    await db.commit()
+
+
+async def delete_file_ids(db: AsyncSession, urls: Iterable[str]) -> None:
+    """
+    Forget the file_ids of the given image URLs.
+    """
+    urls = list(urls)
+    if not urls:
+        return
+    await db.execute(delete(TelegramFile).where(TelegramFile.url.in_(urls)))
+    await db.commit()
+
+
+async def evict_file_ids(db: AsyncSession, unused_since: datetime, max_rows: int) -> int:
+    """
+    Delete file_ids not used since ``unused_since``, then the least recently used ones above ``max_rows``.
+
+    :return: Number of rows deleted.
+    """
+    result = cast(CursorResult[Any], await db.execute(delete(TelegramFile).where(TelegramFile.last_used_at < unused_since)))
+    deleted = result.rowcount or 0
+
+    keep = select(TelegramFile.id).order_by(TelegramFile.last_used_at.desc()).limit(max_rows).scalar_subquery()
+    result = cast(CursorResult[Any], await db.execute(delete(TelegramFile).where(TelegramFile.id.not_in(keep))))
+    deleted += result.rowcount or 0
+
+    await db.commit()
+    return deleted
@@ -0,0 +1,135 @@
+from datetime import timedelta
+from typing import Any, Iterable, List, Optional, cast
+
+from sqlalchemy import CursorResult, delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models import Apartment, FrontierUrl, utcnow
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+FAILED = "failed"
+
+
+async def push_urls(db: AsyncSession, urls: List[str], tg_id: Optional[int] = None) -> int:
+    """
+    Add discovered detail URLs to the frontier, skipping ones already saved or queued.
+
+    URLs are prioritised in page order, so the top of the search page is fetched first.
+    A pending URL discovered again is handed over to the latest discoverer, and a failed one
+    is given a fresh set of attempts.
+
+    :return: Number of URLs newly added.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return 0
+
+    saved = await db.execute(select(Apartment.url).where(Apartment.url.in_(urls)))
+    queued = await db.execute(select(FrontierUrl.url, FrontierUrl.status).where(FrontierUrl.url.in_(urls)))
+    known = set(saved.scalars().all())
+    already_queued = {url: status for url, status in queued.all()}
+
+    now = utcnow()
+    added = 0
+    for position, url in enumerate(urls):
+        if url in known:
+            continue
+        priority = len(urls) - position
+        if url in already_queued:
+            if already_queued[url] == PENDING:
+                await db.execute(
+                    update(FrontierUrl)
+                    .where(FrontierUrl.url == url, FrontierUrl.status == PENDING)
+                    .values(tg_id=tg_id, priority=priority)
+                )
+            elif already_queued[url] == FAILED:
+                await db.execute(
+                    update(FrontierUrl)
+                    .where(FrontierUrl.url == url, FrontierUrl.status == FAILED)
+                    .values(tg_id=tg_id, priority=priority, status=PENDING, attempts=0, next_attempt_at=now)
+                )
+            continue
+        db.add(FrontierUrl(url=url, tg_id=tg_id, priority=priority, next_attempt_at=now, discovered_at=now))
+        added += 1
+
+    await db.commit()
+    return added
+
+
+async def claim_urls(db: AsyncSession, tg_id: Optional[int], limit: int, lease_seconds: float = 600) -> List[str]:
+    """
+    Take up to ``limit`` due URLs of the user's frontier, highest priority first.
+
+    Claimed URLs are leased: if the process dies before completing them, they become
+    claimable again once the lease expires.
+    """
+    now = utcnow()
+    stmt = (
+        select(FrontierUrl)
+        .where(
+            FrontierUrl.tg_id == tg_id,
+            FrontierUrl.status.in_([PENDING, IN_PROGRESS]),
+            FrontierUrl.next_attempt_at <= now,
+        )
+        .order_by(FrontierUrl.priority.desc(), FrontierUrl.discovered_at)
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    rows = result.scalars().all()
+    lease_until = now + timedelta(seconds=lease_seconds)
+    for row in rows:
+        row.status = IN_PROGRESS
+        row.next_attempt_at = lease_until
+    await db.commit()
+    return [row.url for row in rows]
+
+
+async def complete_urls(db: AsyncSession, urls: Iterable[str]) -> None:
+    """
+    Drop URLs that were saved (or turned out to be duplicates) from the frontier.
+    """
+    urls = list(urls)
+    if urls:
+        await db.execute(delete(FrontierUrl).where(FrontierUrl.url.in_(urls)))
+        await db.commit()
+
+
+async def fail_urls(db: AsyncSession, urls: Iterable[str], max_attempts: int = 5, backoff: float = 60) -> None:
+    """
+    Record a failed fetch and schedule a retry with exponential backoff.
+    URLs that exhausted ``max_attempts`` are marked as failed and never claimed again.
+    """
+    urls = list(urls)
+    if not urls:
+        return
+
+    now = utcnow()
+    result = await db.execute(select(FrontierUrl).where(FrontierUrl.url.in_(urls)))
+    for row in result.scalars().all():
+        row.attempts += 1
+        if row.attempts >= max_attempts:
+            row.status = FAILED
+        else:
+            row.status = PENDING
+            row.next_attempt_at = now + timedelta(seconds=backoff * 2 ** (row.attempts - 1))
+    await db.commit()
+
+
+async def recover_frontier(db: AsyncSession) -> int:
+    """
+    Release every claimed URL, for use on startup after a crash.
+
+    :return: Number of URLs returned to the pending state.
+    """
+    result = cast(
+        CursorResult[Any],
+        await db.execute(
+            update(FrontierUrl)
+            .where(FrontierUrl.status == IN_PROGRESS)
+            .values(status=PENDING, next_attempt_at=utcnow())
+        ),
+    )
+    await db.commit()
+    return result.rowcount or 0
@@ -0,0 +1,196 @@
+from datetime import datetime, timedelta
+from typing import Any, Iterable, List, Optional, cast
+
+from sqlalchemy import ColumnElement, CursorResult, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models import SearchJob, utcnow
+
+
+async def get_job(db: AsyncSession, tg_id: int) -> Optional[SearchJob]:
+    """
+    Get the scheduler entry of the user's search, if any.
+    """
+    result = await db.execute(select(SearchJob).where(SearchJob.tg_id == tg_id))
+    return result.scalars().first()
+
+
+async def activate_job(db: AsyncSession, tg_id: int, next_run_at: datetime) -> SearchJob:
+    """
+    Create or re-enable the user's search and schedule its next run.
+    """
+    job = await get_job(db, tg_id)
+    if not job:
+        job = SearchJob(tg_id=tg_id)
+        db.add(job)
+    job.is_active = 1
+    job.next_run_at = next_run_at
+    job.new_rate = None
+    await db.commit()
+    return job
+
+
+async def deactivate_job(db: AsyncSession, tg_id: int) -> None:
+    """
+    Mark the user's search as stopped so it is not resumed on startup.
+    """
+    job = await get_job(db, tg_id)
+    if job:
+        job.is_active = 0
+        await db.commit()
+
+
+async def get_active_jobs(db: AsyncSession) -> List[SearchJob]:
+    """
+    Get every search that should be running.
+    """
+    result = await db.execute(select(SearchJob).where(SearchJob.is_active == 1))
+    return list(result.scalars().all())
+
+
+async def reschedule_job(
+    db: AsyncSession,
+    tg_id: int,
+    last_run_at: datetime,
+    next_run_at: datetime,
+    new_rate: Optional[float] = None,
+) -> None:
+    """
+    Store the outcome of a finished cycle and the search's new-listing rate estimate.
+    """
+    job = await get_job(db, tg_id)
+    if job:
+        job.last_run_at = last_run_at
+        job.next_run_at = next_run_at
+        if new_rate is not None:
+            job.new_rate = new_rate
+        await db.commit()
+
+
+def _unleased(now: datetime) -> ColumnElement[bool]:
+    return or_(SearchJob.lease_expires_at.is_(None), SearchJob.lease_expires_at < now)
+
+
+async def claim_jobs(
+    db: AsyncSession,
+    owner: str,
+    limit: int,
+    *,
+    shard: int = 0,
+    shards: int = 1,
+    lease_seconds: float = 600,
+) -> List[SearchJob]:
+    """
+    Lease up to ``limit`` due searches of the shard, earliest first.
+
+    A search belongs to shard ``abs(tg_id) % shards``. The lease is taken with a single
+    conditional UPDATE, so two processes never run the same search; if the owner dies,
+    the search becomes claimable again once the lease expires.
+
+    :param owner: Unique name of the claiming worker.
+    """
+    now = utcnow()
+    lease_until = now + timedelta(seconds=lease_seconds)
+    due = (
+        select(SearchJob.id)
+        .where(
+            SearchJob.is_active == 1,
+            func.abs(SearchJob.tg_id) % shards == shard,
+            or_(SearchJob.next_run_at.is_(None), SearchJob.next_run_at <= now),
+            _unleased(now),
+        )
+        .order_by(SearchJob.next_run_at)
+        .limit(limit)
+    )
+    await db.execute(
+        update(SearchJob)
+        .where(SearchJob.id.in_(due.scalar_subquery()), _unleased(now))
+        .values(lease_owner=owner, lease_expires_at=lease_until)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+    result = await db.execute(select(SearchJob).where(SearchJob.lease_owner == owner, SearchJob.lease_expires_at == lease_until))
+    return list(result.scalars().all())
+
+
+async def renew_leases(db: AsyncSession, owner: str, tg_ids: Iterable[int], lease_seconds: float = 600) -> None:
+    """
+    Extend the owner's leases on searches whose cycles are still running.
+    """
+    tg_ids = list(tg_ids)
+    if tg_ids:
+        await db.execute(
+            update(SearchJob)
+            .where(SearchJob.tg_id.in_(tg_ids), SearchJob.lease_owner == owner)
+            .values(lease_expires_at=utcnow() + timedelta(seconds=lease_seconds))
+        )
+        await db.commit()
+
+
+async def finish_job(
+    db: AsyncSession,
+    tg_id: int,
+    owner: str,
+    last_run_at: datetime,
+    next_run_at: datetime,
+    *,
+    new_rate: Optional[float] = None,
+) -> bool:
+    """
+    Store the outcome of a leased cycle and release the lease.
+
+    :return: Whether the search is still active, i.e. was not stopped during the cycle.
+    """
+    job = await get_job(db, tg_id)
+    if not job:
+        return False
+    job.last_run_at = last_run_at
+    job.next_run_at = next_run_at
+    if new_rate is not None:
+        job.new_rate = new_rate
+    if job.lease_owner == owner:
+        job.lease_owner = None
+        job.lease_expires_at = None
+    await db.commit()
+    return bool(job.is_active)
+
+
+async def release_leases(db: AsyncSession, owner: str) -> int:
+    """
+    Drop every lease of the owner, for use on a clean shutdown.
+
+    :return: Number of searches released.
+    """
+    result = cast(
+        CursorResult[Any],
+        await db.execute(update(SearchJob).where(SearchJob.lease_owner == owner).values(lease_owner=None, lease_expires_at=None)),
+    )
+    await db.commit()
+    return result.rowcount or 0
+
+
+async def get_stalled_jobs(db: AsyncSession, overdue_seconds: float) -> List[int]:
+    """
+    Get the active searches that have been due for over ``overdue_seconds`` without any worker leasing them.
+
+    :return: Telegram user IDs of the searches.
+    """
+    now = utcnow()
+    result = await db.execute(
+        select(SearchJob.tg_id).where(
+            SearchJob.is_active == 1,
+            SearchJob.next_run_at <= now - timedelta(seconds=overdue_seconds),
+            _unleased(now),
+        )
+    )
+    return list(result.scalars().all())
+
+
+async def count_leased_jobs(db: AsyncSession) -> int:
+    """
+    Number of searches currently being run by some worker.
+    """
+    result = await db.execute(select(func.count(SearchJob.id)).where(SearchJob.lease_expires_at >= utcnow()))
+    return result.scalar_one()
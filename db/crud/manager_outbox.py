@@ -0,0 +1,59 @@
+import json
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models import NotificationOutbox
+
+
+async def push_notification(db: AsyncSession, tg_id: int, listings: List[Dict[str, Any]]) -> None:
+    """
+    Queue new listings for the bot process to send to the user.
+    """
+    db.add(NotificationOutbox(tg_id=tg_id, payload=json.dumps(listings, ensure_ascii=False, default=str)))
+    await db.commit()
+
+
+async def take_notifications(db: AsyncSession, limit: int = 100) -> List[Tuple[int, int, List[Dict[str, Any]]]]:
+    """
+    Get the oldest queued notifications.
+
+    :return: (row id, Telegram user ID, listings) in queueing order.
+    """
+    result = await db.execute(select(NotificationOutbox).order_by(NotificationOutbox.id).limit(limit))
+    return [(row.id, row.tg_id, json.loads(row.payload)) for row in result.scalars().all()]
+
+
+async def delete_notifications(db: AsyncSession, ids: Iterable[int]) -> None:
+    """
+    Drop notifications that were handed over to the notifier.
+    """
+    ids = list(ids)
+    if ids:
+        await db.execute(delete(NotificationOutbox).where(NotificationOutbox.id.in_(ids)))
+        await db.commit()
+
+
+async def fail_notifications(db: AsyncSession, ids: Iterable[int], max_attempts: int = 5) -> int:
+    """
+    Record a failed hand-over, so the notifications are taken again on the next poll.
+    Notifications that failed ``max_attempts`` times are dropped.
+
+    :return: Number of notifications dropped.
+    """
+    ids = list(ids)
+    if not ids:
+        return 0
+    await db.execute(
+        update(NotificationOutbox).where(NotificationOutbox.id.in_(ids)).values(attempts=NotificationOutbox.attempts + 1)
+    )
+    result = await db.execute(
+        select(NotificationOutbox.id).where(NotificationOutbox.id.in_(ids), NotificationOutbox.attempts >= max_attempts)
+    )
+    dropped = result.scalars().all()
+    if dropped:
+        await db.execute(delete(NotificationOutbox).where(NotificationOutbox.id.in_(dropped)))
+    await db.commit()
+    return len(dropped)
@@ -1,9 +1,47 @@
+from typing import Any, Dict, cast
+from urllib.parse import urlencode
+
+from sqlalchemy import CursorResult, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from db.models import User, UserConfig
 from sqlalchemy.future import select
 
+from configs.config import settings
+
+CONFIG_FIELDS = frozenset(column.name for column in UserConfig.__table__.columns) - {"id", "user_id"}
+
+
+def search_url(params: Dict[str, Any], base_url: str) -> str:
+    """
+    Canonical search page URL: parameters sorted by name, empty ones dropped.
+    """
+    query = urlencode(sorted((key, str(value)) for key, value in params.items() if value is not None))
+    return f"{base_url.rstrip('/')}/cat.php?{query}"
 
-async def get_or_create_user(db: AsyncSession, tg_id: str) -> User:
+
+class CachedConfig:
+    """
+    Snapshot of a user's search preferences and the search URL built from them.
+    """
+
+    def __init__(self, params: Dict[str, Any], base_url: str):
+        self.params = params
+        self.url = search_url(params, base_url)
+
+    @classmethod
+    def from_model(cls, config: UserConfig) -> "CachedConfig":
+        params = {name: getattr(config, name) for name in CONFIG_FIELDS if getattr(config, name) is not None}
+        return cls(params, settings.CIAN_BASE_URL)
+
+    def updated(self, fields: Dict[str, Any]) -> "CachedConfig":
+        params = {**self.params, **fields}
+        return CachedConfig({k: v for k, v in params.items() if v is not None}, settings.CIAN_BASE_URL)
+
+
+_config_cache: Dict[int, CachedConfig] = {}
+
+
+async def get_or_create_user(db: AsyncSession, tg_id: int) -> User:
     """
     Retrieves an existing user by Telegram ID, or creates a new one if doesn't exist.
     Updates username/full_name if they changed.
@@ -19,6 +57,15 @@ async def get_or_create_user(db: AsyncSession, tg_id: str) -> User:
 
     return user
 
+async def set_user_digest(db: AsyncSession, tg_id: int, enabled: bool) -> None:
+    """
+    Switch digest notifications on or off for the user.
+    """
+    user = await get_or_create_user(db, tg_id)
+    user.digest = int(enabled)
+    await db.commit()
+
+
 async def get_user_config(db: AsyncSession, user_id: int) -> UserConfig:
     """
     Get the user's search preferences from the database.
@@ -34,10 +81,34 @@ async def get_user_config(db: AsyncSession, user_id: int) -> UserConfig:
     return config
 
 
-async def update_user_config(db: AsyncSession, user_id: int, field: str, value: str):
+async def get_search_config(db: AsyncSession, user_id: int) -> CachedConfig:
+    """
+    Get the user's search preferences from the write-through cache, loading them on a miss.
+    """
+    cached = _config_cache.get(user_id)
+    if cached is None:
+        cached = _config_cache[user_id] = CachedConfig.from_model(await get_user_config(db, user_id))
+    return cached
+
+
+async def update_user_config(db: AsyncSession, user_id: int, **fields: Any) -> None:
     """
-    Update the user's search preferences in the database.
+    Update several of the user's search preferences with one UPDATE and one commit.
+    The cached snapshot is updated after the commit succeeded.
     """
-    config = await get_user_config(db, user_id)
-    setattr(config, field, value)
+    unknown = set(fields) - CONFIG_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown config fields: {', '.join(sorted(unknown))}")
+
+    result = cast(CursorResult[Any], await db.execute(update(UserConfig).where(UserConfig.user_id == user_id).values(**fields)))
+    if result.rowcount == 0:
+        db.add(UserConfig(user_id=user_id, **fields))
     await db.commit()
+
+    cached = _config_cache.get(user_id)
+    if cached is not None:
+        _config_cache[user_id] = cached.updated(fields)
+
+
+def invalidate_user_config(user_id: int) -> None:
+    _config_cache.pop(user_id, None)
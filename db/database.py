@@ -1,5 +1,7 @@
+from sqlalchemy import Connection
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from contextlib import asynccontextmanager
+from typing import Dict
 from db.models import Base
 from configs.config import settings
 from src.loggers import logger, log
@@ -8,6 +10,22 @@ from src.loggers import logger, log
 engine = None
 AsyncSessionLocal = None
 
+# Columns added to tables that already exist in deployed databases. create_all() only creates
+# missing tables, so init_db() adds these to older tables with the DDL given here.
+UPGRADE_COLUMNS: Dict[str, Dict[str, str]] = {
+    "apartments": {
+        "content_hash": "VARCHAR(64)",
+        "status": "VARCHAR(20) NOT NULL DEFAULT 'active'",
+        "last_checked_at": "DATETIME",
+        "next_check_at": "DATETIME",
+        "check_interval": "FLOAT",
+        "change_count": "INTEGER NOT NULL DEFAULT 0",
+    },
+    "users": {
+        "digest": "INTEGER NOT NULL DEFAULT 0",
+    },
+}
+
 
 def init_engine(database_url: str = None, echo: bool = False, **kwargs):
 
@@ -20,13 +38,41 @@ def init_engine(database_url: str = None, echo: bool = False, **kwargs):
         raise RuntimeError("Engine or AsyncSessionLocal failed to initialize")
 
 @log
-async def init_db():
+async def init_db() -> None:
 
     if engine is None:
         raise Exception("Engine not started. Should call init_engine() before init_db().")
     logger.info("Initializing database")
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
+
+
+def upgrade_schema(conn: Connection) -> None:
+    """
+    Add the columns in UPGRADE_COLUMNS that an existing table lacks, and their indexes.
+    Existing rows get the column defaults, so old listings start out 'active' and due for a revisit.
+    """
+    for table, columns in UPGRADE_COLUMNS.items():
+        existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+        for name, ddl in columns.items():
+            if name not in existing:
+                logger.info(f"Adding column {table}.{name}")
+                conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+        for index in Base.metadata.tables[table].indexes:
+            index.create(conn, checkfirst=True)
+
+
+async def enable_wal() -> None:
+    """
+    Switch an SQLite database to WAL mode, so readers in other processes don't block the writer.
+    A no-op for other databases.
+    """
+    if engine is None:
+        raise RuntimeError("Engine not started. Should call init_engine() before enable_wal().")
+    if engine.dialect.name == "sqlite":
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("PRAGMA journal_mode=WAL")
 
 
 @log
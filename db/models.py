@@ -1,19 +1,31 @@
+from typing import List, Optional
+
 from sqlalchemy import (
-    Column,
     Integer,
     String,
     Text,
     Float,
     DateTime,
     ForeignKey,
+    LargeBinary,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import (
-    declarative_base,
+    DeclarativeBase,
+    Mapped,
+    mapped_column,
     relationship
 )
-from datetime import datetime
+from datetime import datetime, timezone
+
+
+class Base(DeclarativeBase):
+    pass
 
-Base = declarative_base()
+
+def utcnow() -> datetime:
+    """Current time as the naive UTC datetime stored in the database."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 class User(Base):
     """
@@ -26,20 +38,24 @@ class User(Base):
         full_name (str): Full name if available.
         created_at (DateTime): Date/time the user was created in the DB.
         updated_at (DateTime): Date/time the user last updated. Changes automatically on update.
+        digest (int): 1 to receive new listings as paginated digests instead of one message each.
     """
 
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    tg_id = Column(Integer, unique=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tg_id: Mapped[Optional[int]] = mapped_column(Integer, unique=True)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(
         DateTime,
         default=datetime.now(),
         onupdate=datetime.now()
     )
+    digest: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
 
-    config = relationship("UserConfig", back_populates="user", uselist=False, cascade="all, delete-orphan")
+    config: Mapped[Optional["UserConfig"]] = relationship(
+        "UserConfig", back_populates="user", uselist=False, cascade="all, delete-orphan"
+    )
 
 class UserConfig(Base):
     """
@@ -47,24 +63,24 @@ class UserConfig(Base):
     """
     __tablename__ = "users_configs"
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), unique=True, nullable=False)
-    deal_type = Column(String(10), default="sale")  
-    engine_version = Column(Integer, default=2)
-    region = Column(Integer, default=2)  
-    minprice = Column(Integer, nullable=True)
-    maxprice = Column(Integer, nullable=True)
-    offer_type = Column(String(10), default="flat")
-    mintarea = Column(Integer, nullable=True)
-    maxtarea = Column(Integer, nullable=True)
-    rooms = Column(String(50), default="1")
-    only_foot = Column(Integer, default=2)
-    min_house_year = Column(Integer, default=1990)
-    min_floor = Column(Integer, default=1)
-    max_floor = Column(Integer, nullable=True)
-    is_first_floor = Column(Integer, default=0)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), unique=True, nullable=False)
+    deal_type: Mapped[Optional[str]] = mapped_column(String(10), default="sale")  
+    engine_version: Mapped[Optional[int]] = mapped_column(Integer, default=2)
+    region: Mapped[Optional[int]] = mapped_column(Integer, default=2)  
+    minprice: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    maxprice: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    offer_type: Mapped[Optional[str]] = mapped_column(String(10), default="flat")
+    mintarea: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    maxtarea: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    rooms: Mapped[Optional[str]] = mapped_column(String(50), default="1")
+    only_foot: Mapped[Optional[int]] = mapped_column(Integer, default=2)
+    min_house_year: Mapped[Optional[int]] = mapped_column(Integer, default=1990)
+    min_floor: Mapped[Optional[int]] = mapped_column(Integer, default=1)
+    max_floor: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    is_first_floor: Mapped[Optional[int]] = mapped_column(Integer, default=0)
     
-    user = relationship("User", back_populates="config", lazy="joined")
+    user: Mapped["User"] = relationship("User", back_populates="config", lazy="joined")
 class Apartment(Base):
     """
     Apartment model representing scraped apartment data from Cian.
@@ -80,21 +96,38 @@ class Apartment(Base):
         date_published (DateTime): Date of publication (converted to datetime if needed).
         rooms (str): Number of rooms.
         area (str): String with total area info, or parse into numeric if needed.
+        content_hash (str): Hash of the extracted fields, used to detect changes on revisit.
+        status (str): 'active' while the listing is online, 'removed' once Cian drops it.
+        last_checked_at (DateTime): When the listing was last fetched.
+        next_check_at (DateTime): When the listing is due for a revisit.
+        check_interval (float): Current revisit interval in seconds.
+        change_count (int): Number of revisits that found a change.
     """
     
     __tablename__ = "apartments"
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    title = Column(String(255), nullable=True)
-    price = Column(Float, nullable=True)
-    description = Column(Text, nullable=True)
-    address = Column(Text, nullable=True)
-    images = relationship("ApartmentImage", back_populates="listing", cascade="all, delete-orphan")
-    date_published = Column(DateTime, default=None, nullable=True)
-    rooms = Column(String(50), nullable=True)
-    area = Column(String(50), nullable=True)
-    url = Column(String(500), unique=True, nullable=False)
-    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    title: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    price: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    address: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    images: Mapped[List["ApartmentImage"]] = relationship(
+        "ApartmentImage", back_populates="listing", cascade="all, delete-orphan"
+    )
+    date_published: Mapped[Optional[datetime]] = mapped_column(DateTime, default=None, nullable=True)
+    rooms: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    area: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    url: Mapped[str] = mapped_column(String(500), unique=True, nullable=False)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    status: Mapped[str] = mapped_column(String(20), default="active", nullable=False)
+    last_checked_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    next_check_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, index=True)
+    check_interval: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    change_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    history: Mapped[List["ApartmentHistory"]] = relationship(
+        "ApartmentHistory", back_populates="listing", cascade="all, delete-orphan"
+    )
+
 class ApartmentImage(Base):
     """
     ApartmentImage model representing the images for a Apartment.
@@ -107,8 +140,155 @@ class ApartmentImage(Base):
 
     __tablename__ = "apartment_images"
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    listing_id = Column(Integer, ForeignKey("apartments.id"), nullable=False)
-    url = Column(Text, nullable=False)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    listing_id: Mapped[int] = mapped_column(Integer, ForeignKey("apartments.id"), nullable=False)
+    url: Mapped[str] = mapped_column(Text, nullable=False)
+
+    listing: Mapped["Apartment"] = relationship("Apartment", back_populates="images")
+
+
+class ApartmentHistory(Base):
+    """
+    ApartmentHistory model recording a price or status change found on revisit.
+
+    Fields:
+        id (int): Primary key.
+        listing_id (int): Foreign key referencing Apartment.id
+        field (str): Changed field, 'price' or 'status'.
+        old_value (str): Value before the change.
+        new_value (str): Value after the change.
+        changed_at (DateTime): When the change was detected.
+    """
+
+    __tablename__ = "apartment_history"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    listing_id: Mapped[int] = mapped_column(Integer, ForeignKey("apartments.id"), nullable=False, index=True)
+    field: Mapped[str] = mapped_column(String(50), nullable=False)
+    old_value: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    new_value: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    changed_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
+
+    listing: Mapped["Apartment"] = relationship("Apartment", back_populates="history")
+
+
+class SearchJob(Base):
+    """
+    SearchJob model representing a user's search registered in the scheduler.
+
+    Fields:
+        id (int): Primary key, auto-increment.
+        tg_id (int): Telegram user ID the search belongs to (unique).
+        is_active (int): 1 while the search is scheduled, 0 after /stop.
+        next_run_at (DateTime): When the scheduler should run the next cycle.
+        last_run_at (DateTime): When the last cycle finished.
+        new_rate (float): Smoothed rate of new listings per second, drives the polling interval.
+        lease_owner (str): Worker process running the search's cycle, if any.
+        lease_expires_at (DateTime): When the lease lapses and another worker may take the search.
+    """
+
+    __tablename__ = "search_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tg_id: Mapped[int] = mapped_column(Integer, unique=True, nullable=False)
+    is_active: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    next_run_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_run_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    new_rate: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    lease_owner: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class NotificationOutbox(Base):
+    """
+    NotificationOutbox model holding new listings found by a scraper worker process until the bot sends them.
+
+    Fields:
+        id (int): Primary key, auto-increment. Rows are delivered in id order.
+        tg_id (int): Telegram user ID to notify.
+        payload (str): JSON list of listing records.
+        attempts (int): Number of failed attempts to hand the notification over to the notifier.
+        created_at (DateTime): When the worker queued the notification.
+    """
+
+    __tablename__ = "notification_outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tg_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
+
+
+class FrontierUrl(Base):
+    """
+    FrontierUrl model representing a detail URL discovered on a search page but not yet saved.
+
+    Fields:
+        id (int): Primary key, auto-increment.
+        url (str): Detail page URL (unique).
+        tg_id (int): Telegram user ID whose search discovered the URL.
+        status (str): 'pending', 'in_progress' (claimed by a scraper) or 'failed' (gave up).
+        priority (int): Higher values are fetched first.
+        attempts (int): Number of failed fetch attempts so far.
+        next_attempt_at (DateTime): Earliest time the URL may be claimed again.
+        discovered_at (DateTime): When the URL was first seen.
+    """
+
+    __tablename__ = "crawl_frontier"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    url: Mapped[str] = mapped_column(String(500), unique=True, nullable=False)
+    tg_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    status: Mapped[str] = mapped_column(String(20), default="pending", nullable=False, index=True)
+    priority: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
+    discovered_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
+
+
+class TelegramFile(Base):
+    """
+    TelegramFile model caching the Telegram file_id of an image already uploaded once.
+
+    Fields:
+        id (int): Primary key, auto-increment.
+        url (str): Source image URL (unique).
+        file_id (str): Telegram file_id returned by the first successful send.
+        created_at (DateTime): When the file_id was stored.
+        last_used_at (DateTime): When the file_id was last reused, drives eviction.
+    """
+
+    __tablename__ = "telegram_files"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    url: Mapped[str] = mapped_column(String(1000), unique=True, nullable=False)
+    file_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False, index=True)
+
+
+class UserDelivery(Base):
+    """
+    UserDelivery model storing which listings a user has been sent, as bitmaps over listing ids.
+
+    Listing id ``n`` is bit ``n % DELIVERY_CHUNK_BITS`` of chunk ``n // DELIVERY_CHUNK_BITS``,
+    so a user who was sent every listing costs one kilobyte per 8192 listings.
+
+    Fields:
+        id (int): Primary key, auto-increment.
+        tg_id (int): Telegram ID of the user.
+        chunk (int): Index of the id range covered by ``bits``.
+        bits (bytes): Bitmap of delivered listing ids in the range.
+    """
+
+    __tablename__ = "user_deliveries"
+    __table_args__ = (UniqueConstraint("tg_id", "chunk"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tg_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    chunk: Mapped[int] = mapped_column(Integer, nullable=False)
+    bits: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
 
-    listing = relationship("Apartment", back_populates="images")
\ No newline at end of file
+DELIVERY_CHUNK_BITS = 8192
@@ -1,15 +1,31 @@
 import asyncio
 import argparse
-import db.database as db
-from src.bot.bot import TelegramBot
-from src.loggers import logger
+import importlib
+from src.loggers import logger, setup_logging
+from configs.config import get_settings
 import uvloop
 
-asyncio.set_event_loop_policy(uvloop.EventLoopPolicy()) 
+# Heavy modules (aiogram, the scraper) are imported by the code paths that use them,
+# so --init-db, the scrape command and worker processes start without loading the bot.
+# Settings are only read once the arguments are parsed, so --help works without a .env.
 
-async def main(init_db=False, run_bot=False):
+asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+# Subcommand name -> (module with add_arguments/run, help). Only the module of the
+# command being run is imported.
+COMMANDS = {
+    "scrape": ("src.cli.scrape", "Scrape a search without the bot"),
+    "worker": ("src.cli.worker", "Run the searches of one shard in this process"),
+    "reparse": ("src.cli.reparse", "Parse archived pages again and update stored listings"),
+    "export": ("src.cli.export", "Stream apartments to a JSONL, CSV or Parquet file"),
+}
+
+
+async def main(init_db=False, run_bot=False, webhook=False, profile=None):
 
     if init_db:
+        import db.database as db
+
         try:
             logger.info("Initialization db")
             db.init_engine()
@@ -19,20 +35,56 @@ async def main(init_db=False, run_bot=False):
             logger.error(f"Error while initializated: {e}")
             return
 
+    if profile:
+        from src.profiler import SamplingProfiler, profile_to_file
+
+        settings = get_settings()
+        # Keep a reference, the loop only holds tasks weakly.
+        _profiling = asyncio.create_task(
+            profile_to_file(SamplingProfiler(settings.PROFILE_INTERVAL), profile, settings.PROFILE_DIR)
+        )
+
     if run_bot:
+        from src.bot.bot import TelegramBot
+
         logger.info("🚀 Start Telegram Bot...")
         bot = TelegramBot()
-        await bot.run()
+        await bot.run(webhook=webhook)
 
-if __name__ == "__main__":
+
+def build_parser(command=None):
+    """
+    :param command: Subcommand whose module is imported to register its options.
+    """
     parser = argparse.ArgumentParser(description="Database/TelegramBot Start Params")
     parser.add_argument("--init-db", action="store_true", help="Initialize Database")
     parser.add_argument("--run-bot", action="store_true", help="Start Telegram-bot")
+    parser.add_argument("--webhook", action="store_true", help="Receive Telegram updates via webhook instead of polling")
+    parser.add_argument("--profile", type=float, metavar="SECONDS", help="Profile the first SECONDS of the run")
+    subparsers = parser.add_subparsers(dest="command")
+    for name, (module, help) in COMMANDS.items():
+        # Without its options the subparser must not answer --help, the second pass does.
+        subparser = subparsers.add_parser(name, help=help, add_help=name == command)
+        if name == command:
+            importlib.import_module(module).add_arguments(subparser)
+    return parser
+
+
+def parse_args(argv=None):
+    command = build_parser().parse_known_args(argv)[0].command
+    return build_parser(command).parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    setup_logging()
 
-    args = parser.parse_args()
+    if args.command:
+        importlib.import_module(COMMANDS[args.command][0]).run(args)
+        raise SystemExit
 
     if not any([args.init_db, args.run_bot]):
         args.init_db = True
         args.run_bot = True
 
-    asyncio.run(main(init_db=args.init_db, run_bot=args.run_bot))
+    asyncio.run(main(init_db=args.init_db, run_bot=args.run_bot, webhook=args.webhook, profile=args.profile))
@@ -0,0 +1,110 @@
+"""
+Cold-start benchmark: how long each entry point takes to import in a fresh interpreter.
+
+Every run starts a new ``python -X importtime`` process, so nothing is cached in
+``sys.modules``; bytecode caches are warm after the first run, like in a container
+restart. Example:
+
+    python -m src.benchmark.import_time --runs 5 --top 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ENTRY_POINTS = {
+    "main": "import main",
+    "init-db": "import db.database",
+    "scrape": "import src.cli.scrape",
+    "worker": "import src.web_scraper.scraper",
+    "bot": "import src.bot.bot",
+}
+
+# Enough to validate Settings without a real .env.
+BENCH_ENV = {"TELEGRAM_API_KEY": "benchmark", "TELEGRAM_ADMIN_ID": "0"}
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """
+    Import time in microseconds per top-level package from ``-X importtime`` output.
+
+    Self times of all modules are summed by their root package, so ``sqlalchemy`` includes
+    every ``sqlalchemy.*`` submodule no matter who imported it.
+    """
+    totals: Dict[str, int] = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _, name = line[len("import time:") :].split("|")
+        if not own.strip().isdigit():
+            continue  # header line
+        totals[name.strip().split(".")[0]] += int(own)
+    return dict(totals)
+
+
+def measure(statement: str) -> Tuple[float, Dict[str, int]]:
+    """
+    Import ``statement`` in a new interpreter.
+
+    :return: Wall time in seconds and the per-package import times.
+    """
+    env = {**os.environ, **BENCH_ENV}
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+    )
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"{statement!r} failed:\n{proc.stderr[-2000:]}")
+    return elapsed, parse_importtime(proc.stderr)
+
+
+def run(entry_points: List[str], runs: int, top: int) -> Dict[str, Dict[str, float]]:
+    bare = [measure("pass") for _ in range(runs)]
+    baseline = statistics.median(elapsed for elapsed, _ in bare)
+    # site, encodings and friends are loaded by every interpreter and are not worth listing.
+    startup = set(bare[0][1])
+    print(f"{'entry point':<10} {'min ms':>8} {'median ms':>10} {'over bare python':>17}")
+
+    results = {}
+    for name in entry_points:
+        times = []
+        packages: Dict[str, List[int]] = defaultdict(list)
+        for _ in range(runs):
+            elapsed, totals = measure(ENTRY_POINTS[name])
+            times.append(elapsed)
+            for package, us in totals.items():
+                if package not in startup:
+                    packages[package].append(us)
+
+        median = statistics.median(times)
+        results[name] = {"min": min(times), "median": median, "overhead": median - baseline}
+        print(f"{name:<10} {1000 * min(times):>8.1f} {1000 * median:>10.1f} {1000 * (median - baseline):>17.1f}")
+
+        heaviest = sorted(((statistics.median(us), package) for package, us in packages.items()), reverse=True)
+        for package_us, package in heaviest[:top]:
+            print(f"    {package_us / 1000:8.1f} ms  {package}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time of the application entry points")
+    parser.add_argument(
+        "entry_points", nargs="*", metavar="ENTRY_POINT", help=f"Any of {', '.join(ENTRY_POINTS)} (all by default)"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per entry point")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest packages listed per entry point")
+    args = parser.parse_args()
+    unknown = set(args.entry_points) - set(ENTRY_POINTS)
+    if unknown:
+        parser.error(f"unknown entry points: {', '.join(sorted(unknown))}")
+    run(args.entry_points or list(ENTRY_POINTS), args.runs, args.top)
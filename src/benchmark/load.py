@@ -0,0 +1,146 @@
+"""
+End-to-end load benchmark: N simulated users scraping the local mock Cian server.
+
+Each user gets a bot-style scraper (notifications wired through notify_listings_handler)
+and all of them run on a SearchScheduler, like in TelegramBot. Example:
+
+    python -m src.benchmark.load --users 50 --duration 60 --workers 8 --latency 0.05 0.2 --rate-429 0.02
+"""
+
+import argparse
+import asyncio
+import resource
+import statistics
+import time
+from types import MethodType
+from typing import Any, Dict, List
+
+from src.benchmark.mock_server import MockCianServer
+from src.benchmark.replay import benchmark_db
+from src.loggers import setup_logging
+from src.scheduler import AdaptiveInterval, SearchScheduler
+from src.utils import notify_listings_handler
+from src.web_scraper.scraper import CianScraper
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process, falling back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+def percentile(values: List[float], q: int) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+async def run_load(
+    users: int,
+    duration: float,
+    workers: int,
+    interval: float,
+    server: MockCianServer,
+) -> Dict[str, float]:
+    base_url = await server.start()
+    async with benchmark_db():
+        delays: List[float] = []
+
+        async def notify(listings: List[Dict[str, Any]], user_id: int) -> None:
+            now = time.time()
+            for item in listings:
+                published = server.published_at(item.get("url", ""))
+                if published is not None:
+                    delays.append(now - published)
+
+        scrapers: Dict[int, CianScraper] = {}
+        for user_id in range(1, users + 1):
+            scraper = CianScraper(
+                telegram_user_id=user_id,
+                params={"deal_type": "sale", "engine_version": "2", "region": str(user_id)},
+                base_url=base_url,
+            )
+            decorated = notify_listings_handler(notify)(CianScraper.save_new_listings)
+            scraper.save_new_listings = MethodType(decorated, scraper)  # type: ignore[method-assign]
+            scrapers[user_id] = scraper
+
+        saved: List[int] = []
+
+        async def run_cycle(user_id: int) -> int:
+            found = await scrapers[user_id].run_once()
+            saved.append(found)
+            return found
+
+        scheduler = SearchScheduler(
+            run_cycle,
+            workers=workers,
+            policy=AdaptiveInterval(min_interval=interval, max_interval=interval, jitter=0),
+            persist=False,
+        )
+
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        await scheduler.start()
+        for user_id in scrapers:
+            await scheduler.add(user_id)
+        await asyncio.sleep(duration)
+        await scheduler.stop()
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+
+        for scraper in scrapers.values():
+            await scraper.close()
+        await server.stop()
+
+        return {
+            "cycles": len(saved),
+            "listings": sum(saved),
+            "listings_per_second": sum(saved) / elapsed,
+            "notify_p50": percentile(delays, 50),
+            "notify_p95": percentile(delays, 95),
+            "cpu_percent": 100 * cpu / elapsed,
+            "rss_mb": current_rss_mb(),
+            "requests": server.stats["requests"],
+            "injected_errors": server.stats[429] + server.stats[403],
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load benchmark against a local mock Cian server")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    parser.add_argument("--workers", type=int, default=4, help="Scheduler worker pool size")
+    parser.add_argument("--interval", type=float, default=5, help="Seconds between cycles of one user")
+    parser.add_argument("--page-size", type=int, default=28)
+    parser.add_argument("--publish-rate", type=float, default=0.5, help="New listings per second and user")
+    parser.add_argument("--latency", nargs=2, type=float, default=(0.0, 0.0), metavar=("MIN", "MAX"))
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-403", type=float, default=0.0)
+    args = parser.parse_args()
+    setup_logging()
+
+    server = MockCianServer(
+        page_size=args.page_size,
+        publish_rate=args.publish_rate,
+        latency=tuple(args.latency),
+        rate_429=args.rate_429,
+        rate_403=args.rate_403,
+    )
+    result = asyncio.run(run_load(args.users, args.duration, args.workers, args.interval, server))
+
+    print(f"cycles:               {result['cycles']}")
+    print(f"listings saved:       {result['listings']} ({result['listings_per_second']:.1f}/s)")
+    print(f"publish -> notify:    p50 {result['notify_p50']:.2f}s, p95 {result['notify_p95']:.2f}s")
+    print(f"requests:             {result['requests']} ({result['injected_errors']} injected errors)")
+    print(f"CPU:                  {result['cpu_percent']:.0f}%")
+    print(f"RSS:                  {result['rss_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
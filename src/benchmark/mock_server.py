@@ -0,0 +1,161 @@
+"""
+A local stand-in for cian.ru serving generated search and detail pages.
+
+The markup matches what ListingParser and DetailParser read. Every ``region`` query
+parameter gets its own stream of listings, published at ``publish_rate`` listings per
+second, so simulated users with different regions don't compete for the same offers.
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from src.loggers import logger
+
+CARD_LINK_CLASS = "_93444fe79c--link--eoxce"
+OFFER_ID_STEP = 1_000_000
+
+
+class MockCianServer:
+    def __init__(
+        self,
+        *,
+        page_size: int = 28,
+        publish_rate: float = 0.5,
+        initial_listings: int = 28,
+        latency: Tuple[float, float] = (0.0, 0.0),
+        rate_429: float = 0.0,
+        rate_403: float = 0.0,
+        seed: Optional[int] = 0,
+    ):
+        """
+        :param page_size: Number of cards on a search page.
+        :param publish_rate: New listings per second and region.
+        :param initial_listings: Listings every region starts with.
+        :param latency: Range (seconds) of the simulated response time.
+        :param rate_429: Probability of answering 429 Too Many Requests.
+        :param rate_403: Probability of answering 403 Forbidden.
+        :param seed: RNG seed for latency and error injection.
+        """
+        self.page_size = page_size
+        self.publish_rate = publish_rate
+        self.initial_listings = initial_listings
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.rate_403 = rate_403
+        self.rng = random.Random(seed)
+
+        self.started_at = time.time()
+        self.published: Dict[int, float] = {}
+        self._generated: Dict[int, int] = {}
+        self.stats: Counter[str | int] = Counter()
+        self.base_url = ""
+
+        self.app = web.Application()
+        self.app.router.add_get("/cat.php", self.search_page)
+        self.app.router.add_get("/sale/flat/{offer_id}/", self.detail_page)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Start serving. Port 0 picks a free port.
+
+        :return: Base URL of the server.
+        """
+        self.started_at = time.time()
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}"
+        logger.info(f"Mock Cian server listening on {self.base_url}")
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def published_at(self, url: str) -> Optional[float]:
+        """Publication time of the listing behind a detail URL."""
+        try:
+            return self.published.get(int(url.rstrip("/").rsplit("/", 1)[-1]))
+        except ValueError:
+            return None
+
+    def _listings(self, region: int) -> List[int]:
+        """Offer IDs published so far in a region, newest first."""
+        elapsed = time.time() - self.started_at
+        count = self.initial_listings + int(elapsed * self.publish_rate)
+        base = region * OFFER_ID_STEP
+        for n in range(self._generated.get(region, 0), count):
+            self.published[base + n] = self.started_at + max(0.0, (n - self.initial_listings + 1) / self.publish_rate)
+        self._generated[region] = max(count, self._generated.get(region, 0))
+        return [base + n for n in range(count - 1, -1, -1)]
+
+    async def _simulate(self, request: web.Request) -> Optional[web.Response]:
+        self.stats["requests"] += 1
+        delay = self.rng.uniform(*self.latency)
+        if delay:
+            await asyncio.sleep(delay)
+        roll = self.rng.random()
+        if roll < self.rate_429:
+            self.stats[429] += 1
+            return web.Response(status=429)
+        if roll < self.rate_429 + self.rate_403:
+            self.stats[403] += 1
+            return web.Response(status=403)
+        return None
+
+    async def search_page(self, request: web.Request) -> web.Response:
+        error = await self._simulate(request)
+        if error:
+            return error
+
+        region = int(request.query.get("region", 1))
+        page = int(request.query.get("p", 1))
+        offers = self._listings(region)[(page - 1) * self.page_size : page * self.page_size]
+        cards = "".join(
+            f'<article data-name="CardComponent"><a class="{CARD_LINK_CLASS}" href="{self.base_url}/sale/flat/{offer_id}/">'
+            f"Квартира {offer_id}</a></article>"
+            for offer_id in offers
+        )
+        return web.Response(text=f"<html><body>{cards}</body></html>", content_type="text/html")
+
+    async def detail_page(self, request: web.Request) -> web.Response:
+        error = await self._simulate(request)
+        if error:
+            return error
+
+        offer_id = int(request.match_info["offer_id"])
+        if offer_id not in self.published:
+            return web.Response(status=404)
+
+        rooms = offer_id % 4 + 1
+        area = 25 + offer_id % 90
+        ld_json = {
+            "@type": "Product",
+            "name": f"{rooms}-комн. квартира, {area} м²",
+            "description": f"Тестовое объявление {offer_id}",
+            "offers": {"price": str(3_000_000 + (offer_id % 100) * 50_000), "priceCurrency": "RUB"},
+            "image": [f"{self.base_url}/img/{offer_id}/{n}.jpg" for n in range(3)],
+        }
+        published = time.strftime("%d %b, %H:%M", time.localtime(self.published[offer_id]))
+        html = (
+            "<html><head>"
+            f'<script type="application/ld+json">{json.dumps(ld_json, ensure_ascii=False)}</script>'
+            "</head><body>"
+            f'<span data-mark="OfferTitle">{ld_json["name"]}</span>'
+            '<div data-name="AddressContainer"><a>Москва</a><a>ул. Тестовая</a>'
+            f"<a>д. {offer_id % 200}</a></div>"
+            f'<div data-mark="CreationDate">{published}</div>'
+            f'<div data-name="ObjectSummaryDescription">{area} м²</div>'
+            "</body></html>"
+        )
+        return web.Response(text=html, content_type="text/html")
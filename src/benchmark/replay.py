@@ -0,0 +1,81 @@
+"""
+Offline end-to-end throughput benchmark of CianScraper over recorded traffic.
+
+Record traffic with HTTP_RECORD_PATH=traffic.jsonl.gz while the bot runs, then:
+
+    python -m src.benchmark.replay traffic.jsonl.gz --latency 0.05 0.2 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator
+from urllib.parse import parse_qsl, urlsplit
+
+import db.database as db
+from src.loggers import setup_logging
+from src.web_scraper.replay import ReplayTransport, TrafficArchive
+from src.web_scraper.scraper import CianScraper
+
+
+@asynccontextmanager
+async def benchmark_db() -> AsyncIterator[None]:
+    """
+    Point the application at a fresh throwaway SQLite file, removed again on exit.
+    A file (not :memory:) lets concurrent scrapers use separate connections, like in production.
+    """
+    with tempfile.TemporaryDirectory(prefix="cian_bench_") as directory:
+        db.init_engine(f"sqlite+aiosqlite:///{Path(directory) / 'bench.db'}", connect_args={"timeout": 30})
+        try:
+            await db.init_db()
+            yield
+        finally:
+            if db.engine is not None:
+                await db.engine.dispose()
+
+
+async def run_benchmark(archive_path: str, latency: tuple[float, float], error_rate: float, seed: int) -> dict[str, Any]:
+    """
+    Run one cycle for every search page found in the archive, all searches concurrently.
+
+    :return: Totals and throughput of the run.
+    """
+    transport = ReplayTransport(TrafficArchive(archive_path), latency=latency, error_rate=error_rate, seed=seed)
+    searches = [dict(parse_qsl(urlsplit(url).query)) for url in transport.responses if "/cat.php" in url]
+
+    async with benchmark_db():
+        scrapers = [CianScraper(telegram_user_id=i, params=params, transport=transport) for i, params in enumerate(searches)]
+
+        started = time.perf_counter()
+        saved = await asyncio.gather(*(scraper.run_once() for scraper in scrapers))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "searches": len(scrapers),
+        "listings": sum(saved),
+        "seconds": elapsed,
+        "listings_per_second": sum(saved) / elapsed if elapsed else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded Cian traffic through CianScraper")
+    parser.add_argument("archive", help="Path to a traffic archive recorded with HTTP_RECORD_PATH")
+    parser.add_argument("--latency", nargs=2, type=float, default=(0.0, 0.0), metavar=("MIN", "MAX"))
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    setup_logging()
+
+    result = asyncio.run(run_benchmark(args.archive, tuple(args.latency), args.error_rate, args.seed))
+    print(
+        f"{result['searches']} searches, {result['listings']} listings in {result['seconds']:.2f}s "
+        f"({result['listings_per_second']:.1f} listings/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
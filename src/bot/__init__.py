@@ -1,3 +1,14 @@
-from .bot import TelegramBot
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .bot import TelegramBot
 
 __all__ = ["TelegramBot"]
+
+
+def __getattr__(name: str) -> Any:
+    # Importing the bot loads aiogram; only do it when the bot is actually used.
+    if name == "TelegramBot":
+        return import_module(".bot", __name__).TelegramBot
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,61 +1,214 @@
 import asyncio
-from typing import Dict, List
+import html
+from functools import partial
+from types import MethodType
+from typing import Any, Dict, List, Optional, Tuple
 
 from aiogram import Bot, Dispatcher, types
-from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 
 from configs.config import settings
-from src.loggers import logger
+from db.crud.manager_frontier import recover_frontier
+from db.crud.manager_users import get_or_create_user, get_search_config
+from db.database import database, enable_wal
+from src.loggers import logger, setup_logging
+from src.loop_monitor import LoopLagMonitor
+from src.metrics import (
+    NOTIFICATIONS,
+    NOTIFIED_LISTINGS,
+    NOTIFY_QUEUE_DEPTH,
+    NOTIFY_SECONDS,
+    SCHEDULER_PENDING,
+    SCHEDULER_RUNNING,
+    MetricsServer,
+)
+from src.profiler import SamplingProfiler, profile_to_file
+from src.scheduler import AdaptiveInterval, LeasedScheduler, SearchScheduler, WorkerSupervisor
+from src.tracing import traced
+from src.utils import error_handler, notify_listings_handler
+from src.utils.cache import TTLCache
 from src.web_scraper.scraper import CianScraper
 
+from .deliveries import DeliveryTracker
+from .digest import CALLBACK_PREFIX, DigestBook, parse_callback
+from .dispatcher import NotificationDispatcher, OutgoingMessage
+from .file_cache import FileIdCache
 from .handlers import cancel, open_settings, process_settings_callback
-from .handlers.commands import error_handler, menu_handler, search_handler, start_handler, stop_handler
+from .handlers.commands import (
+    digest_handler,
+    menu_handler,
+    search_handler,
+    start_handler,
+    stop_handler,
+)
+from .metadata import BotMetadataCache
+from .outbox import OutboxRelay
+from .webhook import WebhookServer
 
 
 class TelegramBot:
-    def __init__(self):
+    def __init__(self) -> None:
         self.bot = Bot(token=settings.TELEGRAM_API_KEY)
-        self.dp = Dispatcher()
+        self.metadata = BotMetadataCache(self.bot, me_ttl=settings.BOT_ME_TTL, chat_ttl=settings.CHAT_METADATA_TTL)
+        self.dp = Dispatcher(metadata=self.metadata)
         self.user_scrapers: dict[int, CianScraper] = {}
-        self.user_tasks: dict[int, asyncio.Task] = {}
+        self.notifier = NotificationDispatcher(
+            self.bot,
+            global_rate=settings.TELEGRAM_GLOBAL_RATE,
+            chat_rate=settings.TELEGRAM_CHAT_RATE,
+            workers=settings.NOTIFY_WORKERS,
+            metadata=self.metadata,
+        )
+        self.file_cache = FileIdCache(
+            max_memory=settings.FILE_ID_CACHE_SIZE,
+            max_rows=settings.FILE_ID_MAX_ROWS,
+            ttl_days=settings.FILE_ID_TTL_DAYS,
+        )
+        self.digests = DigestBook(page_size=settings.DIGEST_PAGE_SIZE, ttl=settings.DIGEST_TTL)
+        self.digest_flags: TTLCache[int, bool] = TTLCache(settings.CHAT_METADATA_TTL)
+        self.profiler = SamplingProfiler(interval=settings.PROFILE_INTERVAL)
+        self.loop_monitor = LoopLagMonitor(interval=settings.LOOP_LAG_INTERVAL, threshold=settings.LOOP_LAG_THRESHOLD)
+        self.deliveries = DeliveryTracker(max_chunks=settings.DELIVERY_CACHE_CHUNKS)
+        self.outbox: Optional[OutboxRelay] = None
+        self.workers: Optional[WorkerSupervisor] = None
+        self.scheduler: LeasedScheduler | SearchScheduler
+        if settings.SCRAPER_PROCESSES:
+            # Searches run in worker processes, which hand new listings over through the outbox.
+            self.scheduler = LeasedScheduler(
+                poll_interval=settings.WORKER_POLL_INTERVAL * 5,
+                shards=settings.SCRAPER_PROCESSES,
+                stall_after=settings.JOB_STALL_SECONDS,
+            )
+            self.outbox = OutboxRelay(
+                self.send_notification,
+                poll_interval=settings.WORKER_POLL_INTERVAL,
+                batch=settings.OUTBOX_BATCH,
+                max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+            )
+            if settings.SPAWN_SCRAPERS:
+                self.workers = WorkerSupervisor(settings.SCRAPER_PROCESSES)
+        else:
+            self.scheduler = SearchScheduler(
+                self._run_search_cycle,
+                workers=settings.SCHEDULER_WORKERS,
+                policy=AdaptiveInterval(
+                    min_interval=settings.SEARCH_MIN_INTERVAL,
+                    max_interval=settings.SEARCH_MAX_INTERVAL,
+                    target=settings.SEARCH_TARGET_NEW,
+                    smoothing=settings.SEARCH_RATE_SMOOTHING,
+                ),
+            )
 
         self.dp.message.register(start_handler, Command("start", "help"))
         self.dp.message.register(menu_handler, Command("menu"))
         self.dp.message.register(self.status_handler, Command("status"))
         self.dp.message.register(self.handle_search, Command("search"))
         self.dp.message.register(self.handle_stop, Command("stop"))
+        self.dp.message.register(self.handle_digest, Command("digest"))
+        self.dp.message.register(self.profile_handler, Command("profile"))
 
         self.dp.callback_query.register(self.handle_search_callback, lambda c: c.data == "start_search")
         self.dp.callback_query.register(open_settings, lambda c: c.data == "settings")
         self.dp.callback_query.register(cancel, lambda c: c.data == "cancel")
+        self.dp.callback_query.register(self.handle_digest_callback, lambda c: (c.data or "").startswith(f"{CALLBACK_PREFIX}:"))
         self.dp.callback_query.register(process_settings_callback)
+        self.dp.my_chat_member.register(self.handle_chat_member)
+
+    async def handle_chat_member(self, update: types.ChatMemberUpdated) -> None:
+        self.metadata.invalidate_chat(update.chat.id)
 
-    async def handle_search_callback(self, callback: types.CallbackQuery):
-        await search_handler(callback.message, self)
+    async def handle_search_callback(self, callback: types.CallbackQuery) -> None:
+        if isinstance(callback.message, types.Message):
+            await search_handler(callback.message, self)
         await callback.answer()
 
-    async def handle_search(self, message: types.Message):
+    async def handle_search(self, message: types.Message) -> None:
         await search_handler(message, self)
 
-    async def handle_stop(self, message: types.Message):
+    async def handle_stop(self, message: types.Message) -> None:
         await stop_handler(message, self)
 
+    async def handle_digest(self, message: types.Message) -> None:
+        await digest_handler(message, self)
+
+    async def handle_digest_callback(self, callback: types.CallbackQuery) -> None:
+        parsed = parse_callback(callback.data or "")
+        if parsed is None or not isinstance(callback.message, types.Message):
+            await callback.answer()
+            return
+        digest_id, action, number = parsed
+
+        if action == "page":
+            page = self.digests.page(digest_id, number)
+            if page is None:
+                await callback.answer("Подборка устарела", show_alert=True)
+                return
+            text, markup = page
+            if text != callback.message.html_text or markup != callback.message.reply_markup:
+                await callback.message.edit_text(text, reply_markup=markup, parse_mode="HTML", disable_web_page_preview=True)
+            await callback.answer()
+        elif action == "item":
+            item = self.digests.item(digest_id, number)
+            if item is None:
+                await callback.answer("Подборка устарела", show_alert=True)
+                return
+            await self._enqueue_cards([item], callback.message.chat.id)
+            await callback.answer()
+
+    async def is_digest_enabled(self, user_id: int) -> bool:
+        enabled = self.digest_flags.get(user_id)
+        if enabled is None:
+            async with database() as db:
+                user = await get_or_create_user(db, user_id)
+            enabled = bool(user.digest)
+            self.digest_flags.set(user_id, enabled)
+        return enabled
+
     @error_handler
-    async def send_notification(self, listings: List[Dict], user_id: int) -> None:
+    @traced("send_notification")
+    async def send_notification(self, listings: List[Dict[str, Any]], user_id: int) -> None:
         """
-        Send notifications about new listings, handling flood control.
+        Queue notifications about new listings. Delivery and flood control are handled by the notifier.
 
         :param listings: List of new listings to notify about.
         :param user_id: Telegram_ID user
         """
-        user = await self.bot.get_chat(user_id)
+        user = await self.metadata.get_chat(user_id)
         if user.type == "bot":
             return
 
         if not listings:
             return
 
+        with NOTIFY_SECONDS.time():
+            await self._notify(listings, user_id)
+        NOTIFIED_LISTINGS.inc(len(listings))
+
+    async def _notify(self, listings: List[Dict[str, Any]], user_id: int) -> None:
+        if len(listings) >= settings.DIGEST_MIN_LISTINGS and await self.is_digest_enabled(user_id):
+            digest_id = self.digests.add(listings)
+            page = self.digests.page(digest_id, 0)
+            if page is not None:
+                text, markup = page
+                self.notifier.enqueue(
+                    user_id,
+                    "send_message",
+                    text=text,
+                    reply_markup=markup,
+                    parse_mode="HTML",
+                    disable_web_page_preview=True,
+                )
+                NOTIFICATIONS.inc(mode="digest")
+                logger.info(f"Queued a digest of {len(listings)} listings for user {user_id}")
+                return
+
+        NOTIFICATIONS.inc(mode="cards")
+        await self._enqueue_cards(listings, user_id)
+
+    async def _enqueue_cards(self, listings: List[Dict[str, Any]], user_id: int) -> None:
+        """
+        Queue one message per listing, with up to five photos.
+        """
         messages_to_send = []
 
         for item in listings:
@@ -79,80 +232,234 @@ class TelegramBot:
                 text_parts.append(f"🔗 [Ссылка]({item['url']})")
 
             text = "\n".join(text_parts)
-            images = item.get("images", [])
+            images = item.get("images", [])[:5]
 
             messages_to_send.append((text, images))
 
-        batch_size = 5
-        for i in range(0, len(messages_to_send), batch_size):
-            batch = messages_to_send[i : i + batch_size]
-
-            for text, images in batch:
-                try:
-                    if len(images) == 1:
-                        await self.bot.send_photo(
-                            chat_id=user_id,
-                            photo=images[0],
-                            caption=text,
-                            parse_mode="Markdown",
-                        )
-                    elif len(images) > 1:
-                        media = [types.InputMediaPhoto(media=img) for img in images[:5]]
-                        media[0].caption = text
-                        media[0].parse_mode = "Markdown"
-
-                        await self.bot.send_media_group(chat_id=user_id, media=media)
-                    else:
-                        await self.bot.send_message(
-                            chat_id=user_id,
-                            text=text,
-                            parse_mode="Markdown",
-                        )
-
-                    logger.info(f"Notification sent to user {user_id}")
-
-                    await asyncio.sleep(1.5)
-
-                except TelegramRetryAfter as e:
-                    wait_time = e.retry_after
-                    logger.warning(f"Flood control triggered! Waiting {wait_time} seconds before retrying...")
-                    await asyncio.sleep(wait_time)
-                    continue
-
-                except TelegramAPIError as e:
-                    logger.error(f"Telegram API error: {e}")
-                    break
-
-        logger.info(f"All notifications sent to user {user_id} for {len(listings)}")
+        file_ids = await self.file_cache.get_many(img for _, images in messages_to_send for img in images)
+
+        for text, images in messages_to_send:
+            uploads = [img for img in images if img not in file_ids]
+            on_sent = partial(self.file_cache.remember_sent, images) if uploads else None
+            cached = [img for img in images if img in file_ids]
+            on_rejected = partial(self._upload_from_urls, images, cached, text) if cached else None
+            if len(images) == 1:
+                self.notifier.enqueue(
+                    user_id,
+                    "send_photo",
+                    on_sent=on_sent,
+                    on_rejected=on_rejected,
+                    photo=file_ids.get(images[0], images[0]),
+                    caption=text,
+                    parse_mode="Markdown",
+                )
+            elif len(images) > 1:
+                self.notifier.enqueue(
+                    user_id,
+                    "send_media_group",
+                    cost=len(images),
+                    on_sent=on_sent,
+                    on_rejected=on_rejected,
+                    media=self._media_group([file_ids.get(img, img) for img in images], text),
+                )
+            else:
+                self.notifier.enqueue(user_id, "send_message", text=text, parse_mode="Markdown")
+
+        logger.info(f"Queued {len(messages_to_send)} notifications for user {user_id}, queue depth {self.notifier.queue_depth}")
+
+    @staticmethod
+    def _media_group(photos: List[str], caption: str) -> List[types.InputMediaPhoto]:
+        media = [types.InputMediaPhoto(media=photo) for photo in photos]
+        media[0].caption = caption
+        media[0].parse_mode = "Markdown"
+        return media
+
+    async def _upload_from_urls(self, images: List[str], cached: List[str], caption: str, message: OutgoingMessage) -> bool:
+        """
+        Telegram rejected a message with cached file_ids: forget them and send the photos by URL.
+        """
+        await self.file_cache.forget(cached)
+        if message.method == "send_photo":
+            message.kwargs["photo"] = images[0]
+        else:
+            message.kwargs["media"] = self._media_group(images, caption)
+        message.on_sent = partial(self.file_cache.remember_sent, images)
+        return True
 
     @error_handler
-    async def status_handler(self, message: types.Message):
+    async def status_handler(self, message: types.Message) -> None:
         user_id = message.chat.id
-        if user_id in self.user_tasks and not self.user_tasks[user_id].done():
+        if self.scheduler.is_active(user_id):
             await message.answer("🔄 Поиск активен.")
         else:
             await message.answer("🛑 Поиск не запущен.")
 
+        if str(user_id) == str(settings.TELEGRAM_ADMIN_ID):
+            stats = self.notifier.stats()
+            await message.answer(
+                f"📬 Очередь: {stats['queue_depth']} сообщений в {stats['chats']} чатах\n"
+                f"✅ Отправлено: {stats['sent']}, 🔁 повторов: {stats['retried']}, ❌ ошибок: {stats['failed']}\n"
+                f"⏱ Задержка доставки: p50 {stats['latency_p50']:.1f}s, p95 {stats['latency_p95']:.1f}s\n"
+                f"🐢 Event loop: макс. задержка {self.loop_monitor.max_lag:.3f}s, "
+                f"блокировок: {len(self.loop_monitor.reports)}"
+            )
+
     @error_handler
-    async def _run_scraper(self, scraper: CianScraper):
+    async def profile_handler(self, message: types.Message, command: CommandObject) -> None:
+        """
+        /profile N: sample the running process for N seconds and send the result to the admin.
+        """
+        if str(message.chat.id) != str(settings.TELEGRAM_ADMIN_ID):
+            return
+        try:
+            duration = float(command.args or 30)
+        except ValueError:
+            await message.answer("Использование: /profile <секунды>")
+            return
+        duration = min(max(duration, 1), settings.PROFILE_MAX_SECONDS)
+        if self.profiler.running:
+            await message.answer("⏳ Профилирование уже идёт.")
+            return
+
+        await message.answer(f"🔬 Профилирую {duration:.0f}s...")
+        path, result = await profile_to_file(self.profiler, duration, settings.PROFILE_DIR)
+        await message.answer(f"<pre>{html.escape(result.summary())}</pre>", parse_mode="HTML")
+        await message.answer_document(types.FSInputFile(path))
+
+    async def _build_scraper(self, user_id: int) -> CianScraper:
         """
-        Run the scraper and handle errors.
+        Create a scraper for the user's saved search that notifies them about new listings.
 
-        :param message: The message object from the user.
+        :param user_id: Telegram_ID user
         """
+        async with database() as db:
+            config = await get_search_config(db, user_id)
+
+        scraper = CianScraper(params=config.params, freeze_time=10, telegram_user_id=user_id, search_url=config.url)
+        original_method = CianScraper.save_new_listings
+        decorated_func = notify_listings_handler(self.send_notification, self.deliveries)(original_method)
+        scraper.save_new_listings = MethodType(decorated_func, scraper)  # type: ignore[method-assign]
+        return scraper
+
+    async def drop_scraper(self, user_id: int) -> None:
+        scraper = self.user_scrapers.pop(user_id, None)
+        if scraper and not scraper.is_running:
+            await scraper.close()
+
+    @error_handler
+    async def _run_search_cycle(self, user_id: int) -> int:
+        """
+        Run one scrape cycle for the user. Called by the scheduler workers.
+
+        :param user_id: Telegram_ID user
+        :return: Number of new listings found, used to adapt the polling interval.
+        """
+        scraper = self.user_scrapers.get(user_id)
+        if scraper is None:
+            scraper = await self._build_scraper(user_id)
+            self.user_scrapers[user_id] = scraper
+
         scraper.is_running = True
         try:
-            await scraper.run()
-        except asyncio.CancelledError:
-            logger.info(f"Scraper for user {scraper.telegram_user_id} was stopped.")
+            return await scraper.run_once()
         finally:
             scraper.is_running = False
+            if self.user_scrapers.get(user_id) is not scraper:
+                await scraper.close()
 
-    async def run(self):
-        "Start the boot"
-        await self.dp.start_polling(self.bot)
+    async def run(self, webhook: bool = False) -> None:
+        """
+        Start the bot.
+
+        :param webhook: Receive updates through the webhook server instead of long polling.
+        """
+        if webhook:
+            self._check_webhook_settings()
+        if self.outbox is None:
+            # Worker processes may still hold frontier leases, so only recover them when scraping in-process.
+            async with database() as db:
+                released = await recover_frontier(db)
+            if released:
+                logger.info(f"Released {released} frontier URLs left in progress")
+        else:
+            await enable_wal()
+        await self.file_cache.evict()
+        self.notifier.start()
+        await self.scheduler.start()
+        if self.outbox is not None:
+            self.outbox.start()
+        if self.workers is not None:
+            await self.workers.start()
+        if settings.LOOP_MONITOR:
+            self.loop_monitor.start()
+
+        metrics_server = None
+        if settings.METRICS_PORT:
+            NOTIFY_QUEUE_DEPTH.set_function(lambda: self.notifier.queue_depth)
+            SCHEDULER_PENDING.set_function(lambda: self.scheduler.pending)
+            SCHEDULER_RUNNING.set_function(lambda: self.scheduler.running)
+            metrics_server = MetricsServer()
+            await metrics_server.start(settings.METRICS_HOST, settings.METRICS_PORT)
+        try:
+            if webhook:
+                await self._run_webhook()
+            else:
+                # A webhook left by an earlier --webhook run makes getUpdates fail with 409 Conflict.
+                await self.bot.delete_webhook()
+                # The session stays open until the notifier has drained its queue.
+                await self.dp.start_polling(self.bot, close_bot_session=False)
+        finally:
+            if self.workers is not None:
+                await self.workers.stop()
+            if self.outbox is not None:
+                await self.outbox.stop()
+            await self.scheduler.stop()
+            await self.notifier.stop()
+            for user_id in list(self.user_scrapers):
+                await self.drop_scraper(user_id)
+            if metrics_server:
+                await metrics_server.stop()
+            await self.loop_monitor.stop()
+            await self.bot.session.close()
+
+    @staticmethod
+    def _check_webhook_settings() -> Tuple[str, str]:
+        """
+        :return: Webhook URL and secret token.
+        """
+        if not settings.WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL must be set to run in webhook mode")
+        # Without a secret anyone who finds the port could post forged updates.
+        if not settings.WEBHOOK_SECRET:
+            raise ValueError("WEBHOOK_SECRET must be set to run in webhook mode")
+        return settings.WEBHOOK_URL, settings.WEBHOOK_SECRET
+
+    async def _run_webhook(self) -> None:
+        url, secret = self._check_webhook_settings()
+
+        server = WebhookServer(
+            self.dp,
+            self.bot,
+            path=settings.WEBHOOK_PATH,
+            secret_token=secret,
+            workers=settings.WEBHOOK_WORKERS,
+            queue_size=settings.WEBHOOK_QUEUE_SIZE,
+        )
+        await server.start(settings.WEBHOOK_HOST, settings.WEBHOOK_PORT)
+        await self.bot.set_webhook(
+            url.rstrip("/") + settings.WEBHOOK_PATH,
+            secret_token=secret,
+            allowed_updates=self.dp.resolve_used_update_types(),
+        )
+        await self.dp.emit_startup(bot=self.bot)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.dp.emit_shutdown(bot=self.bot)
+            await server.stop()
 
 
 if __name__ == "__main__":
+    setup_logging()
     bot = TelegramBot()
     asyncio.run(bot.run())
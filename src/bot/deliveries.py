@@ -0,0 +1,77 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from db.crud.manager_deliveries import get_delivery_chunks, save_delivery_chunks
+from db.database import database
+from db.models import DELIVERY_CHUNK_BITS
+
+CHUNK_BYTES = DELIVERY_CHUNK_BITS // 8
+
+
+class DeliveryTracker:
+    """
+    Remembers which listings every user has been sent.
+
+    A listing saved by one user's search is still sent to every other user whose search
+    shows it, once. Sent ids are kept as per-user bitmaps in user_deliveries; recently used
+    chunks are cached in an LRU of at most ``max_chunks`` kilobyte-sized bitmaps, so a heavy
+    user's history doesn't stay in memory.
+    """
+
+    def __init__(self, max_chunks: int = 4096):
+        self.max_chunks = max_chunks
+        self._chunks: OrderedDict[Tuple[int, int], bytearray] = OrderedDict()
+
+    def _remember(self, key: Tuple[int, int], bits: bytearray) -> None:
+        self._chunks[key] = bits
+        self._chunks.move_to_end(key)
+        while len(self._chunks) > self.max_chunks:
+            self._chunks.popitem(last=False)
+
+    async def _load(self, tg_id: int, chunks: set[int]) -> Dict[int, bytearray]:
+        loaded: Dict[int, bytearray] = {}
+        missing = []
+        for chunk in chunks:
+            bits = self._chunks.get((tg_id, chunk))
+            if bits is None:
+                missing.append(chunk)
+            else:
+                self._chunks.move_to_end((tg_id, chunk))
+                loaded[chunk] = bits
+
+        if missing:
+            async with database() as db:
+                stored = await get_delivery_chunks(db, tg_id, missing)
+            for chunk in missing:
+                loaded[chunk] = bytearray(stored.get(chunk) or CHUNK_BYTES)
+                self._remember((tg_id, chunk), loaded[chunk])
+        return loaded
+
+    async def claim(self, tg_id: int, listings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Return the listings the user has not been sent yet and mark them as sent.
+
+        Listings are marked before delivery, so a failed send is not retried on the next cycle.
+
+        :param listings: Listing records with an ``id``.
+        """
+        if not listings:
+            return []
+        bitmaps = await self._load(tg_id, {listing["id"] // DELIVERY_CHUNK_BITS for listing in listings})
+
+        fresh = []
+        dirty = set()
+        for listing in listings:
+            chunk, bit = divmod(listing["id"], DELIVERY_CHUNK_BITS)
+            bits = bitmaps[chunk]
+            mask = 1 << (bit % 8)
+            if bits[bit // 8] & mask:
+                continue
+            bits[bit // 8] |= mask
+            dirty.add(chunk)
+            fresh.append(listing)
+
+        if dirty:
+            async with database() as db:
+                await save_delivery_chunks(db, tg_id, {chunk: bytes(bitmaps[chunk]) for chunk in dirty})
+        return fresh
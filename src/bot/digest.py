@@ -0,0 +1,85 @@
+import html
+import secrets
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from src.utils.cache import TTLCache
+
+CALLBACK_PREFIX = "digest"
+
+
+class DigestBook:
+    """
+    Keeps recent digests so their pages and listings can be opened from inline buttons.
+
+    A digest is one message listing many new listings, ``page_size`` per page, instead of
+    one photo message per listing. Digests expire after ``ttl`` seconds; older buttons
+    answer that the digest is no longer available.
+    """
+
+    def __init__(self, page_size: int = 10, ttl: float = 86400, max_digests: int = 10000):
+        self.page_size = page_size
+        self._digests: TTLCache[str, List[Dict[str, Any]]] = TTLCache(ttl, max_size=max_digests)
+
+    def add(self, listings: List[Dict[str, Any]]) -> str:
+        digest_id = secrets.token_hex(4)
+        self._digests.set(digest_id, listings)
+        return digest_id
+
+    def pages(self, digest_id: str) -> int:
+        listings = self._digests.get(digest_id) or []
+        return max(1, -(-len(listings) // self.page_size))
+
+    def item(self, digest_id: str, index: int) -> Optional[Dict[str, Any]]:
+        listings = self._digests.get(digest_id)
+        if listings is None or not 0 <= index < len(listings):
+            return None
+        return listings[index]
+
+    def page(self, digest_id: str, page: int) -> Optional[Tuple[str, InlineKeyboardMarkup]]:
+        """
+        Render a page of the digest as HTML text and its keyboard.
+        """
+        listings = self._digests.get(digest_id)
+        if listings is None:
+            return None
+        pages = self.pages(digest_id)
+        page = min(max(page, 0), pages - 1)
+        start = page * self.page_size
+        chunk = listings[start : start + self.page_size]
+
+        lines = [f"🏠 <b>Новых объявлений: {len(listings)}</b>"]
+        for number, item in enumerate(chunk, start=start + 1):
+            title = html.escape(str(item.get("title") or "Объявление"))
+            line = f'{number}. <a href="{html.escape(item.get("url", ""))}">{title}</a>'
+            if item.get("price"):
+                line += f" — {html.escape(str(item['price']))}"
+            if item.get("address"):
+                line += f"\n    📍 {html.escape(str(item['address']))}"
+            lines.append(line)
+
+        buttons = [
+            InlineKeyboardButton(text=str(number), callback_data=f"{CALLBACK_PREFIX}:{digest_id}:item:{number - 1}")
+            for number in range(start + 1, start + len(chunk) + 1)
+        ]
+        rows = [buttons[i : i + 5] for i in range(0, len(buttons), 5)]
+        if pages > 1:
+            rows.append(
+                [
+                    InlineKeyboardButton(text="◀️", callback_data=f"{CALLBACK_PREFIX}:{digest_id}:page:{page - 1}"),
+                    InlineKeyboardButton(text=f"{page + 1}/{pages}", callback_data=f"{CALLBACK_PREFIX}:{digest_id}:page:{page}"),
+                    InlineKeyboardButton(text="▶️", callback_data=f"{CALLBACK_PREFIX}:{digest_id}:page:{page + 1}"),
+                ]
+            )
+        return "\n".join(lines), InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def parse_callback(data: str) -> Optional[Tuple[str, str, int]]:
+    """
+    Split digest callback data into (digest_id, action, number).
+    """
+    parts = data.split(":")
+    if len(parts) != 4 or parts[0] != CALLBACK_PREFIX or not parts[3].lstrip("-").isdigit():
+        return None
+    return parts[1], parts[2], int(parts[3])
@@ -0,0 +1,306 @@
+import asyncio
+import contextlib
+import statistics
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramMigrateToChat,
+    TelegramRetryAfter,
+)
+
+from src.bot.metadata import BotMetadataCache
+from src.loggers import logger
+from src.metrics import TELEGRAM_LATENCY, TELEGRAM_SENT
+from src.utils.rate_limit import TokenBucket
+
+# Parts of the bad request errors Telegram returns for a file_id it no longer accepts.
+FILE_ID_ERRORS = ("wrong file identifier", "wrong remote file identifier", "file_id", "file reference")
+
+
+def _is_file_id_error(error: TelegramBadRequest) -> bool:
+    text = error.message.lower()
+    return any(part in text for part in FILE_ID_ERRORS)
+
+
+class OutgoingMessage:
+    """
+    A queued Bot API call.
+
+    :param chat_id: Recipient chat.
+    :param method: Bot method name, e.g. "send_message" or "send_media_group".
+    :param kwargs: Arguments of the call, without chat_id.
+    :param cost: Number of messages the call counts as against flood limits.
+    :param on_sent: Coroutine function called with the API result once the call succeeded.
+    :param on_rejected: Coroutine function called with the message when Telegram rejects one of its
+        file_ids. It may fix up the message and return True to have it sent once more.
+    """
+
+    def __init__(
+        self,
+        chat_id: int,
+        method: str,
+        kwargs: Dict[str, Any],
+        cost: int = 1,
+        *,
+        on_sent: Optional[Callable[[Any], Awaitable[None]]] = None,
+        on_rejected: Optional[Callable[["OutgoingMessage"], Awaitable[bool]]] = None,
+    ):
+        self.chat_id = chat_id
+        self.method = method
+        self.kwargs = kwargs
+        self.cost = cost
+        self.on_sent = on_sent
+        self.on_rejected = on_rejected
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+
+class NotificationDispatcher:
+    """
+    Central outbound queue for Telegram messages.
+
+    Every chat has its own FIFO queue and token bucket, and all chats share a global bucket,
+    following Telegram's limits (about 30 messages per second overall and one per second per
+    chat). Different chats are served in parallel by a pool of workers, while the messages of
+    one chat go out strictly in order. A flood-controlled message stays at the head of its
+    chat's queue and is retried after ``retry_after``. Blocked and migrated chats are dropped
+    from ``metadata``, if given.
+
+    Buckets of chats with nothing queued are evicted once they have refilled, at most every
+    ``sweep_interval`` seconds: a full bucket is what a new one starts as, so nothing is lost.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        *,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 1.0,
+        workers: int = 8,
+        max_attempts: int = 5,
+        metadata: Optional[BotMetadataCache] = None,
+        sweep_interval: float = 60.0,
+    ):
+        self.bot = bot
+        self.metadata = metadata
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.sweep_interval = sweep_interval
+
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._queues: Dict[int, Deque[OutgoingMessage]] = {}
+        self._scheduled: Set[int] = set()
+        self._ready: asyncio.Queue[int] = asyncio.Queue()
+        self._timers: Set[asyncio.TimerHandle] = set()
+        self._tasks: List[asyncio.Task[None]] = []
+        self._swept_at = time.monotonic()
+
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.latencies: Deque[float] = deque(maxlen=1000)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of messages waiting to be sent."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> Dict[str, float]:
+        latencies = sorted(self.latencies)
+        return {
+            "queue_depth": self.queue_depth,
+            "chats": len(self._queues),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "latency_p50": statistics.median(latencies) if latencies else 0.0,
+            "latency_p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+        }
+
+    def start(self) -> None:
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._work()))
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """
+        Send what is still queued, for at most ``drain_timeout`` seconds, then stop the workers.
+        Listings are marked as delivered when they are queued, so dropping the queue would lose them.
+        """
+        if self._tasks and self._queues:
+            logger.info(f"Sending {self.queue_depth} queued messages before stopping")
+            await self.join(drain_timeout)
+            if self._queues:
+                logger.warning(f"Dropping {self.queue_depth} messages still queued after {drain_timeout:.0f}s")
+        for timer in self._timers:
+            timer.cancel()
+        self._timers.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def join(self, timeout: float | None = None) -> None:
+        """Wait until every queued message was sent or dropped."""
+        with contextlib.suppress(asyncio.TimeoutError):
+            async with asyncio.timeout(timeout):
+                while self._queues:
+                    await asyncio.sleep(0.05)
+
+    def enqueue(
+        self,
+        chat_id: int,
+        method: str,
+        cost: int = 1,
+        on_sent: Optional[Callable[[Any], Awaitable[None]]] = None,
+        on_rejected: Optional[Callable[[OutgoingMessage], Awaitable[bool]]] = None,
+        **kwargs: Any,
+    ) -> OutgoingMessage:
+        """
+        Queue a Bot API call for ``chat_id``. Returns immediately.
+        """
+        message = OutgoingMessage(chat_id, method, kwargs, cost, on_sent=on_sent, on_rejected=on_rejected)
+        self._queues.setdefault(chat_id, deque()).append(message)
+        if chat_id not in self._scheduled:
+            self._scheduled.add(chat_id)
+            self._schedule(chat_id, self._chat_bucket(chat_id).delay(cost))
+        return message
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, capacity=self.chat_burst)
+        return bucket
+
+    def _schedule(self, chat_id: int, delay: float) -> None:
+        if delay <= 0:
+            self._ready.put_nowait(chat_id)
+            return
+
+        def wake() -> None:
+            self._timers.discard(timer)
+            self._ready.put_nowait(chat_id)
+
+        timer = asyncio.get_running_loop().call_later(delay, wake)
+        self._timers.add(timer)
+
+    async def _acquire_global(self, cost: int) -> None:
+        while (delay := self.global_bucket.delay(cost)) > 0:
+            await asyncio.sleep(delay)
+        self.global_bucket.consume(cost)
+
+    async def _work(self) -> None:
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._queues.get(chat_id)
+            if not queue:
+                self._scheduled.discard(chat_id)
+                self._queues.pop(chat_id, None)
+                continue
+
+            message = queue[0]
+            await self._acquire_global(message.cost)
+            self._chat_bucket(chat_id).consume(message.cost)
+            message.attempts += 1
+
+            try:
+                result = await getattr(self.bot, message.method)(chat_id=chat_id, **message.kwargs)
+            except TelegramRetryAfter as e:
+                self.retried += 1
+                TELEGRAM_SENT.inc(result="flood")
+                if message.attempts < self.max_attempts:
+                    logger.warning(f"Flood control for chat {chat_id}, retrying in {e.retry_after}s")
+                    self._schedule(chat_id, e.retry_after)
+                    continue
+                logger.error(f"Giving up on message to chat {chat_id} after {message.attempts} attempts")
+                self.failed += 1
+                queue.popleft()
+            except TelegramForbiddenError as e:
+                logger.warning(f"Chat {chat_id} blocked the bot, dropping {len(queue)} messages: {e}")
+                TELEGRAM_SENT.inc(result="blocked")
+                self.failed += len(queue)
+                queue.clear()
+                if self.metadata:
+                    self.metadata.invalidate_chat(chat_id)
+            except TelegramMigrateToChat as e:
+                new_chat_id = e.migrate_to_chat_id
+                logger.warning(f"Chat {chat_id} migrated to {new_chat_id}, moving {len(queue)} messages")
+                TELEGRAM_SENT.inc(result="migrated")
+                if self.metadata:
+                    self.metadata.migrate_chat(chat_id, new_chat_id)
+                while queue:
+                    moved = queue.popleft()
+                    self.enqueue(new_chat_id, moved.method, moved.cost, moved.on_sent, moved.on_rejected, **moved.kwargs)
+            except TelegramBadRequest as e:
+                TELEGRAM_SENT.inc(result="error")
+                if _is_file_id_error(e) and await self._retry_rejected(message, e):
+                    self._schedule(chat_id, self._chat_bucket(chat_id).delay(message.cost))
+                    continue
+                logger.error(f"Telegram rejected a message to chat {chat_id}: {e}")
+                self.failed += 1
+                queue.popleft()
+            except TelegramAPIError as e:
+                logger.error(f"Telegram API error for chat {chat_id}: {e}")
+                TELEGRAM_SENT.inc(result="error")
+                self.failed += 1
+                queue.popleft()
+            except Exception as e:
+                logger.exception(f"Failed to send message to chat {chat_id}: {e}")
+                TELEGRAM_SENT.inc(result="error")
+                self.failed += 1
+                queue.popleft()
+            else:
+                queue.popleft()
+                self.sent += 1
+                latency = time.monotonic() - message.enqueued_at
+                self.latencies.append(latency)
+                TELEGRAM_SENT.inc(result="sent")
+                TELEGRAM_LATENCY.observe(latency)
+                if message.on_sent:
+                    try:
+                        await message.on_sent(result)
+                    except Exception as e:
+                        logger.error(f"on_sent callback failed for chat {chat_id}: {e}")
+
+            if queue:
+                self._schedule(chat_id, self._chat_bucket(chat_id).delay(queue[0].cost))
+            else:
+                self._queues.pop(chat_id, None)
+                self._scheduled.discard(chat_id)
+                self._evict_idle_buckets()
+
+    async def _retry_rejected(self, message: OutgoingMessage, error: TelegramBadRequest) -> bool:
+        on_rejected, message.on_rejected = message.on_rejected, None
+        if on_rejected is None:
+            return False
+        try:
+            retry = await on_rejected(message)
+        except Exception as e:
+            logger.error(f"on_rejected callback failed for chat {message.chat_id}: {e}")
+            return False
+        if retry:
+            self.retried += 1
+            logger.warning(f"Telegram rejected a message to chat {message.chat_id} ({error}), sending it once more")
+        return retry
+
+    def _evict_idle_buckets(self) -> None:
+        now = time.monotonic()
+        if now - self._swept_at < self.sweep_interval:
+            return
+        self._swept_at = now
+        idle = [
+            chat_id
+            for chat_id, bucket in self._chat_buckets.items()
+            if chat_id not in self._queues and bucket.delay(bucket.capacity, now) == 0
+        ]
+        for chat_id in idle:
+            del self._chat_buckets[chat_id]
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List
+
+from db.crud.manager_files import delete_file_ids, evict_file_ids, get_file_ids, save_file_ids
+from db.database import database
+from db.models import utcnow
+from src.loggers import logger
+
+
+class FileIdCache:
+    """
+    Maps image URLs to the Telegram file_id of their first upload.
+
+    Reusing a file_id lets Telegram skip downloading the same Cian photo again for every
+    user who gets the listing. Lookups hit an in-memory LRU first and the telegram_files
+    table second; the table is trimmed by age and size every ``evict_every`` writes.
+    """
+
+    def __init__(self, max_memory: int = 10000, max_rows: int = 100000, ttl_days: float = 30, evict_every: int = 500):
+        self.max_memory = max_memory
+        self.max_rows = max_rows
+        self.ttl = timedelta(days=ttl_days)
+        self.evict_every = evict_every
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._writes = 0
+
+    def _remember(self, url: str, file_id: str) -> None:
+        self._memory[url] = file_id
+        self._memory.move_to_end(url)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    async def get_many(self, urls: Iterable[str]) -> Dict[str, str]:
+        """
+        Return the cached file_ids of the given URLs, skipping unknown ones.
+        """
+        found: Dict[str, str] = {}
+        missing: List[str] = []
+        for url in urls:
+            if url in self._memory:
+                self._memory.move_to_end(url)
+                found[url] = self._memory[url]
+            else:
+                missing.append(url)
+
+        if missing:
+            try:
+                async with database() as db:
+                    stored = await get_file_ids(db, missing)
+            except Exception as e:
+                logger.error(f"Failed to read file_id cache: {e}")
+                stored = {}
+            for url, file_id in stored.items():
+                self._remember(url, file_id)
+            found.update(stored)
+        return found
+
+    async def put_many(self, file_ids: Dict[str, str]) -> None:
+        new = {url: file_id for url, file_id in file_ids.items() if url not in self._memory}
+        for url, file_id in file_ids.items():
+            self._remember(url, file_id)
+        if not new:
+            return
+
+        try:
+            async with database() as db:
+                await save_file_ids(db, new)
+            self._writes += len(new)
+            if self._writes >= self.evict_every:
+                self._writes = 0
+                await self.evict()
+        except Exception as e:
+            logger.error(f"Failed to store file_ids: {e}")
+
+    async def forget(self, urls: Iterable[str]) -> None:
+        """
+        Drop file_ids Telegram no longer accepts, so the photos are uploaded from their URLs again.
+        """
+        urls = list(urls)
+        for url in urls:
+            self._memory.pop(url, None)
+        try:
+            async with database() as db:
+                await delete_file_ids(db, urls)
+        except Exception as e:
+            logger.error(f"Failed to drop file_ids: {e}")
+
+    async def evict(self) -> int:
+        async with database() as db:
+            deleted = await evict_file_ids(db, utcnow() - self.ttl, self.max_rows)
+        if deleted:
+            logger.info(f"Evicted {deleted} cached file_ids")
+        return deleted
+
+    async def remember_sent(self, urls: List[str], result: Any) -> None:
+        """
+        Store the file_ids of a send_photo / send_media_group result.
+
+        :param urls: Image URLs in the order they were sent.
+        :param result: A Message, or the list of Messages of a media group.
+        """
+        messages = result if isinstance(result, list) else [result]
+        file_ids = {}
+        for url, message in zip(urls, messages, strict=False):
+            photo = getattr(message, "photo", None)
+            if photo:
+                file_ids[url] = photo[-1].file_id
+        await self.put_many(file_ids)
@@ -1,14 +1,15 @@
-import asyncio
-from types import MethodType
+from typing import TYPE_CHECKING
 
 from aiogram import types
 
-from db.crud.manager_users import get_or_create_user, get_user_config
+from db.crud.manager_users import get_or_create_user, set_user_digest
 from db.database import database
 from src.bot.keyboards.settings_keyboards import get_main_menu
 from src.loggers import log
-from src.utils import error_handler, notify_listings_handler, to_dict
-from src.web_scraper.scraper import CianScraper
+from src.utils import error_handler
+
+if TYPE_CHECKING:
+    from src.bot.bot import TelegramBot
 
 
 @log
@@ -23,6 +24,7 @@ async def start_handler(message: types.Message):
         "/search - начать поиск\n"
         "/menu - открыть главное меню\n"
         "/settings - настроить параметры поиска\n"
+        "/digest - присылать новые объявления сводкой\n"
         "/stop - остановить поиск"
     )
     async with database() as db:
@@ -44,23 +46,12 @@ async def menu_handler(message: types.Message):
 @error_handler
 async def search_handler(message: types.Message, bot_instance):
     user_id = message.chat.id
-    if user_id in bot_instance.user_tasks and not bot_instance.user_tasks[user_id].done():
+    if bot_instance.scheduler.is_active(user_id):
         await message.answer("❌ Поиск уже запущен. Остановите его через /stop")
         return
 
-    async with database() as db:
-        user_config = await get_user_config(db, user_id)
-        user_params = to_dict(user_config)
-
-    scraper = CianScraper(params=user_params, freeze_time=10, telegram_user_id=user_id)
-    original_method = scraper.save_new_listings.__func__
-    decorated_func = notify_listings_handler(bot_instance.send_notification)(original_method)
-    scraper.save_new_listings = MethodType(decorated_func, scraper)
-
-    bot_instance.user_scrapers[user_id] = scraper
-
-    task = asyncio.create_task(bot_instance._run_scraper(scraper))
-    bot_instance.user_tasks[user_id] = task
+    await bot_instance.drop_scraper(user_id)
+    await bot_instance.scheduler.add(user_id)
     await message.answer("🔍 Поиск запущен!")
 
 
@@ -72,11 +63,25 @@ async def stop_handler(message: types.Message, bot_instance):
     """
     user_id = message.from_user.id
 
-    if user_id in bot_instance.user_tasks and bot_instance.user_tasks[user_id]:
-        bot_instance.user_tasks[user_id].cancel()
-        del bot_instance.user_tasks[user_id]
-
-    if user_id in bot_instance.user_scrapers:
-        del bot_instance.user_scrapers[user_id]
+    await bot_instance.scheduler.remove(user_id)
+    await bot_instance.drop_scraper(user_id)
 
     await message.answer("⏹ Поиск остановлен.")
+
+
+@log
+@error_handler
+async def digest_handler(message: types.Message, bot_instance: "TelegramBot") -> None:
+    """
+    Переключает режим сводок.
+    """
+    user_id = message.chat.id
+    enabled = not await bot_instance.is_digest_enabled(user_id)
+    async with database() as db:
+        await set_user_digest(db, user_id, enabled)
+    bot_instance.digest_flags.set(user_id, enabled)
+
+    if enabled:
+        await message.answer("🗞 Режим сводок включен: новые объявления будут приходить одним сообщением.")
+    else:
+        await message.answer("📨 Режим сводок выключен: каждое объявление будет приходить отдельно.")
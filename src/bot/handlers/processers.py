@@ -11,14 +11,15 @@ from src.bot.keyboards.settings_keyboards import (
     get_settings_keyboard,
     get_year_keyboard,
 )
+from src.bot.metadata import BotMetadataCache
 
 
-async def process_settings_callback(callback: types.CallbackQuery):
+async def process_settings_callback(callback: types.CallbackQuery, metadata: BotMetadataCache):
     data = callback.data
     chat_id = callback.message.chat.id
     user_id = callback.message.chat.id
 
-    bot_info = await callback.bot.get_me()
+    bot_info = await metadata.get_me()
     if chat_id == bot_info.id:
         return
 
@@ -28,7 +29,7 @@ async def process_settings_callback(callback: types.CallbackQuery):
 
         elif data.startswith("set_region_"):
             region_id = int(data.split("_")[-1])
-            await update_user_config(db, user_id, "region", region_id)
+            await update_user_config(db, user_id, region=region_id)
             await callback.answer("✅ Регион обновлен!")
             await callback.message.edit_text("Настройте параметры поиска:", reply_markup=get_settings_keyboard())
 
@@ -37,7 +38,7 @@ async def process_settings_callback(callback: types.CallbackQuery):
 
         elif data.startswith("set_rooms_"):
             rooms = data.split("_")[-1]
-            await update_user_config(db, user_id, "rooms", rooms)
+            await update_user_config(db, user_id, rooms=rooms)
             await callback.answer("✅ Количество комнат обновлено!")
             await callback.message.edit_text("Настройте параметры поиска:", reply_markup=get_settings_keyboard())
 
@@ -48,8 +49,7 @@ async def process_settings_callback(callback: types.CallbackQuery):
             parts = data.split("_")
             min_price = int(parts[2])
             max_price = None if parts[3] == "None" else int(parts[3])
-            await update_user_config(db, user_id, "minprice", min_price)
-            await update_user_config(db, user_id, "maxprice", max_price)
+            await update_user_config(db, user_id, minprice=min_price, maxprice=max_price)
             await callback.answer("✅ Ценовой диапазон обновлен!")
             await callback.message.edit_text("Настройте параметры поиска:", reply_markup=get_settings_keyboard())
 
@@ -58,7 +58,7 @@ async def process_settings_callback(callback: types.CallbackQuery):
 
         elif data.startswith("set_only_foot_"):
             only_foot_value = int(data.split("_")[-1])
-            await update_user_config(db, user_id, "only_foot", only_foot_value)
+            await update_user_config(db, user_id, only_foot=only_foot_value)
             await callback.answer("✅ Опция по доступности метро обновлена!")
             await callback.message.edit_text("Настройте параметры поиска:", reply_markup=get_settings_keyboard())
 
@@ -67,7 +67,7 @@ async def process_settings_callback(callback: types.CallbackQuery):
 
         elif data.startswith("set_area_"):
             area_value = data.split("_")[-1]
-            await update_user_config(db, user_id, "min_area", area_value)
+            await update_user_config(db, user_id, mintarea=int(area_value))
             await callback.answer(f"Площадь обновлена: {area_value} м²")
             await callback.message.edit_text("Настройте параметры поиска:", reply_markup=get_settings_keyboard())
 
@@ -76,7 +76,7 @@ async def process_settings_callback(callback: types.CallbackQuery):
 
         elif data.startswith("set_year_"):
             year_value = data.split("_")[-1]
-            await update_user_config(db, user_id, "min_house_year", year_value)
+            await update_user_config(db, user_id, min_house_year=int(year_value))
             await callback.answer(f"Год обновлен: {year_value} м²")
             await callback.message.edit_text("Настройте параметры поиска:", reply_markup=get_settings_keyboard())
 
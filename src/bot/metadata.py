@@ -0,0 +1,42 @@
+from aiogram import Bot
+from aiogram.types import Chat, User
+
+from src.loggers import logger
+from src.utils.cache import TTLCache
+
+
+class BotMetadataCache:
+    """
+    TTL cache for the bot's own identity and for chat metadata.
+
+    Handlers used to call ``get_me`` on every button press and ``get_chat`` on every
+    notification batch, paying a Bot API round trip before doing any work. Entries are
+    invalidated when a chat blocks the bot or migrates to a supergroup.
+    """
+
+    def __init__(self, bot: Bot, me_ttl: float = 3600, chat_ttl: float = 600, max_chats: int = 10000):
+        self.bot = bot
+        self._me: TTLCache[str, User] = TTLCache(me_ttl, max_size=1)
+        self._chats: TTLCache[int, Chat] = TTLCache(chat_ttl, max_size=max_chats)
+
+    async def get_me(self) -> User:
+        me = self._me.get("me")
+        if me is None:
+            me = await self.bot.get_me()
+            self._me.set("me", me)
+        return me
+
+    async def get_chat(self, chat_id: int) -> Chat:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = await self.bot.get_chat(chat_id)
+            self._chats.set(chat_id, chat)
+        return chat
+
+    def invalidate_chat(self, chat_id: int) -> None:
+        logger.debug(f"Dropping cached metadata of chat {chat_id}")
+        self._chats.invalidate(chat_id)
+
+    def migrate_chat(self, old_chat_id: int, new_chat_id: int) -> None:
+        self._chats.invalidate(old_chat_id)
+        self._chats.invalidate(new_chat_id)
@@ -0,0 +1,79 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from db.crud.manager_outbox import delete_notifications, fail_notifications, take_notifications
+from db.database import database
+from src.loggers import logger
+
+
+class OutboxRelay:
+    """
+    Hands notifications queued by scraper worker processes to the bot.
+
+    Rows are deleted once ``callback`` returned, so a notification is delivered at least
+    once even if the bot restarts in between. A notification whose callback raised stays
+    queued and is retried on the next poll, up to ``max_attempts`` times.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[List[Dict[str, Any]], int], Awaitable[None]],
+        poll_interval: float = 1.0,
+        batch: int = 100,
+        max_attempts: int = 5,
+    ):
+        """
+        :param callback: Coroutine function taking the listings and the Telegram user ID, like send_notification.
+        :param poll_interval: Seconds between polls of an empty outbox.
+        :param batch: Notifications taken per poll.
+        :param max_attempts: Failed callbacks after which a notification is dropped.
+        """
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.batch = batch
+        self.max_attempts = max_attempts
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def drain(self) -> int:
+        """
+        Deliver one batch of notifications.
+
+        :return: Number of notifications taken from the outbox.
+        """
+        async with database() as db:
+            rows = await take_notifications(db, self.batch)
+        delivered, failed = [], []
+        for row_id, tg_id, listings in rows:
+            try:
+                await self.callback(listings, tg_id)
+            except Exception as e:
+                logger.error(f"Failed to notify user {tg_id} about {len(listings)} listings: {e}")
+                failed.append(row_id)
+            else:
+                delivered.append(row_id)
+        if rows:
+            async with database() as db:
+                await delete_notifications(db, delivered)
+                dropped = await fail_notifications(db, failed, self.max_attempts)
+            if dropped:
+                logger.error(f"Dropped {dropped} notifications after {self.max_attempts} failed attempts")
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                taken = await self.drain()
+            except Exception as e:
+                logger.error(f"Failed to read the notification outbox: {e}")
+                taken = 0
+            if taken < self.batch:
+                await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,108 @@
+import asyncio
+import hmac
+from typing import List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from src.loggers import logger
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Receives Telegram updates over HTTP and feeds them to the dispatcher.
+
+    Updates are acknowledged as soon as they are queued and handled by a fixed pool of
+    workers, so a slow handler doesn't hold the request open. When the queue is full the
+    server answers 503 and Telegram redelivers the update later.
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        *,
+        secret_token: str,
+        path: str = "/webhook",
+        workers: int = 16,
+        queue_size: int = 1000,
+    ):
+        """
+        :param dp: Dispatcher handling the updates.
+        :param bot: Bot the updates belong to.
+        :param secret_token: Expected value of the X-Telegram-Bot-Api-Secret-Token header; requests without it are rejected.
+        :param path: URL path Telegram posts updates to.
+        :param workers: Number of updates handled concurrently.
+        :param queue_size: Maximum number of accepted but unhandled updates.
+        """
+        if not secret_token:
+            raise ValueError("The webhook server needs a secret token")
+        self.dp = dp
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.workers = workers
+        self.queue: asyncio.Queue[Update] = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task[None]] = []
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle)
+        self.app.on_startup.append(self._start_workers)
+        self.app.on_cleanup.append(self._stop_workers)
+
+    def _authorized(self, request: web.Request) -> bool:
+        received = request.headers.get(SECRET_HEADER, "")
+        return hmac.compare_digest(received.encode(), self.secret_token.encode())
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not self._authorized(request):
+            logger.warning(f"Rejected webhook request from {request.remote}: bad secret token")
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Malformed webhook update: {e}")
+            return web.Response(status=400)
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            logger.warning(f"Webhook queue is full, asking Telegram to redeliver update {update.update_id}")
+            return web.Response(status=503)
+        return web.Response()
+
+    async def _work(self) -> None:
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                logger.exception(f"Failed to handle update {update.update_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _start_workers(self, app: web.Application) -> None:
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._work()))
+
+    async def _stop_workers(self, app: web.Application) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def start(self, host: str = "0.0.0.0", port: int = 8080) -> None:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Webhook server listening on {host}:{port}{self.path}")
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,172 @@
+"""
+Export apartments with their image URLs to a file, for analysis outside the bot:
+
+    python main.py export --format parquet --output apartments.parquet --state export.state
+
+Rows are streamed from a server-side cursor in id order, ``--chunk-size`` at a time, and
+every chunk is written before the next one is read, so memory use does not grow with the
+table. With ``--state``, the last exported id is kept in a file and the next run only
+exports listings added since.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import resource
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from sqlalchemy import select
+
+from db.models import Apartment, ApartmentImage
+from src.cli.parquet import ParquetTableWriter
+from src.loggers import logger
+
+EXPORT_COLUMNS = list(Apartment.__table__.columns)
+FIELDNAMES = [column.name for column in EXPORT_COLUMNS] + ["images"]
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--format", choices=("jsonl", "csv", "parquet"), default="jsonl")
+    parser.add_argument("--output", required=True, help="File to write")
+    parser.add_argument("--since-id", type=int, default=0, help="Only export listings with a greater id")
+    parser.add_argument("--state", help="File keeping the last exported id; overrides --since-id once it exists")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows read and written at a time")
+
+
+def _plain(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class JsonlWriter:
+    def __init__(self, path: Path):
+        self._file = open(path, "w", encoding="utf-8")  # noqa: SIM115 - closed in close()
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self._file.writelines(json.dumps({k: _plain(v) for k, v in row.items()}, ensure_ascii=False) + "\n" for row in rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class CsvWriter:
+    """
+    One row per listing; image URLs are joined with spaces.
+    """
+
+    def __init__(self, path: Path):
+        self._file = open(path, "w", encoding="utf-8", newline="")  # noqa: SIM115 - closed in close()
+        self._writer = csv.DictWriter(self._file, fieldnames=FIELDNAMES)
+        self._writer.writeheader()
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self._writer.writerows({**{k: _plain(v) for k, v in row.items()}, "images": " ".join(row["images"])} for row in rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetWriter(ParquetTableWriter):
+    """
+    One row group per chunk, typed after the model columns.
+    """
+
+    def __init__(self, path: Path):
+        super().__init__(path, EXPORT_COLUMNS, lists=["images"])
+
+
+Writer = Union[JsonlWriter, CsvWriter, ParquetWriter]
+WRITERS: Dict[str, Callable[[Path], Writer]] = {"jsonl": JsonlWriter, "csv": CsvWriter, "parquet": ParquetWriter}
+
+
+def read_watermark(path: Optional[str], default: int = 0) -> int:
+    if path and Path(path).exists():
+        return int(Path(path).read_text().strip() or default)
+    return default
+
+
+def write_watermark(path: str, last_id: int) -> None:
+    tmp = Path(f"{path}.tmp")
+    tmp.write_text(str(last_id))
+    os.replace(tmp, path)
+
+
+async def _images(listing_ids: List[int]) -> Dict[int, List[str]]:
+    from db.database import database  # noqa: PLC0415
+
+    images: Dict[int, List[str]] = defaultdict(list)
+    async with database() as db:
+        result = await db.execute(
+            select(ApartmentImage.listing_id, ApartmentImage.url)
+            .where(ApartmentImage.listing_id.in_(listing_ids))
+            .order_by(ApartmentImage.id)
+        )
+        for listing_id, url in result:
+            images[listing_id].append(url)
+    return images
+
+
+async def export(args: argparse.Namespace) -> Dict[str, float]:
+    """
+    Stream apartments newer than the watermark to ``args.output``.
+
+    :return: Rows written, the new watermark and timings.
+    """
+    from db.database import database  # noqa: PLC0415
+
+    since_id = read_watermark(args.state, args.since_id)
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    writer = WRITERS[args.format](output)
+    started = time.perf_counter()
+    rows_written = 0
+    last_id = since_id
+
+    try:
+        async with database() as db:
+            result = await db.stream(
+                select(*EXPORT_COLUMNS)
+                .where(Apartment.id > since_id)
+                .order_by(Apartment.id)
+                .execution_options(yield_per=args.chunk_size)
+            )
+            async for partition in result.partitions():
+                rows = [row._asdict() for row in partition]
+                # Images of a chunk in one query from a second session; the cursor stays open on the first.
+                images = await _images([row["id"] for row in rows])
+                for row in rows:
+                    row["images"] = images.get(row["id"], [])
+                writer.write(rows)
+                rows_written += len(rows)
+                last_id = rows[-1]["id"]
+    finally:
+        writer.close()
+
+    if args.state:
+        write_watermark(args.state, last_id)
+    elapsed = time.perf_counter() - started
+    logger.info(f"Exported {rows_written} listings with ids {since_id + 1}..{last_id} to {output}")
+    return {
+        "rows": rows_written,
+        "since_id": since_id,
+        "last_id": last_id,
+        "elapsed": elapsed,
+        "rows_per_second": rows_written / elapsed if elapsed else 0.0,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10,
+    }
+
+
+def run(args: argparse.Namespace) -> None:
+    from db.database import init_engine  # noqa: PLC0415
+
+    init_engine()
+    result = asyncio.run(export(args))
+    print(
+        f"{result['rows']} listings exported (ids {result['since_id'] + 1}..{result['last_id']}) "
+        f"in {result['elapsed']:.1f}s, {result['rows_per_second']:.0f}/s, peak RSS {result['max_rss_mb']:.0f} MiB"
+    )
@@ -0,0 +1,70 @@
+"""
+Parquet output shared by the scrape and export commands. pyarrow is an optional dependency
+(``pip install .[parquet]``).
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import ColumnElement
+
+
+def _number(kind: type, value: Any) -> Any:
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ParquetTableWriter:
+    """
+    Writes one row group per ``write``, with a schema fixed up front from the model columns,
+    so a column that is empty in the first batch doesn't end up typed as null.
+
+    :param path: File to write.
+    :param columns: Model columns, typed after their Python type; anything else is stored as text.
+    :param lists: Extra columns holding lists of strings.
+    :param text: Columns stored as text whatever their model type, for values not parsed yet.
+    """
+
+    def __init__(self, path: Path, columns: Iterable[ColumnElement[Any]], *, lists: Iterable[str] = (), text: Iterable[str] = ()):
+        try:
+            import pyarrow as pa  # noqa: PLC0415
+            import pyarrow.parquet as pq  # noqa: PLC0415
+        except ImportError as e:
+            raise RuntimeError("Parquet output needs pyarrow: pip install .[parquet]") from e
+        self.pa = pa
+        text = set(text)
+        self.kinds: Dict[str, Optional[type]] = {
+            column.name: None if column.name in text else column.type.python_type for column in columns
+        }
+        types: Dict[Optional[type], Any] = {int: pa.int64(), float: pa.float64(), datetime: pa.timestamp("us")}
+        self.lists = list(lists)
+        self.schema = pa.schema(
+            [(name, types.get(kind, pa.string())) for name, kind in self.kinds.items()]
+            + [(name, pa.list_(pa.string())) for name in self.lists]
+        )
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def _convert(self, kind: Optional[type], value: Any) -> Any:
+        if value is None:
+            return None
+        if kind in (int, float):
+            return _number(kind, value)
+        if kind is datetime:
+            return value if isinstance(value, datetime) else None
+        return str(value)
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        table = [
+            {
+                **{name: self._convert(kind, row.get(name)) for name, kind in self.kinds.items()},
+                **{name: [str(item) for item in row.get(name) or []] for name in self.lists},
+            }
+            for row in rows
+        ]
+        self._writer.write_table(self.pa.Table.from_pylist(table, schema=self.schema))
+
+    def close(self) -> None:
+        self._writer.close()
@@ -0,0 +1,197 @@
+"""
+Run the current DetailParser over archived detail pages and update the stored listings,
+without touching the network:
+
+    python main.py reparse --archive pages.db --processes 8 --dry-run
+
+Pages are decompressed and parsed in a process pool; the event loop only matches results
+to apartments rows and writes changed fields with one bulk UPDATE per batch. The scraper
+modules are imported inside the functions, so registering the subcommand stays cheap.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update
+
+from configs.config import get_settings
+from db.models import Apartment
+from src.loggers import logger
+from src.web_scraper.archive import DETAIL, PageArchive, decompress
+
+ParsedPage = Tuple[str, Dict[str, Any]]
+
+_dictionaries: Dict[int, bytes] = {}
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--archive", help="Page archive (PAGE_ARCHIVE_PATH by default)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="Parser processes")
+    parser.add_argument("--batch-size", type=int, default=200, help="Pages per parser task and per UPDATE")
+    parser.add_argument("--dry-run", action="store_true", help="Report the differences without writing them")
+    parser.add_argument("--examples", type=int, default=3, help="Example differences printed per field")
+
+
+def _init_worker(dictionaries: Dict[int, bytes]) -> None:
+    _dictionaries.update(dictionaries)
+
+
+def parse_pages(pages: List[Tuple[str, str, Optional[int], bytes]]) -> Tuple[List[ParsedPage], int]:
+    """
+    Decompress and parse a batch of pages. Runs in the worker processes.
+
+    :param pages: (url, codec, dictionary id, compressed body) of every page.
+    :return: (url, parsed fields) of the pages that parsed, and the number that failed.
+    """
+    from src.web_scraper.parser import DetailParser  # noqa: PLC0415
+    from src.web_scraper.saver import HASHED_FIELDS  # noqa: PLC0415
+
+    parsed, failed = [], 0
+    for url, codec, dict_id, body in pages:
+        try:
+            html = decompress(codec, body, _dictionaries.get(dict_id) if dict_id is not None else None).decode("utf-8")
+            details = DetailParser(html).parse_apartment_details()
+        except Exception:
+            failed += 1
+            continue
+        fields = {field: details[field] for field in HASHED_FIELDS if details.get(field) is not None}
+        if fields:
+            parsed.append((url, fields))
+        else:
+            failed += 1
+    return parsed, failed
+
+
+def _differs(old: Any, new: Any) -> bool:
+    if old is None:
+        return True
+    try:
+        return float(old) != float(new)
+    except (TypeError, ValueError):
+        return str(old) != str(new)
+
+
+class ReparseReport:
+    def __init__(self, examples: int = 3):
+        self.examples = examples
+        self.pages = 0
+        self.failed = 0
+        self.missing = 0
+        self.updated = 0
+        self.fields: Counter[str] = Counter()
+        self.samples: Dict[str, List[Tuple[str, object, object]]] = defaultdict(list)
+        self.started = time.perf_counter()
+
+    def record(self, url: str, field: str, old: object, new: object) -> None:
+        self.fields[field] += 1
+        if len(self.samples[field]) < self.examples:
+            self.samples[field].append((url, old, new))
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        rate = self.pages / self.elapsed if self.elapsed else 0.0
+        lines = [
+            f"{self.pages} pages in {self.elapsed:.1f}s ({rate:.0f} pages/s): "
+            f"{self.updated} listings changed, {self.missing} not in the database, {self.failed} failed to parse"
+        ]
+        for field, count in self.fields.most_common():
+            lines.append(f"  {field}: {count} changed")
+            lines.extend(f"    {url}: {old!r} -> {new!r}" for url, old, new in self.samples[field])
+        return "\n".join(lines)
+
+
+async def apply_batch(parsed: List[ParsedPage], report: ReparseReport, dry_run: bool = False) -> None:
+    """
+    Compare parsed fields with the stored listings and write the differences with one bulk UPDATE.
+    """
+    from db.database import database  # noqa: PLC0415
+    from src.web_scraper.saver import HASHED_FIELDS, ListingSaver  # noqa: PLC0415
+
+    by_url = dict(parsed)
+    async with database() as db:
+        result = await db.execute(
+            select(Apartment.id, Apartment.url, Apartment.content_hash, *(getattr(Apartment, f) for f in HASHED_FIELDS)).where(
+                Apartment.url.in_(by_url)
+            )
+        )
+        rows = result.all()
+        report.missing += len(by_url) - len(rows)
+
+        changes = []
+        for row in rows:
+            fields = by_url[row.url]
+            change = {}
+            for field, value in fields.items():
+                old = getattr(row, field)
+                if _differs(old, value):
+                    change[field] = value
+                    report.record(row.url, field, old, value)
+            content_hash = ListingSaver.content_hash(fields)
+            if change or content_hash != row.content_hash:
+                changes.append({"id": row.id, "content_hash": content_hash, **change})
+            if change:
+                report.updated += 1
+
+        if changes and not dry_run:
+            await db.execute(update(Apartment), changes)
+            await db.commit()
+
+
+async def reparse(args: argparse.Namespace) -> ReparseReport:
+    path = args.archive or get_settings().PAGE_ARCHIVE_PATH
+    if not path:
+        raise SystemExit("--archive or PAGE_ARCHIVE_PATH is required")
+    archive = PageArchive(path)
+    report = ReparseReport(args.examples)
+    loop = asyncio.get_running_loop()
+    in_flight: Set[asyncio.Future[Tuple[List[ParsedPage], int]]] = set()
+
+    # spawn: the parent runs a logging thread, which fork would copy mid-state.
+    with ProcessPoolExecutor(
+        max_workers=args.processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(archive.dictionaries(),),
+    ) as pool:
+
+        async def collect(wait_for: Set[asyncio.Future[Tuple[List[ParsedPage], int]]]) -> None:
+            done, pending = await asyncio.wait(wait_for, return_when=asyncio.FIRST_COMPLETED)
+            in_flight.intersection_update(pending)
+            for future in done:
+                parsed, failed = future.result()
+                report.failed += failed
+                await apply_batch(parsed, report, args.dry_run)
+
+        batch = []
+        for page in archive.pages(DETAIL):
+            batch.append((page.url, page.codec, page.dict_id, page.body))
+            report.pages += 1
+            if len(batch) >= args.batch_size:
+                in_flight.add(loop.run_in_executor(pool, parse_pages, batch))
+                batch = []
+            # Keep the pool busy but bound the pages held in memory.
+            if len(in_flight) >= 2 * args.processes:
+                await collect(in_flight)
+        if batch:
+            in_flight.add(loop.run_in_executor(pool, parse_pages, batch))
+        while in_flight:
+            await collect(in_flight)
+
+    logger.info(f"Reparsed {report.pages} archived pages")
+    return report
+
+
+def run(args: argparse.Namespace) -> None:
+    from db.database import init_engine  # noqa: PLC0415
+
+    init_engine()
+    print(asyncio.run(reparse(args)).summary())
@@ -0,0 +1,194 @@
+"""
+Headless scraping without the Telegram bot, for backfills and benchmarks:
+
+    python main.py scrape --region 1 --rooms 2 --pages 5 --concurrency 16 --sink jsonl --output listings.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from db.models import UserConfig
+from src.loggers import logger
+
+# Apartment columns filled from a detail page.
+SCRAPED_FIELDS = ("title", "price", "description", "address", "date_published", "rooms", "area", "url")
+SEARCH_FIELDS = [column for column in UserConfig.__table__.columns if column.name not in ("id", "user_id")]
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Register the scrape options: one per UserConfig search field, plus how to run and where to write.
+    """
+    search = parser.add_argument_group("search parameters (same as the bot settings)")
+    for column in SEARCH_FIELDS:
+        python_type = column.type.python_type
+        search.add_argument(
+            f"--{column.name.replace('_', '-')}",
+            dest=column.name,
+            type=python_type if python_type in (int, float) else str,
+            default=column.default.arg if column.default is not None else None,
+            help=f"default: {column.default.arg if column.default is not None else 'not set'}",
+        )
+
+    parser.add_argument("--pages", type=int, default=1, help="Number of search result pages to read")
+    parser.add_argument("--concurrency", type=int, default=8, help="Detail pages fetched at the same time")
+    parser.add_argument("--sink", choices=("db", "jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--output", help="Output file for the jsonl and parquet sinks")
+    parser.add_argument("--batch-size", type=int, default=100, help="Listings per sink write")
+    parser.add_argument("--freeze-time", type=int, default=0, help="Maximum random pause after each request")
+    parser.add_argument("--base-url", help="Site to scrape (CIAN_BASE_URL by default)")
+
+
+def _plain(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return str(value)
+
+
+class JsonlSink:
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")  # noqa: SIM115 - closed in close()
+
+    async def filter_new(self, urls: List[str]) -> List[str]:
+        return urls
+
+    async def write(self, records: List[Dict[str, Any]]) -> int:
+        self._file.writelines(json.dumps({k: _plain(v) for k, v in r.items()}, ensure_ascii=False) + "\n" for r in records)
+        return len(records)
+
+    async def close(self) -> None:
+        self._file.close()
+
+
+class ParquetSink:
+    """
+    Writes one row group per batch, typed after the Apartment columns the parser fills.
+    """
+
+    def __init__(self, path: str):
+        from db.models import Apartment  # noqa: PLC0415
+        from src.cli.parquet import ParquetTableWriter  # noqa: PLC0415
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        columns = [column for column in Apartment.__table__.columns if column.name in SCRAPED_FIELDS]
+        # date_published is still Cian's display text ("вчера, 12:30") at this point.
+        self._writer = ParquetTableWriter(self.path, columns, lists=["images"], text=["date_published"])
+
+    async def filter_new(self, urls: List[str]) -> List[str]:
+        return urls
+
+    async def write(self, records: List[Dict[str, Any]]) -> int:
+        self._writer.write(records)
+        return len(records)
+
+    async def close(self) -> None:
+        self._writer.close()
+
+
+class DatabaseSink:
+    """
+    Stores listings like the bot does. URLs already in the database are not fetched again.
+    """
+
+    def __init__(self) -> None:
+        from db.database import init_engine  # noqa: PLC0415
+        from src.web_scraper.saver import ListingSaver  # noqa: PLC0415
+
+        init_engine()
+        self.saver = ListingSaver()
+        self._ready = False
+
+    async def _ensure_tables(self) -> None:
+        if not self._ready:
+            from db.database import init_db  # noqa: PLC0415
+
+            await init_db()
+            self._ready = True
+
+    async def filter_new(self, urls: List[str]) -> List[str]:
+        from db.database import database  # noqa: PLC0415
+
+        await self._ensure_tables()
+        async with database() as db:
+            existing = await self.saver.get_existing_urls(db, urls)
+        return [url for url in urls if url not in existing]
+
+    async def write(self, records: List[Dict[str, Any]]) -> int:
+        from db.database import database  # noqa: PLC0415
+
+        await self._ensure_tables()
+        async with database() as db:
+            return len(await self.saver.insert_listings(records, db))
+
+    async def close(self) -> None:
+        pass
+
+
+def create_sink(kind: str, output: Optional[str]) -> Union[DatabaseSink, JsonlSink, ParquetSink]:
+    if kind == "db":
+        return DatabaseSink()
+    if not output:
+        raise SystemExit(f"--output is required for the {kind} sink")
+    return JsonlSink(output) if kind == "jsonl" else ParquetSink(output)
+
+
+async def scrape(args: argparse.Namespace) -> Dict[str, float]:
+    # Imported here so that registering the subcommand in main.py stays cheap.
+    from src.web_scraper.scraper import CianScraper  # noqa: PLC0415
+
+    params = {column.name: getattr(args, column.name) for column in SEARCH_FIELDS if getattr(args, column.name) is not None}
+    scraper = CianScraper(params=params, freeze_time=args.freeze_time, base_url=args.base_url)
+    sink = create_sink(args.sink, args.output)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    started = time.perf_counter()
+
+    try:
+        pages = await asyncio.gather(*(scraper.fetch_listings(page) for page in range(1, args.pages + 1)))
+        urls = list(dict.fromkeys(url for page in pages for url in page))
+        todo = await sink.filter_new(urls)
+        logger.info(f"{len(urls)} listings on {args.pages} pages, {len(todo)} to fetch")
+
+        async def fetch(url: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await scraper.fetch_listing_details(url)
+
+        written = 0
+        batch: List[Dict[str, Any]] = []
+        for next_details in asyncio.as_completed([fetch(url) for url in todo]):
+            details = await next_details
+            if details:
+                batch.append(details)
+            if len(batch) >= args.batch_size:
+                written += await sink.write(batch)
+                batch = []
+        if batch:
+            written += await sink.write(batch)
+    finally:
+        await sink.close()
+        await scraper.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "urls": len(urls),
+        "fetched": len(todo),
+        "written": written,
+        "elapsed": elapsed,
+        "listings_per_second": written / elapsed if elapsed else 0.0,
+    }
+
+
+def run(args: argparse.Namespace) -> None:
+    result = asyncio.run(scrape(args))
+    print(
+        f"{result['written']} listings written ({result['urls']} found, {result['fetched']} fetched) "
+        f"in {result['elapsed']:.1f}s, {result['listings_per_second']:.1f}/s"
+    )
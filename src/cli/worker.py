@@ -0,0 +1,54 @@
+"""
+A scraper worker process, for running searches outside the bot process:
+
+    python main.py worker --shard 0 --shards 4
+
+The bot starts these itself when SCRAPER_PROCESSES is set and SPAWN_SCRAPERS is on; run
+them by hand (or one per container) with SPAWN_SCRAPERS=false. Every shard from 0 to
+SCRAPER_PROCESSES - 1 then needs a running worker: no other shard takes over its searches.
+"""
+
+import argparse
+import asyncio
+import signal
+
+from configs.config import get_settings
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--shard", type=int, default=0, help="Shard served by this worker, from 0 to --shards - 1")
+    parser.add_argument("--shards", type=int, default=1, help="Total number of workers")
+    parser.add_argument("--concurrency", type=int, help="Cycles run at the same time (SCHEDULER_WORKERS by default)")
+
+
+async def serve(args: argparse.Namespace) -> None:
+    from db.database import enable_wal, init_engine  # noqa: PLC0415
+    from src.scheduler import AdaptiveInterval, ScrapeWorker  # noqa: PLC0415
+
+    if not 0 <= args.shard < args.shards:
+        raise SystemExit(f"--shard must be between 0 and {args.shards - 1}")
+
+    settings = get_settings()
+    init_engine()
+    await enable_wal()
+    worker = ScrapeWorker(
+        args.shard,
+        args.shards,
+        concurrency=args.concurrency or settings.SCHEDULER_WORKERS,
+        policy=AdaptiveInterval(
+            min_interval=settings.SEARCH_MIN_INTERVAL,
+            max_interval=settings.SEARCH_MAX_INTERVAL,
+            target=settings.SEARCH_TARGET_NEW,
+            smoothing=settings.SEARCH_RATE_SMOOTHING,
+        ),
+        lease_seconds=settings.JOB_LEASE_SECONDS,
+        poll_interval=settings.WORKER_POLL_INTERVAL,
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    await worker.run()
+
+
+def run(args: argparse.Namespace) -> None:
+    asyncio.run(serve(args))
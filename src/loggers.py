@@ -1,55 +1,153 @@
 import asyncio
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import sys
-from functools import wraps
+import threading
+import time
+from functools import lru_cache, wraps
 from pathlib import Path
-from typing import Callable
+from typing import Any, Callable, Dict, List, Tuple, TypeVar, cast
 
-from configs.config import settings
+from configs.config import get_settings
 
 LOG_DIR = Path("logs")
 LOG_FILE = LOG_DIR / "app.log"
-if settings.LOGGER_MODE in ("file", "both"):
-    LOG_DIR.mkdir(exist_ok=True)
 
 
 LOG_FORMAT = "%(asctime)s - %(levelname)s - %(filename)s - %(name)s/%(funcName)s - %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, DATE_FORMAT),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "func": record.funcName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most ``rate`` records per second from each call site, with bursts of ``burst``.
+
+    Warnings and errors always pass. The next record let through from a call site notes how
+    many were suppressed in the meantime.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._sites: Dict[Tuple[str, int], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate <= 0:
+            return True
+
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None:
+                site = self._sites[key] = [self.burst, now, 0]
+            tokens, updated_at, suppressed = site
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens < 1:
+                site[:] = [tokens, now, suppressed + 1]
+                return False
+            site[:] = [tokens - 1, now, 0]
+
+        if suppressed:
+            record.msg = f"{record.getMessage()} (suppressed {suppressed} similar messages)"
+            record.args = None
+        return True
+
+
+def _build_handlers() -> list[logging.Handler]:
+    settings = get_settings()
+    formatter = JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+    handlers: list[logging.Handler] = []
+
+    if settings.LOGGER_MODE in ("file", "both"):
+        LOG_DIR.mkdir(exist_ok=True)
+        file_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    if settings.LOGGER_MODE in ("console", "both"):
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
+
+    return handlers
+
+
 logger = logging.getLogger("cian_scraper")
-logger.setLevel(logging.INFO)
+aiogram_logger = logging.getLogger("aiogram")
 
 
-if settings.LOGGER_MODE in ("file", "both"):
-    file_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
-    logger.addHandler(file_handler)
+@lru_cache(maxsize=1)
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Attach the handlers configured by LOGGER_MODE and LOG_FORMAT. Entry points call this
+    once their arguments are parsed, so importing a module never reads the settings.
 
+    Records are only put on a queue in the calling thread; formatting and I/O happen in the
+    listener's thread, so logging never blocks the event loop on a slow terminal or disk.
+    """
+    settings = get_settings()
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(settings.LOG_RATE_LIMIT, settings.LOG_RATE_BURST))
 
-if settings.LOGGER_MODE in ("console", "both"):
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
-    logger.addHandler(console_handler)
+    listener = logging.handlers.QueueListener(log_queue, *_build_handlers(), respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
 
+    logger.setLevel(logging.DEBUG if settings.LOG_CALLS else logging.INFO)
+    logger.addHandler(queue_handler)
+    aiogram_logger.setLevel(logging.INFO)
+    aiogram_logger.addHandler(queue_handler)
+    return listener
 
-aiogram_logger = logging.getLogger("aiogram")
-aiogram_logger.setLevel(logging.INFO)
-aiogram_logger.addHandler(file_handler if settings.LOGGER_MODE in ("file", "both") else console_handler)
+
+F = TypeVar("F", bound=Callable[..., Any])
 
 
-def log(func: Callable) -> Callable:
+def log(func: F) -> F:
     """
     A decorator to log method calls, arguments, and results.
 
+    LOG_CALLS is checked when the function is called, not when it is decorated, so decorating
+    at import doesn't read the settings. With it disabled the wrapper only forwards the call.
+
     :param func: The function to be decorated.
     :return: Wrapped function with logging.
     """
 
     @wraps(func)
-    async def async_wrapper(*args, **kwargs):
+    async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not get_settings().LOG_CALLS:
+            return await func(*args, **kwargs)
         logger.debug("Calling %s with args: %s, kwargs: %s", func.__name__, args, kwargs)
         try:
             result = await func(*args, **kwargs)
@@ -60,7 +158,9 @@ def log(func: Callable) -> Callable:
             raise
 
     @wraps(func)
-    def sync_wrapper(*args, **kwargs):
+    def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not get_settings().LOG_CALLS:
+            return func(*args, **kwargs)
         logger.debug("Calling %s with args: %s, kwargs: %s", func.__name__, args, kwargs)
         try:
             result = func(*args, **kwargs)
@@ -70,4 +170,4 @@ def log(func: Callable) -> Callable:
             logger.exception("Error in %s: %s", func.__name__, str(e))
             raise
 
-    return async_wrapper if asyncio.iscoroutinefunction(func) else sync_wrapper
+    return cast(F, async_wrapper if asyncio.iscoroutinefunction(func) else sync_wrapper)
@@ -0,0 +1,87 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Optional
+
+from src.loggers import logger
+from src.metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+
+
+class StallReport:
+    def __init__(self, lag: float, stack: str):
+        self.lag = lag
+        self.stack = stack
+        self.detected_at = time.time()
+
+
+class LoopLagMonitor:
+    """
+    Measures event loop lag and catches the code that blocks the loop.
+
+    A heartbeat task sleeps ``interval`` seconds in a loop and records how late it wakes
+    up. A watchdog thread checks the heartbeat; once it is more than ``threshold`` seconds
+    overdue, the loop thread's current stack is captured with ``sys._current_frames`` while
+    the blocking call is still running, then logged and counted.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, keep_reports: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.reports: Deque[StallReport] = deque(maxlen=keep_reports)
+        self.max_lag = 0.0
+
+        self._beat = time.monotonic()
+        self._beats = 0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task[None]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Start monitoring the running loop. Must be called from the loop's thread."""
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - started - self.interval)
+            LOOP_LAG_SECONDS.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            self._beat = now
+            self._beats += 1
+
+    def _watch(self) -> None:
+        reported_beat = -1
+        while not self._stopped.wait(self.threshold / 2):
+            overdue = time.monotonic() - self._beat - self.interval
+            if overdue <= self.threshold or reported_beat == self._beats:
+                continue
+            reported_beat = self._beats
+
+            frame = sys._current_frames().get(self._loop_thread_id) if self._loop_thread_id is not None else None
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            self.reports.append(StallReport(overdue, stack))
+            LOOP_STALLS.inc()
+            logger.warning(f"Event loop blocked for {overdue:.3f}s+, loop thread stack:\n{stack}")
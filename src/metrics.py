@@ -0,0 +1,222 @@
+"""
+A small in-process metrics registry rendered in the Prometheus text format.
+
+Updating a metric is a dict lookup and an addition; nothing is formatted until the
+endpoint is scraped, and gauges backed by a function are only evaluated then.
+"""
+
+import bisect
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+from src.loggers import logger
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: Dict[str, "Metric"] = {}
+
+    def register(self, metric: "Metric") -> None:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        pass
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY) -> None:
+        super().__init__(name, documentation, labelnames, registry)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels: object) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in self.values.items()]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY) -> None:
+        super().__init__(name, documentation, labelnames, registry)
+        self.values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: object) -> None:
+        self.values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from ``function`` at scrape time. Only for gauges without labels."""
+        self._function = function
+
+    def get(self, **labels: object) -> float:
+        if self._function is not None:
+            return self._function()
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f"{self.name} {self._function()}"]
+            except Exception as e:
+                logger.warning(f"Failed to read gauge {self.name}: {e}")
+                return []
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in self.values.items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Registry = REGISTRY,
+        *,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            # Per-bucket counts, then +Inf count and sum.
+            state = self.values[key] = [0.0] * (len(self.buckets) + 2)
+        index = bisect.bisect_left(self.buckets, value)
+        state[index] += 1
+        state[-1] += value
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: object) -> int:
+        state = self.values.get(self._key(labels))
+        return int(sum(state[:-1])) if state else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, state in self.values.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state, strict=False):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += state[len(self.buckets)]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+FETCH_SECONDS = Histogram("cian_fetch_seconds", "Duration of HTTP requests to Cian.", ["kind"])
+FETCH_RESPONSES = Counter("cian_fetch_responses_total", "HTTP responses from Cian by status.", ["status"])
+PARSE_SECONDS = Histogram("cian_parse_seconds", "Time spent parsing pages.", ["parser", "stage"])
+DB_COMMIT_SECONDS = Histogram("cian_db_commit_seconds", "Duration of listing inserts and their commit.")
+LISTINGS_SAVED = Counter("cian_listings_saved_total", "Listings inserted into the database.")
+NOTIFICATIONS = Counter("cian_notifications_total", "Notification batches queued, by mode.", ["mode"])
+NOTIFIED_LISTINGS = Counter("cian_notified_listings_total", "Listings included in notifications.")
+NOTIFY_SECONDS = Histogram("cian_notify_prepare_seconds", "Time spent building and queueing a notification batch.")
+TELEGRAM_SENT = Counter("cian_telegram_calls_total", "Bot API calls made by the notifier, by result.", ["result"])
+TELEGRAM_LATENCY = Histogram("cian_telegram_delivery_seconds", "Time from queueing a message to sending it.")
+NOTIFY_QUEUE_DEPTH = Gauge("cian_notify_queue_depth", "Messages waiting in the notifier.")
+SCHEDULER_PENDING = Gauge("cian_scheduler_pending_jobs", "Search jobs waiting for their next run.")
+SCHEDULER_RUNNING = Gauge("cian_scheduler_running_jobs", "Search jobs being run.")
+LOOP_LAG_SECONDS = Histogram(
+    "cian_event_loop_lag_seconds",
+    "How late the event loop heartbeat woke up.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_STALLS = Counter("cian_event_loop_stalls_total", "Times the event loop was blocked over the threshold.")
+
+
+class MetricsServer:
+    """
+    Serves the registry at ``/metrics`` for Prometheus.
+    """
+
+    def __init__(self, registry: Registry = REGISTRY):
+        self.registry = registry
+        self.app = web.Application()
+        self.app.router.add_get("/metrics", self.handle)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self, host: str = "127.0.0.1", port: int = 9100) -> None:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Metrics available at http://{host}:{port}/metrics")
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
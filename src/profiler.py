@@ -0,0 +1,115 @@
+"""
+Sampling profiler for the live process.
+
+A background thread reads the event loop thread's stack every ``interval`` seconds via
+``sys._current_frames`` and counts identical stacks. Nothing is installed into the
+interpreter, so the profiled code runs at full speed; the cost is one stack walk per
+sample. Results are written as collapsed stacks, the input format of flamegraph.pl and
+speedscope.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import List, Optional, Tuple
+
+from src.loggers import logger
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{Path(code.co_filename).name}:{code.co_qualname}:{code.co_firstlineno}"
+
+
+class ProfileResult:
+    def __init__(self, stacks: Counter[str], samples: int, duration: float):
+        self.stacks = stacks
+        self.samples = samples
+        self.duration = duration
+
+    def write_collapsed(self, path: str | Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def top(self, limit: int = 10) -> List[Tuple[str, int, int]]:
+        """
+        Functions with the most samples.
+
+        :return: (function, self samples, total samples) sorted by self samples.
+        """
+        own: Counter[str] = Counter()
+        total: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                total[name] += count
+        return [(name, count, total[name]) for name, count in own.most_common(limit)]
+
+    def summary(self, limit: int = 10) -> str:
+        lines = [f"{self.samples} samples in {self.duration:.1f}s"]
+        for name, own, total in self.top(limit):
+            lines.append(
+                f"{100 * own / max(self.samples, 1):5.1f}% self {100 * total / max(self.samples, 1):5.1f}% total  {name}"
+            )
+        return "\n".join(lines)
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005):
+        """
+        :param interval: Seconds between samples.
+        """
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _sample(self, thread_id: int, duration: float) -> ProfileResult:
+        stacks: Counter[str] = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + duration
+        while time.perf_counter() < deadline:
+            frame: Optional[FrameType] = sys._current_frames().get(thread_id)
+            frames = []
+            while frame is not None:
+                frames.append(_frame_name(frame))
+                frame = frame.f_back
+            if frames:
+                stacks[";".join(reversed(frames))] += 1
+                samples += 1
+            time.sleep(self.interval)
+        return ProfileResult(stacks, samples, time.perf_counter() - started)
+
+    async def profile(self, duration: float) -> ProfileResult:
+        """
+        Sample the calling event loop's thread for ``duration`` seconds while it keeps running.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            logger.info(f"Profiling for {duration}s")
+            return await asyncio.to_thread(self._sample, threading.get_ident(), duration)
+        finally:
+            self._lock.release()
+
+
+async def profile_to_file(profiler: SamplingProfiler, duration: float, directory: str | Path) -> Tuple[Path, ProfileResult]:
+    """
+    Profile for ``duration`` seconds and write the collapsed stacks to ``directory``.
+    """
+    result = await profiler.profile(duration)
+    path = result.write_collapsed(Path(directory) / time.strftime("profile-%Y%m%d-%H%M%S.collapsed"))
+    logger.info(f"Profile written to {path}\n{result.summary()}")
+    return path, result
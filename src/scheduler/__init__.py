@@ -0,0 +1,5 @@
+from .intervals import AdaptiveInterval
+from .scheduler import SearchScheduler
+from .workers import LeasedScheduler, ScrapeWorker, WorkerSupervisor
+
+__all__ = ["AdaptiveInterval", "LeasedScheduler", "ScrapeWorker", "SearchScheduler", "WorkerSupervisor"]
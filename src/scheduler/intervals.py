@@ -0,0 +1,74 @@
+import random
+from typing import Optional
+
+
+class AdaptiveInterval:
+    """
+    Derives a search's polling interval from its observed new-listing rate.
+
+    The rate (new listings per second) is an exponentially weighted moving average over
+    past cycles. The interval is the time expected to accumulate ``target`` new listings,
+    clamped to ``[min_interval, max_interval]``. A search that keeps coming back empty
+    decays its rate by ``1 - smoothing`` per cycle, so it backs off geometrically.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 60,
+        max_interval: float = 1800,
+        target: float = 1.0,
+        smoothing: float = 0.3,
+        jitter: float = 0.1,
+    ):
+        """
+        :param min_interval: Shortest delay between two cycles, in seconds.
+        :param max_interval: Longest delay between two cycles, in seconds.
+        :param target: Number of new listings a cycle should ideally find.
+        :param smoothing: Weight of the latest observation in the moving average (0..1].
+        :param jitter: Relative random spread applied to the delay so searches don't sync up.
+        """
+        if min_interval > max_interval:
+            raise ValueError("min_interval must not exceed max_interval")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target = target
+        self.smoothing = smoothing
+        self.jitter = jitter
+
+    @property
+    def initial_rate(self) -> float:
+        """Rate assumed for a fresh search: polled at the minimum interval until proven cold."""
+        return self.target / self.min_interval if self.min_interval > 0 else 0.0
+
+    def update(self, rate: Optional[float], new_listings: int, elapsed: float) -> float:
+        """
+        Fold one cycle's outcome into the moving average.
+
+        :param rate: Previous rate, or None for a fresh search.
+        :param new_listings: Number of new listings the cycle found.
+        :param elapsed: Seconds covered by the cycle (since the previous one started).
+        :return: Updated rate in listings per second.
+        """
+        if rate is None:
+            rate = self.initial_rate
+        if elapsed <= 0:
+            return rate
+        observed = new_listings / elapsed
+        return self.smoothing * observed + (1 - self.smoothing) * rate
+
+    def interval(self, rate: Optional[float]) -> float:
+        """
+        Delay until the next cycle for the given rate, without jitter.
+        """
+        if rate is None:
+            rate = self.initial_rate
+        if rate <= 0:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, self.target / rate))
+
+    def next_delay(self, rate: Optional[float]) -> float:
+        """
+        Delay until the next cycle, with jitter, kept within the bounds.
+        """
+        delay = self.interval(rate) * random.uniform(1 - self.jitter, 1 + self.jitter)
+        return min(self.max_interval, max(self.min_interval, delay))
@@ -0,0 +1,194 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from db.crud.manager_jobs import activate_job, deactivate_job, get_active_jobs, reschedule_job
+from db.database import database
+from src.loggers import logger
+
+from .intervals import AdaptiveInterval
+
+
+def to_datetime(timestamp: float) -> datetime:
+    """Convert an epoch timestamp to the naive UTC datetime stored in the database."""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+
+
+def to_timestamp(value: datetime) -> float:
+    """Convert a naive UTC datetime loaded from the database to an epoch timestamp."""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class SearchScheduler:
+    """
+    Runs every active search on a fixed-size pool of worker tasks.
+
+    Next-run times live in a min-heap keyed by Telegram user ID. A dispatcher task sleeps
+    until the earliest entry is due and hands it to the workers, so the number of
+    concurrent scrape cycles never exceeds ``workers`` no matter how many users search.
+    The delay after each cycle comes from ``policy`` and the number of new listings it found.
+    """
+
+    def __init__(
+        self,
+        job_fn: Callable[[int], Awaitable[Optional[int]]],
+        workers: int = 4,
+        policy: Optional[AdaptiveInterval] = None,
+        persist: bool = True,
+    ):
+        """
+        :param job_fn: Coroutine function running one scrape cycle for a user and returning
+            the number of new listings it found.
+        :param workers: Maximum number of cycles running at the same time.
+        :param policy: Polling interval policy, a default AdaptiveInterval if omitted.
+        :param persist: Store the schedule in the database and resume it on start().
+        """
+        self.job_fn = job_fn
+        self.workers = workers
+        self.policy = policy or AdaptiveInterval()
+        self.persist = persist
+
+        self._heap: List[Tuple[float, int, int]] = []
+        self._entries: Dict[int, int] = {}
+        self._active: Set[int] = set()
+        self._running: Set[int] = set()
+        self._rates: Dict[int, float] = {}
+        self._last_started: Dict[int, float] = {}
+        self._counter = itertools.count()
+        self._queue: asyncio.Queue[int] = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task[None]] = []
+
+    def is_active(self, key: int) -> bool:
+        return key in self._active
+
+    @property
+    def pending(self) -> int:
+        """Number of searches waiting for their next run."""
+        return len(self._entries)
+
+    @property
+    def running(self) -> int:
+        """Number of cycles currently executing."""
+        return len(self._running)
+
+    def _push(self, key: int, run_at: float) -> None:
+        seq = next(self._counter)
+        self._entries[key] = seq
+        heapq.heappush(self._heap, (run_at, seq, key))
+        self._wakeup.set()
+
+    def rate(self, key: int) -> Optional[float]:
+        """Current new-listing rate estimate of a search, in listings per second."""
+        return self._rates.get(key)
+
+    async def start(self) -> None:
+        """
+        Resume persisted searches and spawn the dispatcher and worker tasks.
+        """
+        if self.persist:
+            async with database() as db:
+                jobs = await get_active_jobs(db)
+            for job in jobs:
+                run_at = to_timestamp(job.next_run_at) if job.next_run_at else time.time()
+                self._active.add(job.tg_id)
+                if job.new_rate is not None:
+                    self._rates[job.tg_id] = job.new_rate
+                self._push(job.tg_id, run_at)
+            logger.info(f"Scheduler resumed {len(jobs)} searches")
+
+        self._tasks.append(asyncio.create_task(self._dispatch()))
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._work()))
+
+    async def stop(self) -> None:
+        """
+        Cancel the dispatcher and workers. Persisted searches stay active for the next start().
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def add(self, key: int, run_at: Optional[float] = None) -> None:
+        """
+        Register a search and schedule it (immediately by default).
+        """
+        run_at = run_at if run_at is not None else time.time()
+        self._active.add(key)
+        if key not in self._running:
+            self._push(key, run_at)
+        if self.persist:
+            async with database() as db:
+                await activate_job(db, key, to_datetime(run_at))
+
+    async def remove(self, key: int) -> None:
+        """
+        Unregister a search. A cycle already in progress is allowed to finish.
+        """
+        self._active.discard(key)
+        self._entries.pop(key, None)
+        self._rates.pop(key, None)
+        self._last_started.pop(key, None)
+        if self.persist:
+            async with database() as db:
+                await deactivate_job(db, key)
+
+    async def _dispatch(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, seq, key = heapq.heappop(self._heap)
+                if self._entries.get(key) != seq:
+                    continue
+                del self._entries[key]
+                self._running.add(key)
+                self._queue.put_nowait(key)
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+
+    async def _work(self) -> None:
+        while True:
+            key = await self._queue.get()
+            started = time.time()
+            found = None
+            try:
+                found = await self.job_fn(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Search cycle for user {key} failed: {e}")
+            finally:
+                self._running.discard(key)
+                self._queue.task_done()
+
+            if key in self._active:
+                await self._reschedule(key, found, started)
+
+    async def _reschedule(self, key: int, found: Optional[int], started: float) -> None:
+        rate = self._rates.get(key)
+        if found is not None:
+            previous = self._last_started.get(key)
+            elapsed = started - previous if previous is not None else self.policy.interval(rate)
+            rate = self.policy.update(rate, found, elapsed)
+            self._rates[key] = rate
+        self._last_started[key] = started
+
+        now = time.time()
+        delay = self.policy.next_delay(rate)
+        run_at = now + delay
+        self._push(key, run_at)
+        logger.info(f"Next cycle for user {key} in {delay:.0f}s ({found} new listings)")
+        if self.persist:
+            try:
+                async with database() as db:
+                    await reschedule_job(db, key, to_datetime(now), to_datetime(run_at), rate)
+            except Exception as e:
+                logger.error(f"Failed to persist schedule for user {key}: {e}")
@@ -0,0 +1,344 @@
+"""
+Scrape cycles in separate worker processes.
+
+With SCRAPER_PROCESSES set, the bot process only talks to Telegram. Searches are shared
+out over worker processes by ``abs(tg_id) % shards``; every worker leases the due searches
+of its shard from search_jobs, runs them and writes the new listings to the
+notification_outbox table, which the bot drains. The database is the only channel between
+the processes, so nothing else needs to run and the whole setup works on a single SQLite file.
+"""
+
+import asyncio
+import contextlib
+import os
+import socket
+import sys
+import time
+from functools import partial
+from pathlib import Path
+from types import MethodType
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from configs.config import settings
+from db.crud.manager_jobs import (
+    activate_job,
+    claim_jobs,
+    count_leased_jobs,
+    deactivate_job,
+    finish_job,
+    get_active_jobs,
+    get_stalled_jobs,
+    release_leases,
+    renew_leases,
+)
+from db.crud.manager_outbox import push_notification
+from db.crud.manager_users import get_search_config, invalidate_user_config
+from db.database import database
+from src.loggers import logger
+
+from .intervals import AdaptiveInterval
+from .scheduler import to_datetime
+
+if TYPE_CHECKING:
+    from src.bot.deliveries import DeliveryTracker
+    from src.web_scraper.scraper import CianScraper
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def shard_of(key: int, shards: int) -> int:
+    """Shard a search belongs to, the same formula claim_jobs uses in SQL."""
+    return abs(key) % shards
+
+
+class ScrapeWorker:
+    """
+    Runs the searches of one shard, at most ``concurrency`` cycles at a time.
+
+    Searches are leased for ``lease_seconds`` and the leases of running cycles are renewed,
+    so a search is run by one worker at a time. If this process dies, its searches are only
+    picked up again by the next worker serving the same shard, once their leases expire.
+    """
+
+    def __init__(
+        self,
+        shard: int = 0,
+        shards: int = 1,
+        *,
+        concurrency: int = 4,
+        policy: Optional[AdaptiveInterval] = None,
+        lease_seconds: float = 600,
+        poll_interval: float = 1.0,
+        job_fn: Optional[Callable[[int], Awaitable[Optional[int]]]] = None,
+    ):
+        """
+        :param job_fn: Coroutine function running one cycle for a user and returning the number
+            of new listings. By default the user's search is scraped and notifications go to the outbox.
+        """
+        self.shard = shard
+        self.shards = shards
+        self.concurrency = concurrency
+        self.policy = policy or AdaptiveInterval()
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.job_fn = job_fn or self._scrape
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{shard}"
+
+        self.scrapers: Dict[int, "CianScraper"] = {}
+        self.deliveries: Optional["DeliveryTracker"] = None
+        self._tasks: Dict[int, asyncio.Task[None]] = {}
+        self._last_started: Dict[int, float] = {}
+        self._renewed = time.monotonic()
+        self._stopped = asyncio.Event()
+
+    @property
+    def running(self) -> int:
+        return len(self._tasks)
+
+    async def run(self) -> None:
+        """
+        Claim and run due searches until stop() is called.
+        """
+        logger.info(f"Worker {self.owner} serving shard {self.shard}/{self.shards}")
+        try:
+            while not self._stopped.is_set():
+                try:
+                    await self.poll()
+                except Exception as e:
+                    logger.error(f"Worker {self.owner} failed to poll jobs: {e}")
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._stopped.wait(), self.poll_interval)
+        finally:
+            await self.close()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    async def poll(self) -> List[asyncio.Task[None]]:
+        """
+        Renew running leases if due and start cycles for newly claimed searches.
+
+        :return: Tasks of the cycles started.
+        """
+        if self._tasks and time.monotonic() - self._renewed > self.lease_seconds / 3:
+            async with database() as db:
+                await renew_leases(db, self.owner, self._tasks, self.lease_seconds)
+            self._renewed = time.monotonic()
+
+        free = self.concurrency - len(self._tasks)
+        if free <= 0:
+            return []
+        async with database() as db:
+            jobs = await claim_jobs(db, self.owner, free, shard=self.shard, shards=self.shards, lease_seconds=self.lease_seconds)
+
+        started = []
+        for job in jobs:
+            task = asyncio.create_task(self._run_job(job.tg_id, job.new_rate))
+            self._tasks[job.tg_id] = task
+            task.add_done_callback(partial(self._forget_task, job.tg_id))
+            started.append(task)
+        return started
+
+    def _forget_task(self, key: int, _task: "asyncio.Task[None]") -> None:
+        self._tasks.pop(key, None)
+
+    async def _run_job(self, key: int, rate: Optional[float]) -> None:
+        started = time.time()
+        found = None
+        try:
+            found = await self.job_fn(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Search cycle for user {key} failed: {e}")
+
+        if found is not None:
+            previous = self._last_started.get(key)
+            elapsed = started - previous if previous is not None else self.policy.interval(rate)
+            rate = self.policy.update(rate, found, elapsed)
+        self._last_started[key] = started
+
+        now = time.time()
+        delay = self.policy.next_delay(rate)
+        try:
+            async with database() as db:
+                active = await finish_job(db, key, self.owner, to_datetime(now), to_datetime(now + delay), new_rate=rate)
+        except Exception as e:
+            logger.error(f"Failed to store the schedule of user {key}: {e}")
+            return
+        if active:
+            logger.info(f"Next cycle for user {key} in {delay:.0f}s ({found} new listings)")
+        else:
+            self._last_started.pop(key, None)
+            await self._drop_scraper(key)
+
+    async def _scrape(self, key: int) -> int:
+        # Imported here: only the default job needs the scraper and the delivery tracker.
+        from src.bot.deliveries import DeliveryTracker  # noqa: PLC0415
+        from src.utils import notify_listings_handler  # noqa: PLC0415
+        from src.web_scraper.scraper import CianScraper  # noqa: PLC0415
+
+        # The bot process owns the settings cache, so read the search from the database every cycle.
+        invalidate_user_config(key)
+        async with database() as db:
+            config = await get_search_config(db, key)
+
+        scraper = self.scrapers.get(key)
+        if scraper is not None and scraper.search_url != config.url:
+            await self._drop_scraper(key)
+            scraper = None
+        if scraper is None:
+            if self.deliveries is None:
+                self.deliveries = DeliveryTracker(max_chunks=settings.DELIVERY_CACHE_CHUNKS)
+            scraper = CianScraper(params=config.params, freeze_time=10, telegram_user_id=key, search_url=config.url)
+            decorated = notify_listings_handler(self._queue_notification, self.deliveries)(CianScraper.save_new_listings)
+            scraper.save_new_listings = MethodType(decorated, scraper)  # type: ignore[method-assign]
+            self.scrapers[key] = scraper
+        return await scraper.run_once()
+
+    async def _queue_notification(self, listings: List[Dict[str, Any]], user_id: int) -> None:
+        async with database() as db:
+            await push_notification(db, user_id, listings)
+
+    async def _drop_scraper(self, key: int) -> None:
+        scraper = self.scrapers.pop(key, None)
+        if scraper:
+            await scraper.close()
+
+    async def close(self) -> None:
+        """
+        Cancel running cycles, hand their searches back and close the scrapers.
+        """
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            async with database() as db:
+                released = await release_leases(db, self.owner)
+            if released:
+                logger.info(f"Worker {self.owner} released {released} searches")
+        except Exception as e:
+            logger.error(f"Worker {self.owner} failed to release its leases: {e}")
+        for key in list(self.scrapers):
+            await self._drop_scraper(key)
+
+
+class LeasedScheduler:
+    """
+    Scheduler front end of the bot process when cycles run in worker processes.
+
+    Has the interface of SearchScheduler that the bot uses, but only records searches in
+    search_jobs; the workers pick them up from there. Searches left overdue without a lease
+    are logged, since only a worker of their shard can run them.
+    """
+
+    def __init__(self, poll_interval: float = 5.0, shards: int = 1, stall_after: float = 300):
+        """
+        :param shards: Number of worker shards, to name the ones that look stalled.
+        :param stall_after: Seconds a search may stay overdue and unleased before it is reported.
+        """
+        self.poll_interval = poll_interval
+        self.shards = shards
+        self.stall_after = stall_after
+        self._active: Set[int] = set()
+        self._running = 0
+        self._warned = -stall_after
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def is_active(self, key: int) -> bool:
+        return key in self._active
+
+    @property
+    def pending(self) -> int:
+        """Number of searches not being run right now."""
+        return max(len(self._active) - self._running, 0)
+
+    @property
+    def running(self) -> int:
+        """Number of searches leased by workers, as of the last poll."""
+        return self._running
+
+    async def start(self) -> None:
+        async with database() as db:
+            jobs = await get_active_jobs(db)
+        self._active = {job.tg_id for job in jobs}
+        logger.info(f"{len(jobs)} active searches are run by worker processes")
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def add(self, key: int, run_at: Optional[float] = None) -> None:
+        self._active.add(key)
+        async with database() as db:
+            await activate_job(db, key, to_datetime(run_at if run_at is not None else time.time()))
+
+    async def remove(self, key: int) -> None:
+        self._active.discard(key)
+        async with database() as db:
+            await deactivate_job(db, key)
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                async with database() as db:
+                    self._running = await count_leased_jobs(db)
+                    stalled = await get_stalled_jobs(db, self.stall_after)
+            except Exception as e:
+                logger.warning(f"Failed to count running searches: {e}")
+                stalled = []
+            if stalled and time.monotonic() - self._warned >= self.stall_after:
+                shards = sorted({shard_of(key, self.shards) for key in stalled})
+                logger.warning(
+                    f"{len(stalled)} searches are overdue by over {self.stall_after:.0f}s with no worker running them; "
+                    f"check that workers for shards {shards} of {self.shards} are up"
+                )
+                self._warned = time.monotonic()
+            await asyncio.sleep(self.poll_interval)
+
+
+class WorkerSupervisor:
+    """
+    Starts one ``main.py worker`` process per shard and restarts any that exit.
+    """
+
+    def __init__(self, processes: int, restart_delay: float = 5.0):
+        self.processes = processes
+        self.restart_delay = restart_delay
+        self._procs: Dict[int, asyncio.subprocess.Process] = {}
+        self._tasks: List[asyncio.Task[None]] = []
+
+    def command(self, shard: int) -> List[str]:
+        return [sys.executable, str(PROJECT_ROOT / "main.py"), "worker", "--shard", str(shard), "--shards", str(self.processes)]
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._supervise(shard)) for shard in range(self.processes)]
+
+    async def _supervise(self, shard: int) -> None:
+        while True:
+            proc = await asyncio.create_subprocess_exec(*self.command(shard), cwd=PROJECT_ROOT)
+            self._procs[shard] = proc
+            logger.info(f"Started scraper worker {shard} (pid {proc.pid})")
+            code = await proc.wait()
+            logger.warning(f"Scraper worker {shard} exited with code {code}, restarting in {self.restart_delay:.0f}s")
+            await asyncio.sleep(self.restart_delay)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+        procs = [proc for proc in self._procs.values() if proc.returncode is None]
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                await asyncio.wait_for(proc.wait(), timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+        self._procs.clear()
@@ -0,0 +1,197 @@
+"""
+In-process tracing of scrape cycles.
+
+Spans nest through a context variable, so they follow the cycle across awaits and into
+tasks started with ``asyncio.gather``. Finished spans are written to TRACE_FILE as Chrome
+trace events (JSON array format), which chrome://tracing, Perfetto and speedscope open.
+Every asyncio task gets its own track, so the spans on a track always nest even when a
+cycle fetches pages concurrently; ``parent_id`` and ``root_id`` link them across tracks.
+With no TRACE_FILE, ``span`` returns a shared no-op context manager.
+"""
+
+import asyncio
+import atexit
+import contextlib
+import itertools
+import json
+import os
+import threading
+import time
+import weakref
+from contextvars import ContextVar, Token
+from functools import lru_cache, wraps
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Awaitable, Callable, ContextManager, Dict, List, Optional, Type, TypeVar
+
+from src.loggers import logger
+
+_NOOP = contextlib.nullcontext()
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_ids = itertools.count(1)
+
+T = TypeVar("T")
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.span_id = next(_ids)
+        self.parent: Optional[Span] = None
+        self.root_id = self.span_id
+        self.track = 0
+        self.start_ns = 0
+        self.end_ns = 0
+        self._token: Optional[Token[Optional[Span]]] = None
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self.parent = _current.get()
+        if self.parent is not None:
+            self.root_id = self.parent.root_id
+        self.track = self.tracer.track(self.name)
+        self._token = _current.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(
+        self, exc_type: Optional[Type[BaseException]], exc: Optional[BaseException], tb: Optional[TracebackType]
+    ) -> None:
+        self.end_ns = time.perf_counter_ns()
+        if self._token is not None:
+            _current.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer.record(self)
+
+
+class Tracer:
+    def __init__(self, path: Optional[str] = None, flush_every: int = 500):
+        """
+        :param path: File the trace events are appended to. Tracing is off without it.
+        :param flush_every: Number of buffered events that triggers a write.
+        """
+        self.path = Path(path) if path else None
+        self.flush_every = flush_every
+        self._events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._pid = os.getpid()
+        self._tracks: weakref.WeakKeyDictionary[asyncio.Task[Any], int] = weakref.WeakKeyDictionary()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def span(self, name: str, **attrs: Any) -> ContextManager[Optional[Span]]:
+        if self.path is None:
+            return _NOOP
+        return Span(self, name, attrs)
+
+    def track(self, name: str) -> int:
+        """
+        Track (``tid``) of the running asyncio task, or of the thread outside of one.
+        A new track is named after the task and the first span opened on it.
+        """
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is None:
+            return threading.get_ident()
+        track = self._tracks.get(task)
+        if track is None:
+            track = self._tracks[task] = next(_ids)
+            event = {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self._pid,
+                "tid": track,
+                "args": {"name": f"{task.get_name()}: {name}"},
+            }
+            with self._lock:
+                self._events.append(event)
+        return track
+
+    def record(self, span: Span) -> None:
+        args = {key: value if isinstance(value, (int, float, bool)) else str(value) for key, value in span.attrs.items()}
+        args["span_id"] = span.span_id
+        if span.parent is not None:
+            args["parent_id"] = span.parent.span_id
+            args["root_id"] = span.root_id
+        event = {
+            "name": span.name,
+            "cat": "cian",
+            "ph": "X",
+            "ts": span.start_ns / 1000,
+            "dur": (span.end_ns - span.start_ns) / 1000,
+            "pid": self._pid,
+            "tid": span.track,
+            "args": args,
+        }
+        with self._lock:
+            self._events.append(event)
+            full = span.parent is None and len(self._events) >= self.flush_every
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            events, self._events = self._events, []
+        if not events or self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                if not self._started and f.tell() == 0:
+                    f.write("[\n")
+                self._started = True
+                f.writelines(json.dumps(event, ensure_ascii=False) + ",\n" for event in events)
+        except OSError as e:
+            logger.error(f"Failed to write trace events to {self.path}: {e}")
+
+
+@lru_cache(maxsize=1)
+def get_tracer() -> Tracer:
+    """Tracer writing to TRACE_FILE, built on first use so importing this module doesn't read the settings."""
+    from configs.config import get_settings  # noqa: PLC0415
+
+    tracer = Tracer(get_settings().TRACE_FILE)
+    atexit.register(tracer.flush)
+    return tracer
+
+
+def span(name: str, **attrs: Any) -> ContextManager[Optional[Span]]:
+    """
+    Context manager timing a block as a child of the current span.
+    """
+    return get_tracer().span(name, **attrs)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """
+    Decorator running a coroutine function inside a span named after it.
+    """
+
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            tracer = get_tracer()
+            if tracer.path is None:
+                return await func(*args, **kwargs)
+            with tracer.span(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,8 +1,25 @@
-from .decorators import error_handler, notify_listings_handler
-from .serializer import to_dict
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .decorators import error_handler, notify_listings_handler
+    from .serializer import to_dict
+
+# decorators imports the database layer, so submodules are loaded on first access only.
+_EXPORTS = {
+    "notify_listings_handler": ".decorators",
+    "error_handler": ".decorators",
+    "to_dict": ".serializer",
+}
 
 __all__ = [
     "notify_listings_handler",
     "error_handler",
     "to_dict",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _EXPORTS:
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
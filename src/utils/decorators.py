@@ -1,43 +1,59 @@
 from functools import wraps
-from typing import Callable, Dict, List
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, TypeVar, cast
 
 from configs.config import settings
 from db.database import database
 from src.loggers import logger
 from src.web_scraper.saver import ListingSaver
 
+if TYPE_CHECKING:
+    from src.bot.deliveries import DeliveryTracker
 
-def notify_listings_handler(callback: Callable[[List[Dict], int], None]):
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+def notify_listings_handler(
+    callback: Optional[Callable[[List[Dict[str, Any]], int], Awaitable[None]]], tracker: Optional["DeliveryTracker"] = None
+) -> Callable[[F], F]:
     """
-    A decorator to send notifications when new listings are saved.
+    A decorator to send notifications about the listings a save call inserted.
+
+    The decorated function must take the search page URLs and return the inserted listings,
+    as CianScraper.save_new_listings does.
 
     :param callback: A function that takes a list of new listings and sends notifications.
+    :param tracker: Optional DeliveryTracker. With it, listings on the search page that were
+        already stored by other users' searches are sent too, and every listing is sent to a
+        user at most once.
     """
 
-    def decorator(func):
+    def decorator(func: F) -> F:
         @wraps(func)
-        async def wrapper(self, *args, **kwargs):
-            async with database() as session:
-                size_before = await ListingSaver.get_data_size(session)
-
-                result = await func(self, *args, **kwargs)
+        async def wrapper(self: Any, urls: List[str], *args: Any, **kwargs: Any) -> Any:
+            new_listings = await func(self, urls, *args, **kwargs)
+            user_id = getattr(self, "telegram_user_id", None)
+            if not callback or not user_id:
+                return new_listings
 
-                size_after = await ListingSaver.get_data_size(session)
-                if size_after > size_before:
-                    new_listings = await ListingSaver.get_recent_listings(session, limit=size_after - size_before)
-                    if new_listings and callback and hasattr(self, "telegram_user_id") and self.telegram_user_id:
-                        await callback(new_listings, self.telegram_user_id)
+            candidates = list(new_listings)
+            if tracker is not None:
+                inserted = {listing["url"] for listing in new_listings}
+                async with database() as session:
+                    candidates += await ListingSaver.get_listings(session, [url for url in urls if url not in inserted])
+                candidates = await tracker.claim(user_id, candidates)
 
-                return result
+            if candidates:
+                await callback(candidates, user_id)
+            return new_listings
 
-        return wrapper
+        return cast(F, wrapper)
 
     return decorator
 
 
-def error_handler(func):
+def error_handler(func: F) -> F:
     @wraps(func)
-    async def wrapper(*args, **kwargs):
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
         try:
             return await func(*args, **kwargs)
         except Exception as e:
@@ -46,4 +62,4 @@ def error_handler(func):
             await self.bot.send_message(chat_id=settings.TELEGRAM_ADMIN_ID, text=f"Error in {func.__name__}: {str(e)[:4096]}")
             raise
 
-    return wrapper
+    return cast(F, wrapper)
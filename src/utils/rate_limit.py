@@ -0,0 +1,33 @@
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at ``rate`` tokens per second up to ``capacity``.
+
+    ``consume`` may take the bucket below zero; the debt is paid back before ``delay``
+    reports tokens as available again, so callers that don't wait still get throttled.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """
+        Seconds until ``cost`` tokens are available.
+        """
+        self._refill(now if now is not None else time.monotonic())
+        missing = min(cost, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def consume(self, cost: float = 1.0, now: Optional[float] = None) -> None:
+        self._refill(now if now is not None else time.monotonic())
+        self.tokens -= cost
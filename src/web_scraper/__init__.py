@@ -1,5 +1,23 @@
-from .parser import DetailParser, ListingParser
-from .requester import AsyncRequester
-from .scraper import CianScraper
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .parser import DetailParser, ListingParser
+    from .requester import AsyncRequester
+    from .scraper import CianScraper
+
+# Submodules pull in BeautifulSoup, aiohttp and requests; load them on first access only.
+_EXPORTS = {
+    "DetailParser": ".parser",
+    "ListingParser": ".parser",
+    "AsyncRequester": ".requester",
+    "CianScraper": ".scraper",
+}
 
 __all__ = ["DetailParser", "ListingParser", "AsyncRequester", "CianScraper"]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _EXPORTS:
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
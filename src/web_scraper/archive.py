@@ -0,0 +1,326 @@
+"""
+Archive of the raw HTML of fetched pages, so parser changes can be applied to history
+without fetching it again.
+
+Pages are stored in their own SQLite file, keyed by kind ("listing" or "detail"), offer
+id (the search URL for listing pages) and fetch time. Cian pages share most of their
+markup, so every page is compressed on its own with a dictionary trained on the first
+pages of its kind: random access stays one row read and one decompression, and the
+ratio is close to compressing the whole archive as a single stream.
+
+zstandard is used when it is installed (``pip install .[archive]``); otherwise zlib with
+a preset dictionary built from the lines most samples have in common.
+"""
+
+import argparse
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from configs.config import get_settings
+from src.loggers import logger
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None  # type: ignore[assignment]
+
+LISTING = "listing"
+DETAIL = "detail"
+
+ZLIB_DICT_SIZE = 32 * 1024  # zlib only looks back 32 KiB
+OFFER_ID = re.compile(r"/(\d+)/?(?:[?#].*)?$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dictionaries (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    codec TEXT NOT NULL,
+    data BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    url TEXT NOT NULL,
+    codec TEXT NOT NULL,
+    dict_id INTEGER,
+    raw_size INTEGER NOT NULL,
+    body BLOB NOT NULL,
+    PRIMARY KEY (kind, key, fetched_at)
+);
+"""
+COLUMNS = "kind, key, fetched_at, url, codec, dict_id, body"
+
+
+class ArchivedPage(NamedTuple):
+    kind: str
+    key: str
+    fetched_at: float
+    url: str
+    codec: str
+    dict_id: Optional[int]
+    body: bytes
+
+
+def offer_key(url: str) -> str:
+    """Offer id of a detail page URL, or the URL itself if it has none."""
+    match = OFFER_ID.search(url)
+    return match.group(1) if match else url
+
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+@lru_cache(maxsize=16)
+def _zstd_compressor(dictionary: Optional[bytes], level: int) -> "zstandard.ZstdCompressor":
+    dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+    return zstandard.ZstdCompressor(level=level, dict_data=dict_data)
+
+
+@lru_cache(maxsize=16)
+def _zstd_decompressor(dictionary: Optional[bytes]) -> "zstandard.ZstdDecompressor":
+    dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+    return zstandard.ZstdDecompressor(dict_data=dict_data)
+
+
+def compress(codec: str, data: bytes, dictionary: Optional[bytes] = None, level: int = 9) -> bytes:
+    if codec == "zstd":
+        return _zstd_compressor(dictionary, level).compress(data)
+    compressor = zlib.compressobj(level, zdict=dictionary) if dictionary else zlib.compressobj(level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(codec: str, blob: bytes, dictionary: Optional[bytes] = None) -> bytes:
+    """
+    Module-level so that worker processes can decompress pages with a copy of the dictionary.
+    Not thread-safe for zstd: the decompressor of a dictionary is shared.
+    """
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("The archive was written with zstd: pip install zstandard")
+        return _zstd_decompressor(dictionary).decompress(blob)
+    decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+    return decompressor.decompress(blob) + decompressor.flush()
+
+
+def train_dictionary(codec: str, samples: List[bytes], size: int) -> bytes:
+    if codec == "zstd":
+        return zstandard.train_dictionary(size, list(samples)).as_bytes()
+
+    # zlib has no trainer: keep the lines most pages contain, most common last (closest to the data).
+    seen: Counter[bytes] = Counter()
+    for sample in samples:
+        seen.update(set(sample.splitlines(keepends=True)))
+    common = [line for line, count in seen.most_common() if count > 1 and len(line) > 8]
+    parts, total = [], 0
+    for line in common:
+        if total + len(line) > min(size, ZLIB_DICT_SIZE):
+            break
+        parts.append(line)
+        total += len(line)
+    return b"".join(reversed(parts))
+
+
+class PageArchive:
+    """
+    :param path: SQLite file of the archive.
+    :param level: Compression level.
+    :param dict_size: Target size of trained dictionaries in bytes.
+    :param train_samples: Pages of a kind compressed without a dictionary before one is trained.
+    """
+
+    def __init__(self, path: str | Path, level: int = 9, dict_size: int = 112640, train_samples: int = 200):
+        self.path = Path(path)
+        self.level = level
+        self.dict_size = dict_size
+        self.train_samples = train_samples
+        self.codec = default_codec()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        # _lock only guards the buffer, so add() never waits for a flush; flushes run one at a
+        # time under _flush_lock, and _db_lock serialises the shared connection.
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._pending: List[Tuple[str, str, float, str, str]] = []
+        self._samples: Dict[str, List[bytes]] = {LISTING: [], DETAIL: []}
+        self._dicts: Dict[int, Tuple[str, bytes]] = {}
+        self._current: Dict[str, int] = {}
+        self._load_dictionaries()
+
+    def _load_dictionaries(self) -> None:
+        """
+        Read the dictionaries table, including dictionaries other processes trained since.
+        """
+        with self._db_lock:
+            rows = self._conn.execute("SELECT id, kind, codec, data FROM dictionaries ORDER BY id").fetchall()
+        for dict_id, kind, codec, data in rows:
+            self._dicts[dict_id] = (codec, data)
+            if codec == self.codec:
+                self._current[kind] = dict_id
+
+    def add(self, kind: str, url: str, html: str, fetched_at: Optional[float] = None) -> None:
+        """
+        Buffer a page for the next flush(). Cheap enough to call from the event loop.
+        """
+        key = url if kind == LISTING else offer_key(url)
+        with self._lock:
+            self._pending.append((kind, key, fetched_at or time.time(), url, html))
+
+    def flush(self) -> int:
+        """
+        Compress buffered pages and write them in one transaction. CPU-bound, so call it
+        from a thread (``asyncio.to_thread``) in async code.
+
+        :return: Number of pages written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            rows = []
+            for kind, key, fetched_at, url, html in pending:
+                data = html.encode("utf-8")
+                dict_id = self._current.get(kind)
+                if dict_id is None:
+                    samples = self._samples.setdefault(kind, [])
+                    samples.append(data)
+                    if len(samples) >= self.train_samples:
+                        dict_id = self._train(kind, samples)
+                        samples.clear()
+                body = compress(self.codec, data, self.dictionary(dict_id), self.level)
+                rows.append((kind, key, fetched_at, url, self.codec, dict_id, len(data), body))
+            if rows:
+                with self._db_lock, self._conn:
+                    self._conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def _train(self, kind: str, samples: List[bytes]) -> Optional[int]:
+        # Another process sharing the archive may have trained one already.
+        self._load_dictionaries()
+        if kind in self._current:
+            return self._current[kind]
+        try:
+            data = train_dictionary(self.codec, samples, self.dict_size)
+        except Exception as e:
+            logger.warning(f"Failed to train a {kind} page dictionary: {e}")
+            return None
+        with self._db_lock:
+            cursor = self._conn.execute(
+                "INSERT INTO dictionaries (kind, codec, data, created_at) VALUES (?, ?, ?, ?)",
+                (kind, self.codec, data, time.time()),
+            )
+            self._conn.commit()
+        dict_id = cursor.lastrowid
+        if dict_id is None:
+            return None
+        self._dicts[dict_id] = (self.codec, data)
+        self._current[kind] = dict_id
+        logger.info(f"Trained a {len(data)} byte {self.codec} dictionary on {len(samples)} {kind} pages")
+        return dict_id
+
+    def dictionary(self, dict_id: Optional[int]) -> Optional[bytes]:
+        if dict_id is None:
+            return None
+        if dict_id not in self._dicts:
+            self._load_dictionaries()
+        return self._dicts[dict_id][1]
+
+    def dictionaries(self) -> Dict[int, bytes]:
+        self._load_dictionaries()
+        return {dict_id: data for dict_id, (_, data) in self._dicts.items()}
+
+    def read(self, page: ArchivedPage) -> str:
+        return decompress(page.codec, page.body, self.dictionary(page.dict_id)).decode("utf-8")
+
+    def get(self, kind: str, key: str, fetched_at: Optional[float] = None) -> Optional[str]:
+        """
+        HTML of a page: the latest version, or the latest one fetched at or before ``fetched_at``.
+
+        :param key: Offer id for detail pages, URL for listing pages.
+        """
+        with self._db_lock:
+            row = self._conn.execute(
+                f"SELECT {COLUMNS} FROM pages WHERE kind = ? AND key = ? AND fetched_at <= ? ORDER BY fetched_at DESC LIMIT 1",
+                (kind, key, fetched_at if fetched_at is not None else float("inf")),
+            ).fetchone()
+        return self.read(ArchivedPage(*row)) if row else None
+
+    def pages(self, kind: str = DETAIL, latest: bool = True, batch: int = 500) -> Iterator[ArchivedPage]:
+        """
+        Iterate over stored pages without decompressing them.
+
+        :param latest: Only the last fetch of every key.
+        """
+        query = f"SELECT {COLUMNS} FROM pages WHERE kind = ?"
+        if latest:
+            query += " AND fetched_at = (SELECT MAX(fetched_at) FROM pages p WHERE p.kind = pages.kind AND p.key = pages.key)"
+        query += " ORDER BY key, fetched_at"
+        # A connection of its own, so iterating doesn't hold up writers.
+        conn = sqlite3.connect(self.path)
+        try:
+            cursor = conn.execute(query, (kind,))
+            while rows := cursor.fetchmany(batch):
+                yield from (ArchivedPage(*row) for row in rows)
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT kind, COUNT(*), COUNT(DISTINCT key), SUM(raw_size), SUM(LENGTH(body)) FROM pages GROUP BY kind"
+            ).fetchall()
+        return {
+            kind: {
+                "pages": pages,
+                "keys": keys,
+                "raw_bytes": raw,
+                "stored_bytes": stored,
+                "ratio": raw / stored if stored else 0.0,
+            }
+            for kind, pages, keys, raw, stored in rows
+        }
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+
+@lru_cache(maxsize=1)
+def get_archive() -> Optional[PageArchive]:
+    """Archive configured by PAGE_ARCHIVE_PATH, if archiving is enabled."""
+    settings = get_settings()
+    if not settings.PAGE_ARCHIVE_PATH:
+        return None
+    return PageArchive(
+        settings.PAGE_ARCHIVE_PATH,
+        level=settings.PAGE_ARCHIVE_LEVEL,
+        dict_size=settings.PAGE_ARCHIVE_DICT_SIZE,
+        train_samples=settings.PAGE_ARCHIVE_TRAIN_SAMPLES,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Page archive statistics")
+    parser.add_argument("path", nargs="?", help="Archive file (PAGE_ARCHIVE_PATH by default)")
+    args = parser.parse_args()
+    path = args.path or get_settings().PAGE_ARCHIVE_PATH
+    if not path:
+        parser.error("no archive file given and PAGE_ARCHIVE_PATH is not set")
+    archive = PageArchive(path)
+    for kind, row in archive.stats().items():
+        print(
+            f"{kind}: {row['pages']} pages of {row['keys']} keys, "
+            f"{row['raw_bytes'] / 2**20:.1f} MiB -> {row['stored_bytes'] / 2**20:.1f} MiB ({row['ratio']:.1f}x)"
+        )
@@ -1,10 +1,12 @@
 import json
 import re
+import time
 from typing import Dict, Optional
 
 from bs4 import BeautifulSoup
 
 from src.loggers import logger
+from src.metrics import PARSE_SECONDS
 
 
 class ListingParser:
@@ -18,7 +20,8 @@ class ListingParser:
 
         :param html: HTML content of the listing page
         """
-        self.soup = BeautifulSoup(html, "lxml")
+        with PARSE_SECONDS.time(parser="listing", stage="soup"):
+            self.soup = BeautifulSoup(html, "lxml")
 
     def parse_apartment_links(self) -> list:
         """
@@ -47,7 +50,8 @@ class DetailParser:
 
         :param html: HTML content of the detail page.
         """
-        self.soup = BeautifulSoup(html, "lxml")
+        with PARSE_SECONDS.time(parser="detail", stage="soup"):
+            self.soup = BeautifulSoup(html, "lxml")
         self.details = {
             "title": None,
             "price": None,
@@ -149,6 +153,7 @@ class DetailParser:
         Returns:
             dict: A dictionary containing extracted information.
         """
+        started = time.perf_counter()
         try:
             self.__parse_json_ld()
             self.__parse_fallback_data()
@@ -156,5 +161,6 @@ class DetailParser:
 
         except Exception as e:
             logger.warning(f"[parse_apartment_details] An error occurred: {e}")
+        PARSE_SECONDS.observe(time.perf_counter() - started, parser="detail", stage="extract")
 
         return self.details
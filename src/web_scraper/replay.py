@@ -0,0 +1,140 @@
+import atexit
+import gzip
+import itertools
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from configs.config import settings
+from src.loggers import logger
+
+Response = Tuple[str, int, Dict[str, str]]
+
+
+class TrafficArchive:
+    """
+    Append-only archive of HTTP responses stored as gzip-compressed JSON lines.
+
+    ``record`` only buffers the response; ``flush`` appends the buffered ones as one gzip
+    member, so the file is written off the event loop, compresses across responses, and an
+    interrupted recording stays readable up to the last flush.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._pending: List[bytes] = []
+
+    def record(self, url: str, status: int, headers: Dict[str, str], body: str) -> None:
+        entry = {
+            "url": url,
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() == "content-type"},
+            "body": body,
+            "ts": time.time(),
+        }
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._pending.append(line)
+
+    def flush(self) -> int:
+        """
+        Append the buffered responses to the file. Blocking, so call it through
+        ``asyncio.to_thread`` in async code.
+
+        :return: Number of responses written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self.path, "ab") as f:
+            f.write(b"".join(pending))
+        return len(pending)
+
+    def load(self) -> Dict[str, List[Response]]:
+        """
+        Read the archive back, grouping responses by URL in recording order.
+        """
+        self.flush()
+        responses: Dict[str, List[Response]] = defaultdict(list)
+        if not self.path.exists():
+            return responses
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                responses[entry["url"]].append((entry["body"], entry["status"], entry["headers"]))
+        return responses
+
+
+class ReplayTransport:
+    """
+    Serves recorded responses instead of hitting the network.
+
+    URLs recorded several times are replayed round-robin. Unknown URLs answer 404.
+    Latency and failures are simulated from a seeded RNG, so runs are deterministic.
+    """
+
+    def __init__(
+        self,
+        archive: TrafficArchive,
+        latency: Tuple[float, float] = (0.0, 0.0),
+        error_rate: float = 0.0,
+        error_statuses: Tuple[int, ...] = (429, 503),
+        seed: Optional[int] = 0,
+    ):
+        """
+        :param archive: Recorded traffic.
+        :param latency: Range (seconds) of the simulated response time.
+        :param error_rate: Probability of answering with one of ``error_statuses`` instead.
+        :param error_statuses: Statuses used for injected errors.
+        :param seed: RNG seed for latency and error injection.
+        """
+        self.responses = archive.load()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.rng = random.Random(seed)
+        self._cursors = {url: itertools.cycle(items) for url, items in self.responses.items()}
+        logger.info(f"Replaying {sum(map(len, self.responses.values()))} responses from {archive.path}")
+
+    def delay(self) -> float:
+        return self.rng.uniform(*self.latency)
+
+    def respond(self, url: str) -> Response:
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return "", self.rng.choice(self.error_statuses), {}
+        cursor = self._cursors.get(url)
+        if cursor is None:
+            return "", 404, {}
+        return next(cursor)
+
+
+@lru_cache(maxsize=1)
+def get_recorder() -> Optional[TrafficArchive]:
+    """Archive configured by HTTP_RECORD_PATH, if recording is enabled."""
+    if not settings.HTTP_RECORD_PATH:
+        return None
+    recorder = TrafficArchive(settings.HTTP_RECORD_PATH)
+    # Scrapers flush after every cycle; this keeps what SyncRequester recorded since.
+    atexit.register(recorder.flush)
+    return recorder
+
+
+@lru_cache(maxsize=1)
+def get_replay() -> Optional[ReplayTransport]:
+    """Transport configured by HTTP_REPLAY_PATH, if replay is enabled."""
+    if not settings.HTTP_REPLAY_PATH:
+        return None
+    low, high = settings.HTTP_REPLAY_LATENCY
+    return ReplayTransport(
+        TrafficArchive(settings.HTTP_REPLAY_PATH),
+        latency=(low, high),
+        error_rate=settings.HTTP_REPLAY_ERROR_RATE,
+    )
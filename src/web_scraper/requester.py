@@ -4,14 +4,15 @@ import random
 import time
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Dict, Tuple
+from typing import Any, Dict, Optional, Tuple
 from urllib.parse import urlencode
 
 import aiohttp
-import requests
 
 from configs.config import settings
 from src.loggers import logger
+from src.metrics import FETCH_RESPONSES, FETCH_SECONDS
+from src.web_scraper.replay import ReplayTransport, TrafficArchive
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -20,10 +21,14 @@ USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0",
 ]
 
+# Statuses meaning the page no longer exists: retrying them is pointless.
+GONE_STATUSES = (404, 410)
+
 
 class RequesterMode(Enum):
     Async = 1
     Sync = 2
+    Replay = 3
 
 
 class ProxyManager:
@@ -53,11 +58,13 @@ class Requester(ABC):
         params: dict = None,
         freeze_time: int = 0,
         max_retries: int = 3,
+        recorder: Optional[TrafficArchive] = None,
     ):
         self.params = params or {}
         self.url = f"{url.rstrip('/')}/cat.php?{urlencode(self.params)}" if self.params else url
         self.timer = freeze_time
         self.max_retries = max_retries
+        self.recorder = recorder
 
         self.headers = {
             "User-Agent": random.choice(USER_AGENTS),
@@ -80,6 +87,10 @@ class Requester(ABC):
     async def fetch(self) -> Tuple[str, int, Dict[str, str]]:
         pass
 
+    def _record(self, text: str, status: int, headers: Dict[str, str]) -> None:
+        if self.recorder:
+            self.recorder.record(self.url, status, headers, text)
+
 
 class AsyncRequester(Requester):
     def __init__(self, *args, session: aiohttp.ClientSession | None = None, **kwargs):
@@ -104,6 +115,7 @@ class AsyncRequester(Requester):
                     self.session = aiohttp.ClientSession()
                     owns_session = True
 
+                started = time.perf_counter()
                 try:
                     async with self.session.get(
                         self.url,
@@ -113,6 +125,7 @@ class AsyncRequester(Requester):
                         allow_redirects=True,
                     ) as response:
                         logger.info(f"Fetched {self.url} with status {response.status}")
+                        FETCH_RESPONSES.inc(status=response.status)
 
                         if response.status == 403:
                             logger.warning("403 Forbidden: Cian blocked request. Rotating User-Agent and Proxy.")
@@ -121,16 +134,24 @@ class AsyncRequester(Requester):
                             continue
 
                         if response.status == 200:
-                            return await response.text(), response.status, dict(response.headers)
+                            text = await response.text()
+                            self._record(text, response.status, dict(response.headers))
+                            return text, response.status, dict(response.headers)
+
+                        if response.status in GONE_STATUSES:
+                            self._record("", response.status, dict(response.headers))
+                            return "", response.status, dict(response.headers)
 
                         logger.warning(f"Unexpected response {response.status}. Retrying...")
 
                 finally:
+                    FETCH_SECONDS.observe(time.perf_counter() - started, kind="async")
                     if owns_session:
                         await self.session.close()
                         self.session = None
 
             except aiohttp.ClientError as e:
+                FETCH_RESPONSES.inc(status="error")
                 logger.error(f"Network error: {e}. Retrying...")
                 self.proxy = self.proxy_manager.get_proxy()
 
@@ -142,6 +163,10 @@ class SyncRequester(Requester):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+        # requests is only needed by this rarely used requester, so it is imported here.
+        import requests  # noqa: PLC0415
+
+        self._requests = requests
         self.session = requests.Session()
         self.session.headers.update(self.headers)
 
@@ -159,13 +184,15 @@ class SyncRequester(Requester):
             try:
                 logger.info(f"Attempt {attempt}: Requesting {self.url}")
 
-                response = self.session.get(
-                    self.url,
-                    headers=self.headers,
-                    timeout=15,
-                    allow_redirects=True,
-                    verify=not self.proxy,
-                )
+                with FETCH_SECONDS.time(kind="sync"):
+                    response = self.session.get(
+                        self.url,
+                        headers=self.headers,
+                        timeout=15,
+                        allow_redirects=True,
+                        verify=not self.proxy,
+                    )
+                FETCH_RESPONSES.inc(status=response.status_code)
 
                 logger.info(f"Fetched {self.url} with status {response.status_code}")
 
@@ -179,11 +206,17 @@ class SyncRequester(Requester):
                     continue
 
                 if response.status_code == 200:
+                    self._record(response.text, response.status_code, dict(response.headers))
                     return response.text, response.status_code, dict(response.headers)
 
+                if response.status_code in GONE_STATUSES:
+                    self._record("", response.status_code, dict(response.headers))
+                    return "", response.status_code, dict(response.headers)
+
                 logger.warning(f"Unexpected status {response.status_code}. Retrying...")
 
-            except requests.exceptions.RequestException as e:
+            except self._requests.exceptions.RequestException as e:
+                FETCH_RESPONSES.inc(status="error")
                 logger.error(f"Request error: {e}")
                 self.proxy = self.proxy_manager.get_proxy()
                 if self.proxy:
@@ -197,14 +230,33 @@ class SyncRequester(Requester):
         return await loop.run_in_executor(None, self._sync_fetch)
 
 
+class ReplayRequester(Requester):
+    """
+    Serves responses from a ReplayTransport instead of the network.
+    The freeze time is ignored: the transport simulates latency itself.
+    """
+
+    def __init__(self, *args: Any, transport: ReplayTransport, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.transport = transport
+
+    async def fetch(self) -> Tuple[str, int, Dict[str, str]]:
+        await asyncio.sleep(self.transport.delay())
+        text, status, headers = self.transport.respond(self.url)
+        logger.debug(f"Replayed {self.url} with status {status}")
+        return text, status, dict(headers)
+
+
 def create_requester(
     url: str,
-    params: dict = None,
+    params: Optional[Dict[str, Any]] = None,
     *,
     freeze_time: int = 0,
     max_retries: int = 3,
     mode: RequesterMode = RequesterMode.Async,
-    session: aiohttp.ClientSession = None,
+    session: Optional[aiohttp.ClientSession] = None,
+    recorder: Optional[TrafficArchive] = None,
+    transport: Optional[ReplayTransport] = None,
 ) -> Requester:
     """
     Фабрика для создания Requester (AsyncRequester или SyncRequester).
@@ -215,11 +267,19 @@ def create_requester(
     :param max_retries: Кол-во попыток
     :param mode: "Async" (по умолчанию) или "RequesterMode.Sync"
     :param session: aiohttp.ClientSession (только для async)
+    :param recorder: Архив, в который записываются полученные ответы
+    :param transport: Источник записанных ответов (только для RequesterMode.Replay)
     :return: Requester с асинхронным fetch()
     """
     if mode == RequesterMode.Async:
-        return AsyncRequester(url, params=params, freeze_time=freeze_time, max_retries=max_retries, session=session)
+        return AsyncRequester(
+            url, params=params, freeze_time=freeze_time, max_retries=max_retries, session=session, recorder=recorder
+        )
     elif mode == RequesterMode.Sync:
-        return SyncRequester(url, params=params, freeze_time=freeze_time, max_retries=max_retries)
+        return SyncRequester(url, params=params, freeze_time=freeze_time, max_retries=max_retries, recorder=recorder)
+    elif mode == RequesterMode.Replay:
+        if transport is None:
+            raise ValueError("Replay mode requires a transport")
+        return ReplayRequester(url, params=params, freeze_time=freeze_time, max_retries=max_retries, transport=transport)
     else:
         raise ValueError(f"Unknown requester mode: {mode}")
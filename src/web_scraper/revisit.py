@@ -0,0 +1,120 @@
+import asyncio
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.crud.manager_apartments import claim_due_listings
+from db.models import Apartment, ApartmentHistory, utcnow
+from src.loggers import logger
+from src.web_scraper.parser import DetailParser
+from src.web_scraper.requester import GONE_STATUSES
+from src.web_scraper.saver import HASHED_FIELDS, ListingSaver
+
+PageFetcher = Callable[[str], Awaitable[Tuple[str, int]]]
+
+
+class ListingRevisitor:
+    """
+    Re-fetches stored listings to track price and status changes.
+
+    Every listing carries its own revisit interval: it halves when a revisit finds a change
+    and grows by ``backoff`` when nothing changed, within ``[min_interval, max_interval]``.
+    Changes are detected by comparing the content hash of the extracted fields, and price
+    and status changes are written to ``apartment_history``.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 6 * 3600,
+        max_interval: float = 14 * 86400,
+        backoff: float = 1.5,
+        concurrency_limit: int = 3,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.concurrency_limit = concurrency_limit
+        self.detail_parser = DetailParser
+
+    def _next_interval(self, current: Optional[float], changed: bool) -> float:
+        current = current or self.min_interval
+        interval = current / 2 if changed else current * self.backoff
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    async def revisit(self, session: AsyncSession, fetch_page: PageFetcher, budget: int) -> int:
+        """
+        Revisit at most ``budget`` due listings.
+
+        :param session: Database session.
+        :param fetch_page: Coroutine returning (html, status_code) for a URL.
+        :param budget: Maximum number of pages fetched, keeps revisits from crowding out discovery.
+        :return: Number of listings found changed or removed.
+        """
+        if budget <= 0:
+            return 0
+        listings = await claim_due_listings(session, budget)
+        if not listings:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency_limit)
+
+        async def fetch(listing: Apartment) -> Tuple[str, int]:
+            async with semaphore:
+                return await fetch_page(listing.url)
+
+        pages = await asyncio.gather(*(fetch(listing) for listing in listings), return_exceptions=True)
+
+        changed = 0
+        for listing, page in zip(listings, pages, strict=True):
+            if isinstance(page, BaseException):
+                logger.warning(f"Revisit of {listing.url} failed: {page}")
+                listing.next_check_at = utcnow() + timedelta(seconds=listing.check_interval or self.min_interval)
+                continue
+            changed += self._apply(session, listing, *page)
+
+        await session.commit()
+        logger.info(f"Revisited {len(listings)} listings, {changed} changed")
+        return changed
+
+    def _apply(self, session: AsyncSession, listing: Apartment, html: str, status_code: int) -> bool:
+        now = utcnow()
+        listing.last_checked_at = now
+
+        if status_code in GONE_STATUSES:
+            session.add(ApartmentHistory(listing_id=listing.id, field="status", old_value=listing.status, new_value="removed"))
+            listing.status = "removed"
+            listing.next_check_at = None
+            listing.change_count = (listing.change_count or 0) + 1
+            return True
+
+        if status_code != 200 or not html:
+            listing.next_check_at = now + timedelta(seconds=listing.check_interval or self.min_interval)
+            return False
+
+        details = self.detail_parser(html).parse_apartment_details()
+        new_hash = ListingSaver.content_hash(details)
+        is_changed = listing.content_hash is not None and new_hash != listing.content_hash
+
+        if is_changed:
+            new_price = details.get("price")
+            if str(new_price) != str(listing.price) and _as_float(new_price) != listing.price:
+                session.add(
+                    ApartmentHistory(listing_id=listing.id, field="price", old_value=str(listing.price), new_value=str(new_price))
+                )
+            for field in HASHED_FIELDS:
+                if details.get(field) is not None:
+                    setattr(listing, field, details[field])
+            listing.change_count = (listing.change_count or 0) + 1
+
+        listing.content_hash = new_hash
+        listing.check_interval = self._next_interval(listing.check_interval, is_changed)
+        listing.next_check_at = now + timedelta(seconds=listing.check_interval)
+        return is_changed
+
+
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -1,37 +1,60 @@
 import asyncio
-from typing import Awaitable, Callable, Dict, List
+import hashlib
+import json
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List
 
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from db.models import Apartment, ApartmentImage
+from configs.config import settings
+from db.models import Apartment, ApartmentImage, utcnow
 from src.loggers import logger
+from src.metrics import DB_COMMIT_SECONDS, LISTINGS_SAVED
+from src.tracing import span, traced
+
+# Fields whose change on a revisit is worth recording.
+HASHED_FIELDS = ("title", "price", "description", "address", "rooms", "area")
 
 
 class ListingSaver:
+    @staticmethod
+    def content_hash(details: Dict[str, Any]) -> str:
+        """
+        Hash the extracted fields of a listing, so a revisit can detect changes without diffing.
+        """
+        payload = json.dumps([str(details.get(field) or "") for field in HASHED_FIELDS], ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    @traced("save")
     async def save(
         self,
         urls: List[str],
-        fetch_details_fn: Callable[[str], Awaitable[Dict]],
+        fetch_details_fn: Callable[[str], Awaitable[Dict[str, Any]]],
         session: AsyncSession,
         concurrency_limit: int = 3,
-    ) -> None:
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch details for unseen URLs and store them.
+
+        :return: The listings inserted by this call, in the shape used for notifications.
+        """
         new_data = await self._collect_new_data(urls, fetch_details_fn, session, concurrency_limit)
         if not new_data:
             logger.info("No new listings to save.")
-            return
-        await self._commit_data(new_data, session)
+            return []
+        return await self.insert_listings(new_data, session)
 
     async def _collect_new_data(
         self,
         urls: List[str],
-        fetch_details_fn: Callable[[str], Awaitable[Dict]],
+        fetch_details_fn: Callable[[str], Awaitable[Dict[str, Any]]],
         session: AsyncSession,
         concurrency_limit: int = 3,
-    ) -> List[Dict]:
+    ) -> List[Dict[str, Any]]:
         semaphore = asyncio.Semaphore(concurrency_limit)
-        existing_urls = await self.get_existing_urls(session)
+        existing_urls = await self.get_existing_urls(session, urls)
 
         async def process_url(url: str) -> Dict[str, str] | None:
             async with semaphore:
@@ -53,7 +76,21 @@ class ListingSaver:
 
         return new_data
 
-    async def _commit_data(self, listings: List[Dict], session: AsyncSession) -> None:
+    async def insert_listings(self, listings: List[Dict[str, Any]], session: AsyncSession) -> List[Dict[str, Any]]:
+        """
+        Store already fetched listings and commit.
+
+        :param listings: Parsed detail pages, with ``url`` and ``images``.
+        :return: The listings inserted, in the shape used for notifications.
+        """
+        with DB_COMMIT_SECONDS.time(), span("db_commit", listings=len(listings)):
+            saved = await self._insert(listings, session)
+        LISTINGS_SAVED.inc(len(saved))
+        return saved
+
+    async def _insert(self, listings: List[Dict[str, Any]], session: AsyncSession) -> List[Dict[str, Any]]:
+        saved = []
+        now = utcnow()
         for det in listings:
             try:
                 listing = Apartment(
@@ -65,41 +102,59 @@ class ListingSaver:
                     rooms=det.get("rooms"),
                     area=det.get("area"),
                     url=det.get("url"),
+                    content_hash=self.content_hash(det),
+                    last_checked_at=now,
+                    check_interval=settings.REVISIT_INITIAL_INTERVAL,
+                    next_check_at=now + timedelta(seconds=settings.REVISIT_INITIAL_INTERVAL),
                 )
                 session.add(listing)
                 await session.flush()
 
                 images = det.get("images")
-                if isinstance(images, list):
-                    session.add_all([ApartmentImage(listing_id=listing.id, url=img_url) for img_url in images])
+                if not isinstance(images, list):
+                    images = []
+                session.add_all([ApartmentImage(listing_id=listing.id, url=img_url) for img_url in images])
+                saved.append(self.to_record(listing, images))
             except Exception as e:
                 logger.exception(f"Failed to save listing {det.get('url')}: {e}")
 
         await session.commit()
+        return saved
 
     @staticmethod
-    async def get_recent_listings(session: AsyncSession, limit: int) -> List[Dict[str, str]]:
+    def to_record(listing: Apartment, images: List[str]) -> Dict[str, Any]:
+        """
+        Listing fields passed on to notifications.
+        """
+        return {
+            "id": listing.id,
+            "title": listing.title,
+            "address": listing.address,
+            "price": listing.price,
+            "url": listing.url,
+            "images": list(images),
+        }
+
+    @classmethod
+    async def get_listings(cls, session: AsyncSession, urls: List[str]) -> List[Dict[str, Any]]:
+        """
+        Return the stored, still active listings among ``urls``.
+        """
+        if not urls:
+            return []
         result = await session.execute(
-            select(Apartment).options(selectinload(Apartment.images)).order_by(Apartment.id.desc()).limit(limit)
+            select(Apartment)
+            .options(selectinload(Apartment.images))
+            .where(Apartment.url.in_(set(urls)), Apartment.status == "active")
         )
-        listings = result.scalars().all()
-        return [
-            {
-                "title": listing.title,
-                "address": listing.address,
-                "price": listing.price,
-                "url": listing.url,
-                "images": [img.url for img in listing.images],
-            }
-            for listing in listings
-        ]
-
-    @staticmethod
-    async def get_data_size(session: AsyncSession) -> int:
-        result = await session.execute(select(func.count()).select_from(Apartment))
-        return result.scalar() or 0
+        return [cls.to_record(listing, [img.url for img in listing.images]) for listing in result.scalars().all()]
 
     @staticmethod
-    async def get_existing_urls(session: AsyncSession) -> set[str]:
-        result = await session.execute(select(Apartment.url))
+    async def get_existing_urls(session: AsyncSession, urls: List[str]) -> set[str]:
+        """
+        Return those of ``urls`` that are already stored.
+        """
+        if not urls:
+            return set()
+        result = await session.execute(select(Apartment.url).where(Apartment.url.in_(set(urls))))
         return set(result.scalars().all())
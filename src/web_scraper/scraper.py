@@ -1,13 +1,19 @@
 import asyncio
 import random
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Type
 
 import aiohttp
 
+from configs.config import settings
+from db.crud.manager_frontier import claim_urls, complete_urls, fail_urls, push_urls
 from db.database import database
 from src.loggers import log, logger
+from src.tracing import span
+from src.web_scraper.archive import DETAIL, LISTING, PageArchive, get_archive
 from src.web_scraper.parser import DetailParser, ListingParser
-from src.web_scraper.requester import RequesterMode, create_requester
+from src.web_scraper.replay import ReplayTransport, TrafficArchive, get_recorder, get_replay
+from src.web_scraper.requester import Requester, RequesterMode, create_requester
+from src.web_scraper.revisit import ListingRevisitor
 from src.web_scraper.saver import ListingSaver
 
 
@@ -17,61 +23,109 @@ class CianScraper:
         telegram_user_id: Optional[int] = None,
         params: Optional[Dict[str, str]] = None,
         freeze_time: int = 0,
+        *,
+        recorder: Optional[TrafficArchive] = None,
+        transport: Optional[ReplayTransport] = None,
+        archive: Optional[PageArchive] = None,
+        base_url: Optional[str] = None,
+        search_url: Optional[str] = None,
     ):
+        """
+        :param base_url: Site the search page is requested from (CIAN_BASE_URL by default).
+        :param search_url: Prebuilt search page URL, used instead of building one from ``params``.
+        :param recorder: Archive every fetched page is recorded to (HTTP_RECORD_PATH by default).
+        :param transport: Serve pages from recorded traffic instead of the network (HTTP_REPLAY_PATH by default).
+        :param archive: Archive the raw HTML of fetched pages is kept in (PAGE_ARCHIVE_PATH by default).
+        """
         self.telegram_user_id = telegram_user_id
         self.params = params or {"deal_type": "sale", "engine_version": "2", "region": "1"}
         self.freeze_time = freeze_time
+        self.base_url = base_url or settings.CIAN_BASE_URL
+        self.search_url = search_url
         self.is_running = False
         self.session: Optional[aiohttp.ClientSession] = None
-        self.listing_parser: ListingParser = ListingParser
-        self.detail_parser: DetailParser = DetailParser
+        self.recorder = recorder or get_recorder()
+        self.transport = transport or get_replay()
+        self.archive = archive or get_archive()
+        self.requester_mode = RequesterMode.Replay if self.transport else RequesterMode.Async
+        self.listing_parser: Type[ListingParser] = ListingParser
+        self.detail_parser: Type[DetailParser] = DetailParser
         self.saver: ListingSaver = ListingSaver()
+        self.revisitor = ListingRevisitor(
+            min_interval=settings.REVISIT_MIN_INTERVAL,
+            max_interval=settings.REVISIT_MAX_INTERVAL,
+        )
 
     async def _get_session(self) -> aiohttp.ClientSession:
         if self.session is None:
             self.session = aiohttp.ClientSession()
         return self.session
 
-    async def _close_session(self):
+    async def _close_session(self) -> None:
         if self.session:
             await self.session.close()
             self.session = None
 
-    async def _fetch(self, url: str, params: dict = None) -> Optional[str]:
-        session = await self._get_session()
-        requester = create_requester(
+    async def _create_requester(self, url: str, params: Optional[dict[str, Any]] = None, max_retries: int = 3) -> Requester:
+        session = await self._get_session() if self.requester_mode == RequesterMode.Async else None
+        return create_requester(
             url,
             params=params,
             freeze_time=self.freeze_time,
+            max_retries=max_retries,
             session=session,
-            mode=RequesterMode.Async,
+            mode=self.requester_mode,
+            recorder=self.recorder,
+            transport=self.transport,
         )
-        text, status_code, _ = await requester.fetch()
+
+    async def _fetch_page(self, url: str, params: Optional[dict[str, Any]] = None) -> Tuple[str, int]:
+        requester = await self._create_requester(url, params)
+        with span("fetch", url=requester.url) as fetch_span:
+            text, status_code, _ = await requester.fetch()
+            if fetch_span:
+                fetch_span.set(status=status_code)
+        if status_code == 200 and self.archive:
+            self.archive.add(LISTING if "/cat.php" in requester.url else DETAIL, requester.url, text)
         await asyncio.sleep(random.uniform(0, self.freeze_time))
+        return text, status_code
+
+    async def _fetch(self, url: str, params: Optional[dict[str, Any]] = None) -> Optional[str]:
+        text, status_code = await self._fetch_page(url, params)
         return text if status_code == 200 else None
 
     @log
-    async def fetch_listings(self) -> List[str]:
-        html = await self._fetch("https://www.cian.ru", self.params)
-        return self.listing_parser(html).parse_apartment_links() if html else []
+    async def fetch_listings(self, page: int = 1) -> List[str]:
+        """
+        :param page: Search results page, starting at 1.
+        """
+        if self.search_url:
+            html = await self._fetch(self.search_url if page == 1 else f"{self.search_url}&p={page}")
+        else:
+            html = await self._fetch(self.base_url, self.params if page == 1 else {**self.params, "p": page})
+        if not html:
+            return []
+        with span("parse", parser="listing"):
+            return self.listing_parser(html).parse_apartment_links()
 
     @log
     async def fetch_listing_details(
         self, url: str, max_retries: int = 5, backoff_factor: float = 2.0
-    ) -> Optional[Dict[str, str]]:
-        session = await self._get_session()
-        requester = create_requester(
-            url,
-            freeze_time=self.freeze_time,
-            max_retries=max_retries,
-            session=session,
-            mode=RequesterMode.Async,
-        )
+    ) -> Optional[Dict[str, Any]]:
+        with span("fetch_listing_details", url=url):
+            return await self._fetch_listing_details(url, max_retries, backoff_factor)
+
+    async def _fetch_listing_details(self, url: str, max_retries: int, backoff_factor: float) -> Optional[Dict[str, Any]]:
+        requester = await self._create_requester(url, max_retries=max_retries)
         for attempt in range(1, max_retries + 1):
             try:
-                text, status_code, _ = await requester.fetch()
+                with span("fetch", url=url, attempt=attempt):
+                    text, status_code, _ = await requester.fetch()
                 if status_code == 200:
-                    details = self.detail_parser(text).parse_apartment_details()
+                    if self.archive:
+                        self.archive.add(DETAIL, url, text)
+                    with span("parse", parser="detail"):
+                        details = self.detail_parser(text).parse_apartment_details()
                     if details:
                         details.setdefault("url", url)
                         await asyncio.sleep(random.uniform(0, self.freeze_time))
@@ -84,18 +138,85 @@ class CianScraper:
                 logger.exception(f"Error fetching {url}: {e}")
         return None
 
-    async def save_new_listings(self, urls: List[str]) -> None:
+    async def save_new_listings(self, urls: List[str]) -> List[Dict[str, Any]]:
+        """
+        Queue discovered URLs in the persistent frontier, then drain a batch of it.
+
+        URLs that fail to fetch stay in the frontier and are retried on a later cycle,
+        including after a restart.
+
+        :param urls: Detail URLs found on the search page.
+        :return: The listings inserted.
+        """
         logger.info("SAVING DATA")
         async with database() as db_session:
-            await self.saver.save(urls, self.fetch_listing_details, db_session, concurrency_limit=3)
+            await push_urls(db_session, urls, tg_id=self.telegram_user_id)
+            batch = await claim_urls(
+                db_session,
+                self.telegram_user_id,
+                limit=settings.FRONTIER_BATCH,
+                lease_seconds=settings.FRONTIER_LEASE_SECONDS,
+            )
+            if not batch:
+                return []
+
+            failed: set[str] = set()
+
+            async def fetch_details(url: str) -> Optional[Dict[str, Any]]:
+                try:
+                    details = await self.fetch_listing_details(url)
+                except Exception:
+                    failed.add(url)
+                    raise
+                if details is None:
+                    failed.add(url)
+                return details
+
+            saved = await self.saver.save(batch, fetch_details, db_session, concurrency_limit=3)
+            await fail_urls(
+                db_session,
+                failed,
+                max_attempts=settings.FRONTIER_MAX_ATTEMPTS,
+                backoff=settings.FRONTIER_RETRY_BACKOFF,
+            )
+            await complete_urls(db_session, [url for url in batch if url not in failed])
+            return saved
+
+    async def revisit_listings(self, budget: int) -> int:
+        """
+        Re-fetch up to ``budget`` stored listings that are due, recording price and status changes.
+        """
+        if budget <= 0:
+            return 0
+        try:
+            async with database() as db_session:
+                with span("revisit", budget=budget):
+                    return await self.revisitor.revisit(db_session, self._fetch_page, budget)
+        except Exception as e:
+            logger.error(f"Revisit failed: {e}")
+            return 0
+
+    async def run_once(self) -> int:
+        """
+        Run a single scrape cycle: fetch the search page and save new listings.
+
+        :return: Number of new listings found in this cycle.
+        """
+        logger.info(f"Running scraper for user {self.telegram_user_id}")
+        with span("scrape_cycle", user=self.telegram_user_id) as cycle:
+            urls = await self.fetch_listings()
+            saved = await self.save_new_listings(urls)
+            await self.revisit_listings(settings.REVISIT_BUDGET)
+            if cycle:
+                cycle.set(found=len(urls), saved=len(saved))
+        await self._flush_archives()
+        return len(saved)
 
     async def run(self) -> None:
         self.is_running = True
         try:
             while self.is_running:
-                logger.info(f"Running scraper for user {self.telegram_user_id}")
-                urls = await self.fetch_listings()
-                await self.save_new_listings(urls)
+                await self.run_once()
                 logger.info(f"Sleeping {self.telegram_user_id}")
                 await asyncio.sleep(random.uniform(60, 100))
                 logger.info(f"Continue {self.telegram_user_id}")
@@ -104,3 +225,19 @@ class CianScraper:
 
     def stop(self) -> None:
         self.is_running = False
+
+    async def _flush_archives(self) -> None:
+        if self.archive:
+            try:
+                await asyncio.to_thread(self.archive.flush)
+            except Exception as e:
+                logger.error(f"Failed to write the page archive: {e}")
+        if self.recorder:
+            try:
+                await asyncio.to_thread(self.recorder.flush)
+            except Exception as e:
+                logger.error(f"Failed to write the traffic recording: {e}")
+
+    async def close(self) -> None:
+        await self._flush_archives()
+        await self._close_session()
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+
+from db.crud.manager_users import get_search_config, invalidate_user_config, update_user_config
+from db.database import get_session, init_db, init_engine
+from src.bot.file_cache import FileIdCache
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+init_engine(
+    database_url=TEST_DATABASE_URL,
+    echo=False,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+
+@pytest_asyncio.fixture(scope="function")
+async def test_db():
+    await init_db()
+
+    async with get_session() as session:
+        async with session.begin():
+            result = await session.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))
+            tables = [row[0] for row in result.fetchall()]
+            for table in tables:
+                await session.execute(text(f"DELETE FROM {table}"))
+            await session.commit()
+
+        yield session
+
+
+def _photo_message(file_id):
+    return SimpleNamespace(photo=[SimpleNamespace(file_id=f"{file_id}_small"), SimpleNamespace(file_id=file_id)])
+
+
+@pytest.mark.asyncio
+async def test_file_id_cache_survives_restart(test_db):
+    cache = FileIdCache()
+    await cache.remember_sent(["http://img/1", "http://img/2"], [_photo_message("A"), _photo_message("B")])
+    assert await cache.get_many(["http://img/1", "http://img/3"]) == {"http://img/1": "A"}
+
+    fresh = FileIdCache()
+    assert await fresh.get_many(["http://img/1", "http://img/2"]) == {"http://img/1": "A", "http://img/2": "B"}
+
+
+@pytest.mark.asyncio
+async def test_file_id_cache_forgets_rejected_ids(test_db):
+    cache = FileIdCache()
+    await cache.put_many({"http://img/1": "A", "http://img/2": "B"})
+    await cache.forget(["http://img/1"])
+
+    assert await cache.get_many(["http://img/1", "http://img/2"]) == {"http://img/2": "B"}
+    assert await FileIdCache().get_many(["http://img/1", "http://img/2"]) == {"http://img/2": "B"}
+
+
+@pytest.mark.asyncio
+async def test_file_id_cache_evicts_least_recently_used(test_db):
+    cache = FileIdCache(max_rows=2)
+    for n in range(3):
+        await cache.put_many({f"http://img/{n}": f"F{n}"})
+    await FileIdCache().get_many(["http://img/0"])
+
+    assert await cache.evict() == 1
+
+    result = await test_db.execute(text("SELECT url FROM telegram_files ORDER BY url"))
+    assert [row[0] for row in result.fetchall()] == ["http://img/0", "http://img/2"]
+
+
+@pytest.mark.asyncio
+async def test_user_config_cache_is_written_through(test_db):
+    invalidate_user_config(7)
+    config = await get_search_config(test_db, 7)
+    assert config.params["region"] == 2
+    assert config.url.endswith("&region=2&rooms=1")
+
+    await update_user_config(test_db, 7, minprice=100, maxprice=None, mintarea=40)
+    cached = await get_search_config(test_db, 7)
+    assert cached.params["minprice"] == 100
+    assert "maxprice" not in cached.params
+    assert "minprice=100" in cached.url and "mintarea=40" in cached.url
+
+    invalidate_user_config(7)
+    assert (await get_search_config(test_db, 7)).url == cached.url
+
+    with pytest.raises(ValueError):
+        await update_user_config(test_db, 7, min_area=40)
@@ -1,11 +1,30 @@
-from datetime import datetime, timezone
+import argparse
+import asyncio
+import csv
+import json
+from datetime import datetime, timedelta, timezone
+from types import MethodType
 
 import pytest
 import pytest_asyncio
-from sqlalchemy import text
+from sqlalchemy import select, text
 from sqlalchemy.pool import StaticPool
 
+from db.crud.manager_frontier import claim_urls, complete_urls, fail_urls, push_urls, recover_frontier
+from db.crud.manager_jobs import activate_job, claim_jobs, deactivate_job, finish_job, get_stalled_jobs
+from db.crud.manager_outbox import push_notification
 from db.database import get_session, init_db, init_engine
+from db.models import DELIVERY_CHUNK_BITS, Apartment, utcnow
+from src.benchmark.mock_server import MockCianServer
+from src.bot.deliveries import DeliveryTracker
+from src.bot.outbox import OutboxRelay
+from src.cli.export import export
+from src.cli.reparse import reparse
+from src.scheduler import AdaptiveInterval, ScrapeWorker
+from src.scheduler.workers import shard_of
+from src.utils import notify_listings_handler
+from src.web_scraper.archive import PageArchive
+from src.web_scraper.saver import ListingSaver
 from src.web_scraper.scraper import CianScraper
 
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
@@ -167,3 +186,266 @@ async def test_save_listing_details_is_none(test_db):
     count = result.scalar()
 
     assert count == 0
+
+
+@pytest.mark.asyncio
+async def test_frontier_claim_retry_and_recover(test_db):
+    urls = ["http://example.com/f1", "http://example.com/f2", "http://example.com/f3"]
+    assert await push_urls(test_db, urls, tg_id=1) == 3
+    assert await push_urls(test_db, urls, tg_id=1) == 0
+
+    claimed = await claim_urls(test_db, 1, limit=2)
+    assert claimed == ["http://example.com/f1", "http://example.com/f2"]
+    assert await claim_urls(test_db, 2, limit=10) == []
+
+    await fail_urls(test_db, ["http://example.com/f1"], max_attempts=1)
+    await complete_urls(test_db, ["http://example.com/f2"])
+    assert await claim_urls(test_db, 1, limit=10) == ["http://example.com/f3"]
+
+    assert await recover_frontier(test_db) == 1
+    assert await claim_urls(test_db, 1, limit=10) == ["http://example.com/f3"]
+
+    # A URL that ran out of attempts is retried from scratch once a search shows it again.
+    assert await push_urls(test_db, ["http://example.com/f1"], tg_id=2) == 0
+    assert await claim_urls(test_db, 2, limit=10) == ["http://example.com/f1"]
+    result = await test_db.execute(text("SELECT attempts FROM crawl_frontier WHERE url = 'http://example.com/f1'"))
+    assert result.scalar() == 0
+
+
+@pytest.mark.asyncio
+async def test_save_new_listings_keeps_failed_urls_in_frontier(test_db, monkeypatch):
+    async def fake_fetch_details(url):
+        if url.endswith("bad"):
+            return None
+        return {"title": "Apt", "url": url, "images": []}
+
+    scraper = CianScraper(telegram_user_id=5)
+    monkeypatch.setattr(scraper, "fetch_listing_details", fake_fetch_details)
+
+    saved = await scraper.save_new_listings(["http://example.com/good", "http://example.com/bad"])
+    assert [listing["url"] for listing in saved] == ["http://example.com/good"]
+    assert saved[0]["id"] is not None
+
+    result = await test_db.execute(text("SELECT url, status, attempts FROM crawl_frontier"))
+    assert result.fetchall() == [("http://example.com/bad", "pending", 1)]
+
+
+def _detail_page(price):
+    return f"""
+    <html><head><script type="application/ld+json">
+      {{"@type": "Product", "name": "2-комн. квартира", "offers": {{"price": "{price}"}}}}
+    </script></head><body></body></html>
+    """
+
+
+@pytest.mark.asyncio
+async def test_revisit_records_price_and_status_changes(test_db):
+    scraper = CianScraper()
+    for url in ("http://example.com/r1", "http://example.com/r2"):
+        details = scraper.detail_parser(_detail_page(100)).parse_apartment_details()
+        details["url"] = url
+        await scraper.saver.insert_listings([details], test_db)
+    await test_db.execute(text("UPDATE apartments SET next_check_at = NULL"))
+    await test_db.commit()
+
+    pages = {"http://example.com/r1": (_detail_page(90), 200), "http://example.com/r2": ("", 404)}
+
+    async def fake_fetch_page(url):
+        return pages[url]
+
+    changed = await scraper.revisitor.revisit(test_db, fake_fetch_page, budget=10)
+    assert changed == 2
+
+    result = await test_db.execute(text("SELECT field, old_value, new_value FROM apartment_history ORDER BY field"))
+    assert result.fetchall() == [("price", "100.0", "90"), ("status", "active", "removed")]
+
+    assert await scraper.revisitor.revisit(test_db, fake_fetch_page, budget=10) == 0
+
+
+@pytest.mark.asyncio
+async def test_notify_handler_passes_only_own_inserts(test_db, monkeypatch):
+    notified = {}
+
+    async def notify(listings, user_id):
+        notified[user_id] = [listing["url"] for listing in listings]
+
+    async def fake_fetch_details(url):
+        return {"title": "Apt", "url": url, "images": []}
+
+    scrapers = []
+    for user_id in (1, 2):
+        scraper = CianScraper(telegram_user_id=user_id)
+        monkeypatch.setattr(scraper, "fetch_listing_details", fake_fetch_details)
+        decorated = notify_listings_handler(notify)(CianScraper.save_new_listings)
+        scraper.save_new_listings = MethodType(decorated, scraper)
+        scrapers.append(scraper)
+
+    await scrapers[0].save_new_listings(["http://example.com/a1", "http://example.com/a2"])
+    await scrapers[1].save_new_listings(["http://example.com/b1", "http://example.com/a1"])
+
+    assert sorted(notified[1]) == ["http://example.com/a1", "http://example.com/a2"]
+    assert notified[2] == ["http://example.com/b1"]
+
+
+@pytest.mark.asyncio
+async def test_delivery_tracker_sends_shared_listings_once_per_user(test_db, monkeypatch):
+    notified = []
+
+    async def notify(listings, user_id):
+        notified.append((user_id, sorted(listing["url"] for listing in listings)))
+
+    async def fake_fetch_details(url):
+        return {"title": "Apt", "url": url, "images": []}
+
+    tracker = DeliveryTracker(max_chunks=1)
+    scrapers = {}
+    for user_id in (1, 2):
+        scraper = CianScraper(telegram_user_id=user_id)
+        monkeypatch.setattr(scraper, "fetch_listing_details", fake_fetch_details)
+        decorated = notify_listings_handler(notify, tracker)(CianScraper.save_new_listings)
+        scraper.save_new_listings = MethodType(decorated, scraper)
+        scrapers[user_id] = scraper
+
+    await scrapers[1].save_new_listings(["http://example.com/a1", "http://example.com/a2"])
+    await scrapers[2].save_new_listings(["http://example.com/a1", "http://example.com/b1"])
+    await scrapers[2].save_new_listings(["http://example.com/a1", "http://example.com/b1"])
+    await scrapers[1].save_new_listings(["http://example.com/a1", "http://example.com/b1"])
+
+    assert notified == [
+        (1, ["http://example.com/a1", "http://example.com/a2"]),
+        (2, ["http://example.com/a1", "http://example.com/b1"]),
+        (1, ["http://example.com/b1"]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_delivery_tracker_spans_chunks_and_survives_eviction(test_db):
+    ids = [1, DELIVERY_CHUNK_BITS + 5, 3 * DELIVERY_CHUNK_BITS]
+    tracker = DeliveryTracker(max_chunks=1)
+    assert [item["id"] for item in await tracker.claim(9, [{"id": i} for i in ids])] == ids
+
+    assert await tracker.claim(9, [{"id": i} for i in ids]) == []
+    restarted = DeliveryTracker()
+    assert [item["id"] for item in await restarted.claim(9, [{"id": i} for i in (*ids, 2)])] == [2]
+    assert [item["id"] for item in await restarted.claim(10, [{"id": 1}])] == [1]
+
+
+@pytest.mark.asyncio
+async def test_claim_jobs_leases_due_searches_of_the_shard(test_db):
+    for tg_id in (1, 2, 3, 4, -5, 6):
+        await activate_job(test_db, tg_id, utcnow())
+
+    claimed = await claim_jobs(test_db, "a", 10, shard=1, shards=2)
+    assert sorted(job.tg_id for job in claimed) == [-5, 1, 3]
+    assert all(shard_of(job.tg_id, 2) == 1 for job in claimed)
+    assert await claim_jobs(test_db, "b", 10, shard=1, shards=2) == []
+    assert len(await claim_jobs(test_db, "b", 2, shard=0, shards=2)) == 2
+
+    later = utcnow() + timedelta(hours=1)
+    assert await finish_job(test_db, 1, "a", utcnow(), later, new_rate=0.5)
+    await deactivate_job(test_db, 3)
+    assert not await finish_job(test_db, 3, "a", utcnow(), utcnow())
+    # 1 is released but not due, 3 is stopped, -5 is still leased.
+    assert await claim_jobs(test_db, "c", 10, shard=1, shards=2) == []
+    # Of shard 0, 2 and 4 are leased and 6 waits for a worker.
+    assert await get_stalled_jobs(test_db, 0) == [6]
+    assert await get_stalled_jobs(test_db, 3600) == []
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_its_shard_and_bot_drains_the_outbox(test_db):
+    for tg_id in (10, 11, 12):
+        await activate_job(test_db, tg_id, utcnow())
+
+    async def job(tg_id):
+        await worker._queue_notification([{"id": tg_id, "url": f"http://example.com/{tg_id}"}], tg_id)
+        return 1
+
+    worker = ScrapeWorker(0, 2, concurrency=1, policy=AdaptiveInterval(60, 60), job_fn=job)
+    for _ in range(3):
+        await asyncio.gather(*await worker.poll())
+
+    notified = []
+
+    async def notify(listings, tg_id):
+        notified.append((tg_id, [listing["url"] for listing in listings]))
+
+    relay = OutboxRelay(notify)
+    assert await relay.drain() == 2
+    assert await relay.drain() == 0
+    assert notified == [(10, ["http://example.com/10"]), (12, ["http://example.com/12"])]
+
+
+@pytest.mark.asyncio
+async def test_outbox_keeps_notifications_whose_callback_failed(test_db):
+    for tg_id in (1, 2):
+        await push_notification(test_db, tg_id, [{"id": tg_id}])
+
+    calls = []
+
+    async def notify(listings, tg_id):
+        calls.append(tg_id)
+        if tg_id == 2:
+            raise RuntimeError("send failed")
+
+    relay = OutboxRelay(notify, max_attempts=2)
+    assert await relay.drain() == 2
+    assert await relay.drain() == 1
+    assert await relay.drain() == 0
+    assert calls == [1, 2, 2]
+
+
+@pytest.mark.asyncio
+async def test_reparse_updates_listings_from_archived_pages(test_db, tmp_path):
+    server = MockCianServer(page_size=5, initial_listings=5, publish_rate=0.001)
+    base_url = await server.start()
+    archive = PageArchive(tmp_path / "pages.db")
+    scraper = CianScraper(params={"region": 1}, base_url=base_url, archive=archive)
+    try:
+        details = [await scraper.fetch_listing_details(url) for url in await scraper.fetch_listings()]
+    finally:
+        await scraper.close()
+        await server.stop()
+
+    stored = [{key: value for key, value in d.items() if key != "date_published"} for d in details]
+    stored[0]["title"] = "Старый заголовок"
+    stored[1]["price"] = 1.0
+    await ListingSaver()._insert(stored[:4], test_db)
+
+    args = argparse.Namespace(archive=str(tmp_path / "pages.db"), processes=2, batch_size=2, dry_run=False, examples=3)
+    report = await reparse(args)
+
+    assert (report.pages, report.updated, report.missing, report.failed) == (5, 2, 1, 0)
+    assert report.fields == {"title": 1, "price": 1}
+    assert report.samples["title"] == [(details[0]["url"], "Старый заголовок", details[0]["title"])]
+    test_db.expire_all()
+    title = (await test_db.execute(select(Apartment.title).where(Apartment.url == details[0]["url"]))).scalar_one()
+    assert title == details[0]["title"]
+
+
+@pytest.mark.asyncio
+async def test_export_streams_new_listings_since_the_watermark(test_db, tmp_path):
+    listings = [
+        {"title": f"Apt {n}", "price": 1000.0 * n, "url": f"http://example.com/{n}", "images": [f"{n}.jpg"]} for n in range(5)
+    ]
+    await ListingSaver()._insert(listings, test_db)
+    state = tmp_path / "export.state"
+
+    def args(name, fmt="jsonl"):
+        return argparse.Namespace(format=fmt, output=str(tmp_path / name), since_id=0, state=str(state), chunk_size=2)
+
+    result = await export(args("first.jsonl"))
+    rows = [json.loads(line) for line in (tmp_path / "first.jsonl").read_text().splitlines()]
+    assert result["rows"] == 5
+    assert [row["title"] for row in rows] == [f"Apt {n}" for n in range(5)]
+    assert rows[3]["images"] == ["3.jpg"] and rows[3]["price"] == 3000.0
+    assert state.read_text() == str(rows[-1]["id"])
+
+    await ListingSaver()._insert([{"title": "Apt 5", "url": "http://example.com/5", "images": ["a.jpg", "b.jpg"]}], test_db)
+    result = await export(args("second.csv", "csv"))
+    with open(tmp_path / "second.csv", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert result["rows"] == 1
+    assert (rows[0]["title"], rows[0]["images"]) == ("Apt 5", "a.jpg b.jpg")
+
+    assert (await export(args("third.jsonl")))["rows"] == 0
@@ -0,0 +1,95 @@
+import pytest
+
+from src.benchmark.mock_server import MockCianServer
+from src.web_scraper import archive as archive_module
+from src.web_scraper.archive import DETAIL, LISTING, PageArchive, offer_key
+from src.web_scraper.scraper import CianScraper
+
+BOILERPLATE = "".join(f'<div class="_93444fe79c--block-{n}"><span>Блок {n} шаблона страницы</span></div>\n' for n in range(100))
+
+
+def page(offer_id: int, price: int) -> str:
+    return f"<html><body>\n{BOILERPLATE}<h1>Квартира {offer_id}</h1>\n<span>{price} ₽</span>\n</body></html>"
+
+
+def url(offer_id: int) -> str:
+    return f"https://www.cian.ru/sale/flat/{offer_id}/"
+
+
+def test_offer_key():
+    assert offer_key(url(301234567)) == "301234567"
+    assert offer_key("https://www.cian.ru/sale/flat/42/?from=search") == "42"
+    assert offer_key("https://www.cian.ru/about/") == "https://www.cian.ru/about/"
+
+
+@pytest.mark.parametrize("codec", ["zstd", "zlib"])
+def test_archive_trains_a_dictionary_and_reads_pages_back(tmp_path, monkeypatch, codec):
+    if codec == "zlib":
+        monkeypatch.setattr(archive_module, "zstandard", None)
+    elif archive_module.zstandard is None:
+        pytest.skip("zstandard is not installed")
+
+    archive = PageArchive(tmp_path / "pages.db", dict_size=8192, train_samples=40)
+    assert archive.codec == codec
+    for offer_id in range(40):
+        archive.add(DETAIL, url(offer_id), page(offer_id, 1000), fetched_at=100.0)
+    archive.add(DETAIL, url(7), page(7, 2000), fetched_at=200.0)
+    assert archive.flush() == 41
+
+    assert archive.get(DETAIL, "7") == page(7, 2000)
+    assert archive.get(DETAIL, "7", fetched_at=150.0) == page(7, 1000)
+    assert archive.get(DETAIL, "7", fetched_at=50.0) is None
+
+    latest = list(archive.pages(DETAIL))
+    assert len(latest) == 40
+    assert {p.dict_id for p in latest} == {None, 1}
+    assert archive.read(next(p for p in latest if p.key == "7")) == page(7, 2000)
+
+    rows = {p.dict_id: len(p.body) for p in latest}
+    assert rows[1] < rows[None] * 0.75
+    archive.close()
+
+    reopened = PageArchive(tmp_path / "pages.db")
+    assert reopened.get(DETAIL, "39") == page(39, 1000)
+    assert reopened.stats()[DETAIL]["pages"] == 41
+
+
+def test_archive_reads_dictionaries_trained_by_another_process(tmp_path):
+    reader = PageArchive(tmp_path / "pages.db", dict_size=8192, train_samples=40)
+    writer = PageArchive(tmp_path / "pages.db", dict_size=8192, train_samples=40)
+    for offer_id in range(41):
+        writer.add(DETAIL, url(offer_id), page(offer_id, 1000))
+    writer.flush()
+
+    assert reader.get(DETAIL, "40") == page(40, 1000)
+    assert set(reader.dictionaries()) == {1}
+    writer.close()
+    reader.close()
+
+
+def test_add_does_not_wait_for_a_running_flush(tmp_path):
+    archive = PageArchive(tmp_path / "pages.db")
+    with archive._flush_lock:
+        archive.add(DETAIL, url(1), page(1, 1000))
+    assert archive.flush() == 1
+    archive.close()
+
+
+@pytest.mark.asyncio
+async def test_scraper_archives_fetched_pages(tmp_path):
+    server = MockCianServer(page_size=5, initial_listings=5, publish_rate=0.001)
+    base_url = await server.start()
+    archive = PageArchive(tmp_path / "pages.db")
+    scraper = CianScraper(params={"region": 1}, base_url=base_url, archive=archive)
+    try:
+        urls = await scraper.fetch_listings()
+        for detail_url in urls:
+            await scraper.fetch_listing_details(detail_url)
+    finally:
+        await scraper.close()
+        await server.stop()
+
+    stats = archive.stats()
+    assert stats[LISTING]["pages"] == 1
+    assert stats[DETAIL]["keys"] == len(urls) == 5
+    assert "ld+json" in archive.get(DETAIL, offer_key(urls[0]))
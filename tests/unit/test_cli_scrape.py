@@ -0,0 +1,51 @@
+import argparse
+import json
+
+import pytest
+
+from src.benchmark.mock_server import MockCianServer
+from src.cli import scrape as scrape_cli
+
+
+def _parse(*argv):
+    parser = argparse.ArgumentParser()
+    scrape_cli.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def test_scrape_arguments_follow_user_config_schema():
+    args = _parse("--rooms", "2", "--min-house-year", "2000")
+    assert (args.rooms, args.min_house_year, args.region, args.maxprice) == ("2", 2000, 2, None)
+
+
+@pytest.mark.asyncio
+async def test_scrape_reads_pages_and_writes_jsonl(tmp_path):
+    server = MockCianServer(page_size=5, initial_listings=10, publish_rate=0.001)
+    base_url = await server.start()
+    output = tmp_path / "listings.jsonl"
+    try:
+        args = _parse("--pages", "3", "--concurrency", "4", "--output", str(output), "--base-url", base_url)
+        result = await scrape_cli.scrape(args)
+    finally:
+        await server.stop()
+
+    assert result["urls"] == 10
+    assert result["written"] == 10
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len({row["url"] for row in rows}) == 10
+    assert all(row["title"] and row["price"] for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_parquet_sink_keeps_types_of_empty_first_batch(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    sink = scrape_cli.ParquetSink(str(tmp_path / "listings.parquet"))
+    await sink.write([{"url": "http://x/1/", "price": None, "images": []}])
+    await sink.write([{"url": "http://x/2/", "price": "12500000", "date_published": "вчера, 12:30", "images": ["a"]}])
+    await sink.close()
+
+    table = pq.read_table(tmp_path / "listings.parquet")
+    assert str(table.schema.field("price").type) == "double"
+    assert table.column("price").to_pylist() == [None, 12500000.0]
+    assert table.column("date_published").to_pylist() == [None, "вчера, 12:30"]
+    assert table.column("images").to_pylist() == [[], ["a"]]
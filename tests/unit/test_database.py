@@ -1,11 +1,41 @@
 from datetime import datetime, timezone
 
 import pytest
-from sqlalchemy import create_engine, exc
+from sqlalchemy import create_engine, exc, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
+import db.database
+from db.crud.manager_users import get_or_create_user
 from db.models import Apartment, ApartmentImage, Base, User, UserConfig
 
+# The apartments and users tables as created before listings were revisited and digests were added.
+OLD_SCHEMA = [
+    """
+    CREATE TABLE apartments (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        title VARCHAR(255),
+        price FLOAT,
+        description TEXT,
+        address TEXT,
+        date_published DATETIME,
+        rooms VARCHAR(50),
+        area VARCHAR(50),
+        url VARCHAR(500) NOT NULL UNIQUE
+    )
+    """,
+    "INSERT INTO apartments (title, price, url) VALUES ('Old apt', 100.0, 'http://example.com/old')",
+    """
+    CREATE TABLE users (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        tg_id INTEGER UNIQUE,
+        created_at DATETIME,
+        updated_at DATETIME
+    )
+    """,
+    "INSERT INTO users (tg_id) VALUES (42)",
+]
+
 
 @pytest.fixture(scope="session")
 def test_db():
@@ -108,3 +138,31 @@ def test_update_apartment_price(test_db):
 
     updated_apartment = test_db.query(Apartment).filter_by(id=apartment.id).first()
     assert updated_apartment.price == 90000
+
+
+@pytest.mark.asyncio
+async def test_init_db_upgrades_an_old_database(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+    async with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            await conn.exec_driver_sql(statement)
+    monkeypatch.setattr(db.database, "engine", engine)
+    monkeypatch.setattr(db.database, "AsyncSessionLocal", async_sessionmaker(engine, expire_on_commit=False))
+
+    await db.database.init_db()
+    await db.database.init_db()
+
+    async with db.database.database() as session:
+        listing = (await session.execute(select(Apartment))).scalar_one()
+        assert (listing.url, listing.status, listing.change_count, listing.next_check_at) == (
+            "http://example.com/old",
+            "active",
+            0,
+            None,
+        )
+        indexes = await session.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))
+        assert "ix_apartments_next_check_at" in indexes.scalars().all()
+
+        assert (await get_or_create_user(session, 42)).digest == 0
+        assert (await get_or_create_user(session, 43)).digest == 0
+    await engine.dispose()
@@ -0,0 +1,34 @@
+from src.bot.digest import DigestBook, parse_callback
+
+
+def _listings(count):
+    return [{"id": i, "title": f"Квартира <{i}>", "price": 1000 + i, "url": f"http://example.com/{i}"} for i in range(count)]
+
+
+def test_digest_pages_and_buttons():
+    book = DigestBook(page_size=10)
+    digest_id = book.add(_listings(23))
+    assert book.pages(digest_id) == 3
+
+    text, markup = book.page(digest_id, 0)
+    assert text.startswith("🏠 <b>Новых объявлений: 23</b>")
+    assert "Квартира &lt;0&gt;" in text and "11." not in text
+    item_buttons = [button for row in markup.inline_keyboard[:-1] for button in row]
+    assert [button.text for button in item_buttons] == [str(n) for n in range(1, 11)]
+    assert parse_callback(item_buttons[3].callback_data) == (digest_id, "item", 3)
+    assert [button.text for button in markup.inline_keyboard[-1]] == ["◀️", "1/3", "▶️"]
+
+    text, markup = book.page(digest_id, 5)
+    assert "21." in text and "23." in text
+    assert len([b for row in markup.inline_keyboard[:-1] for b in row]) == 3
+    assert book.item(digest_id, 22)["id"] == 22
+    assert book.item(digest_id, 23) is None
+
+
+def test_digest_expires_and_rejects_foreign_callbacks():
+    book = DigestBook(ttl=-1)
+    digest_id = book.add(_listings(3))
+    assert book.page(digest_id, 0) is None
+    assert book.item(digest_id, 0) is None
+    assert parse_callback("set_region_1") is None
+    assert parse_callback("digest:abc:page:x") is None
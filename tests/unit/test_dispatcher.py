@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from src.bot.dispatcher import NotificationDispatcher
+from src.utils.rate_limit import TokenBucket
+
+
+class FakeBot:
+    def __init__(self, flood_once=(), blocked=()):
+        self.sent = []
+        self.flood_once = set(flood_once)
+        self.blocked = set(blocked)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.blocked:
+            raise TelegramForbiddenError(method=None, message="bot was blocked by the user")
+        if chat_id in self.flood_once:
+            self.flood_once.discard(chat_id)
+            raise TelegramRetryAfter(method=None, message="Too Many Requests", retry_after=0.1)
+        self.sent.append((chat_id, text, time.monotonic()))
+
+    async def send_photo(self, chat_id, photo, caption=None, **kwargs):
+        if photo.startswith("file:"):
+            raise TelegramBadRequest(method=None, message="wrong file identifier/HTTP URL specified")
+        if caption == "*":
+            raise TelegramBadRequest(method=None, message="Bad Request: can't parse entities")
+        self.sent.append((chat_id, photo, time.monotonic()))
+
+
+def test_token_bucket_delay_and_debt():
+    bucket = TokenBucket(rate=2, capacity=2)
+    now = bucket.updated_at
+    assert bucket.delay(now=now) == 0
+    bucket.consume(3, now=now)
+    assert bucket.delay(now=now) == pytest.approx(1.0)
+    assert bucket.delay(now=now + 1.0) == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_keeps_per_chat_order_and_rate():
+    bot = FakeBot()
+    dispatcher = NotificationDispatcher(bot, global_rate=100, chat_rate=20, workers=4)
+    dispatcher.start()
+    for i in range(4):
+        dispatcher.enqueue(1, "send_message", text=f"a{i}")
+        dispatcher.enqueue(2, "send_message", text=f"b{i}")
+
+    await dispatcher.join(timeout=2)
+    await dispatcher.stop()
+
+    assert [text for chat, text, _ in bot.sent if chat == 1] == ["a0", "a1", "a2", "a3"]
+    assert [text for chat, text, _ in bot.sent if chat == 2] == ["b0", "b1", "b2", "b3"]
+    chat_times = [ts for chat, _, ts in bot.sent if chat == 1]
+    assert chat_times[-1] - chat_times[0] >= 3 / 20 * 0.9
+    assert dispatcher.stats()["sent"] == 8
+    assert dispatcher.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_retries_flood_controlled_message_in_order():
+    bot = FakeBot(flood_once={1})
+    dispatcher = NotificationDispatcher(bot, global_rate=100, chat_rate=100, workers=2)
+    dispatcher.start()
+    dispatcher.enqueue(1, "send_message", text="first")
+    dispatcher.enqueue(1, "send_message", text="second")
+    dispatcher.enqueue(2, "send_message", text="other")
+
+    await dispatcher.join(timeout=2)
+    await dispatcher.stop()
+
+    assert [text for _, text, _ in bot.sent] == ["other", "first", "second"]
+    assert dispatcher.retried == 1
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_drops_blocked_chat():
+    bot = FakeBot(blocked={3})
+    dispatcher = NotificationDispatcher(bot, global_rate=100, chat_rate=100, workers=1)
+    dispatcher.start()
+    dispatcher.enqueue(3, "send_message", text="x")
+    dispatcher.enqueue(3, "send_message", text="y")
+
+    await dispatcher.join(timeout=1)
+    await asyncio.sleep(0)
+    await dispatcher.stop()
+
+    assert bot.sent == []
+    assert dispatcher.failed == 2
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_evicts_idle_chat_buckets():
+    bot = FakeBot()
+    dispatcher = NotificationDispatcher(bot, global_rate=1000, chat_rate=1000, workers=2, sweep_interval=0)
+    dispatcher.start()
+    for chat_id in range(50):
+        dispatcher.enqueue(chat_id, "send_message", text="x")
+    await dispatcher.join(timeout=2)
+    await asyncio.sleep(0.01)
+    dispatcher.enqueue(0, "send_message", text="y")
+    await dispatcher.join(timeout=2)
+    await dispatcher.stop()
+
+    assert len(bot.sent) == 51
+    assert len(dispatcher._chat_buckets) <= 1
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_stop_sends_queued_messages():
+    bot = FakeBot()
+    dispatcher = NotificationDispatcher(bot, global_rate=100, chat_rate=20, workers=1)
+    dispatcher.start()
+    for i in range(3):
+        dispatcher.enqueue(1, "send_message", text=str(i))
+
+    await dispatcher.stop(drain_timeout=2)
+
+    assert [text for _, text, _ in bot.sent] == ["0", "1", "2"]
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_resends_rejected_message_once():
+    bot = FakeBot()
+    dispatcher = NotificationDispatcher(bot, global_rate=100, chat_rate=100, workers=1)
+    rejected = []
+
+    async def upload_from_url(message):
+        rejected.append(message.kwargs["photo"])
+        message.kwargs["photo"] = "http://img/1"
+        return True
+
+    dispatcher.start()
+    dispatcher.enqueue(1, "send_photo", on_rejected=upload_from_url, photo="file:stale")
+    dispatcher.enqueue(1, "send_photo", photo="file:other")
+    await dispatcher.join(timeout=2)
+    await dispatcher.stop()
+
+    assert rejected == ["file:stale"]
+    assert [photo for _, photo, _ in bot.sent] == ["http://img/1"]
+    assert dispatcher.retried == 1 and dispatcher.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_only_resends_on_file_id_errors():
+    bot = FakeBot()
+    dispatcher = NotificationDispatcher(bot, global_rate=100, chat_rate=100, workers=1)
+    rejected = []
+
+    async def upload_from_url(message):
+        rejected.append(message.kwargs["photo"])
+        return True
+
+    dispatcher.start()
+    dispatcher.enqueue(1, "send_photo", on_rejected=upload_from_url, photo="http://img/1", caption="*")
+    await dispatcher.join(timeout=2)
+    await dispatcher.stop()
+
+    assert rejected == []
+    assert dispatcher.retried == 0 and dispatcher.failed == 1
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from src.benchmark.import_time import measure, parse_importtime
+
+MAIN = Path(__file__).resolve().parents[2] / "main.py"
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       169 |        169 |       _json
+import time:       362 |        530 |     json.scanner
+import time:       440 |        970 |   json.decoder
+import time:       226 |       1196 | json
+import time:       100 |        100 | sqlalchemy
+"""
+
+
+def test_parse_importtime_sums_self_time_per_package():
+    assert parse_importtime(IMPORTTIME) == {"_json": 169, "json": 1028, "sqlalchemy": 100}
+
+
+def test_cli_entry_points_do_not_load_the_bot():
+    for statement in ("import main", "import src.cli.scrape", "import db.database"):
+        _, packages = measure(statement + "; import sys; assert 'aiogram' not in sys.modules, sorted(sys.modules)")
+        assert "aiogram" not in packages
+
+
+def test_help_works_without_settings(tmp_path):
+    # An empty environment, run from a directory without .env: settings would fail to validate.
+    env = {"PATH": os.environ.get("PATH", "")}
+    for argv in ([], ["worker"], ["reparse"], ["export"]):
+        proc = subprocess.run(
+            [sys.executable, str(MAIN), *argv, "--help"], capture_output=True, text=True, env=env, cwd=tmp_path, check=False
+        )
+        assert proc.returncode == 0, proc.stderr
+        assert "usage: main.py" in proc.stdout
+
+
+def test_importing_modules_does_not_read_settings(tmp_path):
+    env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": str(MAIN.parent)}
+    for module in ("db.database", "src.web_scraper.scraper", "src.bot.bot"):
+        proc = subprocess.run(
+            [sys.executable, "-c", f"import {module}"], capture_output=True, text=True, env=env, cwd=tmp_path, check=False
+        )
+        assert proc.returncode == 0, proc.stderr
+
+
+def test_importing_main_loads_no_database_code():
+    _, packages = measure("import main; import sys; assert 'sqlalchemy' not in sys.modules")
+    assert "sqlalchemy" not in packages
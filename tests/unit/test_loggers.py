@@ -0,0 +1,39 @@
+import asyncio
+import json
+import logging
+import time
+
+from src.loggers import JsonFormatter, RateLimitFilter, log
+
+
+def _record(msg, level=logging.INFO, lineno=10):
+    return logging.LogRecord("cian_scraper", level, "requester.py", lineno, msg, None, None)
+
+
+def test_rate_limit_filter_suppresses_per_call_site():
+    limiter = RateLimitFilter(rate=0.001, burst=2)
+    assert [limiter.filter(_record(f"m{i}")) for i in range(4)] == [True, True, False, False]
+    assert limiter.filter(_record("other site", lineno=11))
+    assert limiter.filter(_record("still logged", level=logging.WARNING))
+
+    limiter.rate = 1000
+    time.sleep(0.01)
+    record = _record("back")
+    assert limiter.filter(record)
+    assert record.getMessage() == "back (suppressed 2 similar messages)"
+
+
+def test_json_formatter_outputs_one_object_per_record():
+    entry = json.loads(JsonFormatter().format(_record("Привет %s")))
+    assert entry["message"] == "Привет %s"
+    assert entry["level"] == "INFO"
+    assert entry["file"] == "requester.py"
+
+
+def test_log_only_forwards_calls_when_call_logging_disabled(caplog):
+    async def fetch():
+        return 1
+
+    with caplog.at_level(logging.DEBUG, logger="cian_scraper"):
+        assert asyncio.run(log(fetch)()) == 1
+    assert caplog.records == []
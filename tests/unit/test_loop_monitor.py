@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+import pytest
+
+from src.loop_monitor import LoopLagMonitor
+
+
+def blocking_parse():
+    time.sleep(0.3)
+
+
+@pytest.mark.asyncio
+async def test_monitor_captures_stack_of_blocking_call():
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.1)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    blocking_parse()
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    assert monitor.max_lag >= 0.2
+    assert len(monitor.reports) == 1
+    assert "blocking_parse" in monitor.reports[0].stack
+
+
+@pytest.mark.asyncio
+async def test_monitor_stays_quiet_without_blocking():
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.1)
+    monitor.start()
+    await asyncio.sleep(0.2)
+    await monitor.stop()
+    assert not monitor.reports
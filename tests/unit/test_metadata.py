@@ -0,0 +1,72 @@
+import pytest
+from aiogram.exceptions import TelegramMigrateToChat
+
+from src.bot.dispatcher import NotificationDispatcher
+from src.bot.metadata import BotMetadataCache
+from src.utils.cache import TTLCache
+
+
+class FakeBot:
+    def __init__(self, migrated=None):
+        self.calls = []
+        self.sent = []
+        self.migrated = migrated or {}
+
+    async def get_me(self):
+        self.calls.append("get_me")
+        return {"id": 1}
+
+    async def get_chat(self, chat_id):
+        self.calls.append(("get_chat", chat_id))
+        return {"id": chat_id}
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.migrated:
+            raise TelegramMigrateToChat(method=None, message="migrated", migrate_to_chat_id=self.migrated[chat_id])
+        self.sent.append((chat_id, text))
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+    cache = TTLCache(ttl=60, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+    cache.set("d", 4, ttl=-1)
+    assert cache.get("d") is None
+
+
+@pytest.mark.asyncio
+async def test_metadata_cache_hits_api_once_until_invalidated():
+    bot = FakeBot()
+    metadata = BotMetadataCache(bot)
+
+    for _ in range(3):
+        await metadata.get_me()
+        await metadata.get_chat(5)
+    assert bot.calls == ["get_me", ("get_chat", 5)]
+
+    metadata.invalidate_chat(5)
+    await metadata.get_chat(5)
+    assert bot.calls.count(("get_chat", 5)) == 2
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_moves_queue_of_migrated_chat():
+    bot = FakeBot(migrated={-1: -100})
+    metadata = BotMetadataCache(bot)
+    await metadata.get_chat(-1)
+    dispatcher = NotificationDispatcher(bot, global_rate=100, chat_rate=100, workers=2, metadata=metadata)
+    dispatcher.start()
+    dispatcher.enqueue(-1, "send_message", text="first")
+    dispatcher.enqueue(-1, "send_message", text="second")
+
+    await dispatcher.join(timeout=2)
+    await dispatcher.stop()
+
+    assert bot.sent == [(-100, "first"), (-100, "second")]
+    await metadata.get_chat(-1)
+    assert bot.calls.count(("get_chat", -1)) == 2
@@ -0,0 +1,43 @@
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.metrics import Counter, Gauge, Histogram, MetricsServer, Registry
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    responses = Counter("responses_total", "Responses.", ["status"], registry=registry)
+    depth = Gauge("queue_depth", "Depth.", registry=registry)
+    latency = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0), registry=registry)
+
+    responses.inc(status=200)
+    responses.inc(2, status=200)
+    responses.inc(status='bad"one')
+    depth.set_function(lambda: 7)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    text = registry.render()
+    assert "# TYPE responses_total counter" in text
+    assert 'responses_total{status="200"} 3' in text
+    assert 'responses_total{status="bad\\"one"} 1' in text
+    assert "queue_depth 7" in text
+    assert 'latency_seconds_bucket{le="0.1"} 2.0' in text
+    assert 'latency_seconds_bucket{le="1.0"} 3.0' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4.0' in text
+    assert "latency_seconds_count 4.0" in text
+    assert latency.count() == 4
+
+    with pytest.raises(ValueError):
+        Counter("responses_total", "Again.", registry=registry)
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    registry = Registry()
+    Counter("hits_total", "Hits.", registry=registry).inc()
+    server = MetricsServer(registry)
+    async with TestClient(TestServer(server.app)) as client:
+        response = await client.get("/metrics")
+        assert response.status == 200
+        assert "hits_total 1" in await response.text()
@@ -0,0 +1,44 @@
+import aiohttp
+import pytest
+
+from src.benchmark.mock_server import MockCianServer
+from src.web_scraper.parser import DetailParser, ListingParser
+
+
+@pytest.mark.asyncio
+async def test_mock_server_pages_match_parsers():
+    server = MockCianServer(page_size=5, initial_listings=8)
+    base_url = await server.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{base_url}/cat.php", params={"region": "3"}) as response:
+                links = ListingParser(await response.text()).parse_apartment_links()
+
+            assert len(links) == 5
+            assert all(link.startswith(f"{base_url}/sale/flat/3") for link in links)
+            assert server.published_at(links[0]) is not None
+
+            async with session.get(links[0]) as response:
+                details = DetailParser(await response.text()).parse_apartment_details()
+
+            assert details["title"].endswith("м²")
+            assert details["price"]
+            assert details["rooms"]
+            assert len(details["images"]) == 3
+
+            async with session.get(f"{base_url}/sale/flat/999/") as response:
+                assert response.status == 404
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_mock_server_injects_errors():
+    server = MockCianServer(rate_429=1.0)
+    base_url = await server.start()
+    try:
+        async with aiohttp.ClientSession() as session, session.get(f"{base_url}/cat.php") as response:
+            assert response.status == 429
+        assert server.stats[429] == 1
+    finally:
+        await server.stop()
@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+import pytest
+
+from src.profiler import SamplingProfiler, profile_to_file
+
+
+def busy_parse(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_profiler_finds_hot_function_and_writes_collapsed_stacks(tmp_path):
+    profiler = SamplingProfiler(interval=0.001)
+
+    async def workload():
+        busy_parse(0.3)
+
+    task = asyncio.create_task(workload())
+    path, result = await profile_to_file(profiler, 0.2, tmp_path)
+    await task
+
+    assert result.samples > 0
+    assert "busy_parse" in result.top(1)[0][0]
+    lines = path.read_text().splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert "workload" in stack and stack.endswith(result.top(1)[0][0])
+    assert int(count) > 0
+    assert "samples in" in result.summary()
+
+
+@pytest.mark.asyncio
+async def test_profiler_refuses_concurrent_runs():
+    profiler = SamplingProfiler()
+    assert profiler._lock.acquire(blocking=False)
+    with pytest.raises(RuntimeError):
+        await profiler.profile(0.01)
@@ -0,0 +1,70 @@
+import pytest
+
+from src.web_scraper.replay import ReplayTransport, TrafficArchive
+from src.web_scraper.requester import RequesterMode, create_requester
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = TrafficArchive(tmp_path / "traffic.jsonl.gz")
+    archive.record("http://example.com/page", 200, {"Content-Type": "text/html", "Set-Cookie": "x"}, "first")
+    archive.record("http://example.com/page", 200, {"Content-Type": "text/html"}, "second")
+    archive.record("http://example.com/gone", 404, {}, "")
+    return archive
+
+
+def test_record_buffers_until_flush(tmp_path):
+    archive = TrafficArchive(tmp_path / "traffic.jsonl.gz")
+    archive.record("http://example.com/a", 200, {}, "a")
+    archive.record("http://example.com/b", 200, {}, "b")
+    assert not archive.path.exists()
+
+    assert archive.flush() == 2
+    assert archive.flush() == 0
+    archive.record("http://example.com/a", 200, {}, "c")
+    archive.flush()
+    assert [body for body, _, _ in TrafficArchive(archive.path).load()["http://example.com/a"]] == ["a", "c"]
+
+
+def test_archive_roundtrip(archive):
+    responses = archive.load()
+    assert [body for body, _, _ in responses["http://example.com/page"]] == ["first", "second"]
+    assert responses["http://example.com/page"][0][2] == {"Content-Type": "text/html"}
+    assert responses["http://example.com/gone"] == [("", 404, {})]
+
+
+@pytest.mark.asyncio
+async def test_replay_requester_serves_recorded_pages(archive):
+    transport = ReplayTransport(archive)
+
+    bodies = []
+    for _ in range(3):
+        req = create_requester("http://example.com/page", mode=RequesterMode.Replay, transport=transport)
+        text, status, _ = await req.fetch()
+        assert status == 200
+        bodies.append(text)
+    assert bodies == ["first", "second", "first"]
+
+    req = create_requester("http://example.com/unknown", mode=RequesterMode.Replay, transport=transport)
+    assert (await req.fetch())[1] == 404
+
+
+@pytest.mark.asyncio
+async def test_replay_error_injection_is_deterministic(archive):
+    statuses = []
+    for _ in range(2):
+        transport = ReplayTransport(archive, error_rate=0.5, seed=3)
+        run = []
+        for _ in range(10):
+            req = create_requester("http://example.com/page", mode=RequesterMode.Replay, transport=transport)
+            run.append((await req.fetch())[1])
+        statuses.append(run)
+
+    assert statuses[0] == statuses[1]
+    assert set(statuses[0]) - {200} <= {429, 503}
+    assert 200 in statuses[0] and len(set(statuses[0])) > 1
+
+
+def test_replay_mode_requires_transport():
+    with pytest.raises(ValueError):
+        create_requester("http://example.com", mode=RequesterMode.Replay)
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from src.scheduler import AdaptiveInterval, SearchScheduler
+
+
+@pytest.mark.asyncio
+async def test_scheduler_limits_concurrency():
+    running = {"now": 0, "max": 0}
+    seen = []
+
+    async def job(key):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.05)
+        seen.append(key)
+        running["now"] -= 1
+
+    scheduler = SearchScheduler(job, workers=2, policy=AdaptiveInterval(60, 60), persist=False)
+    await scheduler.start()
+    for key in range(5):
+        await scheduler.add(key)
+
+    await asyncio.sleep(0.3)
+    await scheduler.stop()
+
+    assert sorted(seen) == [0, 1, 2, 3, 4]
+    assert running["max"] == 2
+    assert scheduler.pending == 5
+
+
+@pytest.mark.asyncio
+async def test_scheduler_reschedules_until_removed():
+    calls = []
+
+    async def job(key):
+        calls.append(key)
+        if len(calls) == 3:
+            await scheduler.remove(key)
+
+    scheduler = SearchScheduler(job, workers=1, policy=AdaptiveInterval(0.01, 0.01), persist=False)
+    await scheduler.start()
+    await scheduler.add(42)
+
+    await asyncio.sleep(0.2)
+    await scheduler.stop()
+
+    assert calls == [42, 42, 42]
+    assert not scheduler.is_active(42)
+    assert scheduler.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_survives_failing_job():
+    calls = []
+
+    async def job(key):
+        calls.append(key)
+        raise RuntimeError("boom")
+
+    scheduler = SearchScheduler(job, workers=1, policy=AdaptiveInterval(0.01, 0.01), persist=False)
+    await scheduler.start()
+    await scheduler.add(7)
+
+    await asyncio.sleep(0.1)
+    await scheduler.stop()
+
+    assert len(calls) > 1
+    assert scheduler.is_active(7)
+
+
+def test_adaptive_interval_speeds_up_hot_searches():
+    policy = AdaptiveInterval(min_interval=60, max_interval=1800, target=1.0, smoothing=0.5)
+    rate = None
+    for _ in range(10):
+        rate = policy.update(rate, new_listings=5, elapsed=120)
+
+    assert policy.interval(rate) == 60
+
+
+def test_adaptive_interval_backs_off_cold_searches():
+    policy = AdaptiveInterval(min_interval=60, max_interval=1800, target=1.0, smoothing=0.3)
+    rate = None
+    intervals = []
+    for _ in range(15):
+        rate = policy.update(rate, new_listings=0, elapsed=policy.interval(rate))
+        intervals.append(policy.interval(rate))
+
+    assert intervals == sorted(intervals)
+    assert intervals[0] > 60
+    assert intervals[-1] == 1800
+
+
+def test_adaptive_interval_jitter_stays_in_bounds():
+    policy = AdaptiveInterval(min_interval=60, max_interval=120, jitter=0.5)
+    delays = [policy.next_delay(rate) for rate in (None, 0.0, 1.0, 1 / 90)]
+    assert all(60 <= delay <= 120 for delay in delays)
@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import pytest
+
+from src.tracing import Tracer
+
+
+def _load(path):
+    return json.loads(path.read_text().rstrip().rstrip(",") + "]")
+
+
+def _spans(events):
+    return [event for event in events if event["ph"] != "M"]
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_tasks_and_export_chrome_events(tmp_path):
+    tracer = Tracer(str(tmp_path / "trace.json"))
+
+    async def fetch(url):
+        with tracer.span("fetch", url=url):
+            await asyncio.sleep(0.01)
+
+    with tracer.span("scrape_cycle", user=1) as cycle:
+        await asyncio.gather(fetch("a"), fetch("b"))
+        cycle.set(saved=2)
+    with tracer.span("scrape_cycle", user=2):
+        pass
+    tracer.flush()
+
+    events = _spans(_load(tmp_path / "trace.json"))
+    assert [event["name"] for event in events] == ["fetch", "fetch", "scrape_cycle", "scrape_cycle"]
+    first_cycle = events[2]
+    assert first_cycle["ph"] == "X"
+    assert first_cycle["args"] == {"user": 1, "saved": 2, "span_id": first_cycle["args"]["span_id"]}
+    for fetch_event in events[:2]:
+        assert fetch_event["args"]["parent_id"] == first_cycle["args"]["span_id"]
+        assert fetch_event["args"]["root_id"] == first_cycle["args"]["span_id"]
+        assert fetch_event["dur"] >= 10_000
+    # Concurrent fetches overlap, so each has a track of its own.
+    assert len({events[0]["tid"], events[1]["tid"], first_cycle["tid"]}) == 3
+
+
+@pytest.mark.asyncio
+async def test_spans_of_one_task_share_a_named_track(tmp_path):
+    tracer = Tracer(str(tmp_path / "trace.json"))
+
+    async def cycle(user):
+        for _ in range(2):
+            with tracer.span("scrape_cycle", user=user), tracer.span("fetch"):
+                await asyncio.sleep(0)
+
+    await asyncio.gather(asyncio.create_task(cycle(1), name="user-1"), asyncio.create_task(cycle(2), name="user-2"))
+    tracer.flush()
+
+    events = _load(tmp_path / "trace.json")
+    names = {event["tid"]: event["args"]["name"] for event in events if event["ph"] == "M"}
+    assert sorted(names.values()) == ["user-1: scrape_cycle", "user-2: scrape_cycle"]
+    cycles = [event for event in _spans(events) if event["name"] == "scrape_cycle"]
+    assert {names[event["tid"]] for event in cycles if event["args"]["user"] == 1} == {"user-1: scrape_cycle"}
+    assert {event["tid"] for event in _spans(events)} == set(names)
+
+
+def test_disabled_tracer_is_a_no_op(tmp_path):
+    tracer = Tracer(None)
+    with tracer.span("scrape_cycle") as cycle:
+        assert cycle is None
+    tracer.flush()
+    assert not tracer.enabled
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.bot.webhook import SECRET_HEADER, WebhookServer
+
+
+def make_update(update_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": 1, "type": "private"},
+            "text": text,
+        },
+    }
+
+
+@pytest.mark.asyncio
+async def test_webhook_feeds_updates_to_dispatcher():
+    handled = []
+    dp = Dispatcher()
+
+    @dp.message()
+    async def on_message(message):
+        await asyncio.sleep(0.05)
+        handled.append(message.text)
+
+    server = WebhookServer(dp, Bot(token="42:TEST"), path="/hook", secret_token="s3cret", workers=4)
+    async with TestClient(TestServer(server.app)) as client:
+        responses = await asyncio.gather(
+            *(client.post("/hook", json=make_update(i, f"m{i}"), headers={SECRET_HEADER: "s3cret"}) for i in range(8))
+        )
+        assert [r.status for r in responses] == [200] * 8
+        await server.queue.join()
+
+    assert sorted(handled) == sorted(f"m{i}" for i in range(8))
+
+
+@pytest.mark.asyncio
+async def test_webhook_rejects_bad_secret_and_overflow():
+    dp = Dispatcher()
+    server = WebhookServer(dp, Bot(token="42:TEST"), path="/hook", secret_token="s3cret", workers=0, queue_size=1)
+    async with TestClient(TestServer(server.app)) as client:
+        response = await client.post("/hook", json=make_update(1, "x"), headers={SECRET_HEADER: "wrong"})
+        assert response.status == 401
+        response = await client.post("/hook", data="not json", headers={SECRET_HEADER: "s3cret"})
+        assert response.status == 400
+
+        first = await client.post("/hook", json=make_update(2, "x"), headers={SECRET_HEADER: "s3cret"})
+        second = await client.post("/hook", json=make_update(3, "x"), headers={SECRET_HEADER: "s3cret"})
+        assert (first.status, second.status) == (200, 503)
+
+
+def test_webhook_server_requires_secret():
+    with pytest.raises(ValueError):
+        WebhookServer(Dispatcher(), Bot(token="42:TEST"), secret_token="")